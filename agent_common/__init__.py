@@ -0,0 +1,10 @@
+"""
+Infrastructure shared by the week1-week3 agents: the response cache,
+search answer cache, tool registry, gazetteer and tool prefetcher.
+
+Each week folder imports shared_path first, which puts the repo root on
+sys.path, then imports from here, e.g.
+
+    import shared_path
+    from agent_common.response_cache import response_cache
+"""
@@ -0,0 +1,251 @@
+import csv
+import functools
+import os
+import random
+import re
+import string
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+City = namedtuple("City", ["name", "temp", "condition", "ttl"])
+
+CITIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.csv")
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Keys inside trie nodes; they can't clash with the single characters used for children
+_BEST = "best"
+_COUNT = "count"
+
+
+def normalize(name: str) -> str:
+    # "  São  Paulo, BR " -> "sao paulo br"
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", name.lower()).split())
+
+
+class Gazetteer:
+    """
+    City lookup that stays fast as the table grows.
+
+    - by_name: normalized name/alias -> City, for exact matches
+    - word n-grams of the query are checked against by_name, so
+      "London, UK" or "weather in new york city" still find the city
+    - a prefix trie answers partial names like "san fran" when only one
+      city starts that way, and the prefix is at least min_prefix long
+    """
+
+    def __init__(self, max_prefix=12, min_prefix=3):
+        self.by_name = {}
+        self.cities = []
+        self.max_prefix = max_prefix
+        self.min_prefix = min_prefix
+        self.max_words = 1
+        self.trie = {}
+
+    @classmethod
+    def load(cls, path=CITIES_FILE, default_ttl=300.0):
+        """
+        Read a CSV with columns name, aliases (separated by ';'), temp,
+        condition and an optional ttl in seconds. Rows are streamed.
+        """
+
+        gazetteer = cls()
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ttl = float(row["ttl"]) if row.get("ttl") else default_ttl
+                city = City(row["name"], row["temp"], row["condition"], ttl)
+                aliases = [alias for alias in (row.get("aliases") or "").split(";") if alias.strip()]
+                gazetteer.add(city, aliases)
+        return gazetteer
+
+    def add(self, city, aliases=()):
+        index = len(self.cities)
+        self.cities.append(city)
+
+        for name in (city.name, *aliases):
+            key = normalize(name)
+            if not key or key in self.by_name:
+                # First entry wins, so put important cities first in the file
+                continue
+            self.by_name[key] = index
+            self.max_words = max(self.max_words, key.count(" ") + 1)
+            self._insert_prefix(key, index)
+
+    def _insert_prefix(self, key, index):
+        node = self.trie
+        for char in key[:self.max_prefix]:
+            node = node.setdefault(char, {})
+            if _BEST not in node:
+                node[_BEST] = index
+                node[_COUNT] = 0
+            elif node[_BEST] == index:
+                continue
+            node[_COUNT] += 1
+
+    def lookup(self, query: str):
+        """Return the City for a free-form name, or None."""
+
+        key = normalize(query)
+        if not key:
+            return None
+
+        index = self.by_name.get(key)
+        if index is not None:
+            return self.cities[index]
+
+        index = self._contained(key)
+        if index is None:
+            index = self._prefix(key)
+        return self.cities[index] if index is not None else None
+
+    def _contained(self, key):
+        # Longest word run first: "new york city" beats "york"
+        words = key.split(" ")[:32]
+        for size in range(min(self.max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                index = self.by_name.get(" ".join(words[start:start + size]))
+                if index is not None:
+                    return index
+        return None
+
+    def _prefix(self, key):
+        # "s" or "sa" would name whichever city happens to be alone under it
+        if len(key) < self.min_prefix:
+            return None
+
+        node = self.trie
+        for char in key[:self.max_prefix]:
+            node = node.get(char)
+            if node is None:
+                return None
+
+        # Only answer when the prefix points to exactly one city
+        if node[_COUNT] != 1:
+            return None
+
+        # Past max_prefix chars the trie can't tell, so check the name itself
+        index = node[_BEST]
+        if len(key) > self.max_prefix and not normalize(self.cities[index].name).startswith(key):
+            return None
+        return index
+
+    def find_in_text(self, text: str):
+        """All cities named in a sentence, in order of appearance."""
+
+        words = normalize(text).split(" ")
+        found = []
+        start = 0
+        while start < len(words):
+            for size in range(min(self.max_words, len(words) - start), 0, -1):
+                index = self.by_name.get(" ".join(words[start:start + size]))
+                if index is not None:
+                    found.append(self.cities[index])
+                    start += size
+                    break
+            else:
+                start += 1
+        return found
+
+
+class TTLMemo:
+    """
+    Small memo table where every entry carries its own expiry time.
+    Safe to share between the tool worker threads.
+    """
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, ttl):
+        with self._lock:
+            now = time.monotonic()
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+
+        # Outside the lock, so one slow compute doesn't hold up the other threads
+        value = compute()
+        with self._lock:
+            self.entries[key] = (now + ttl, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+
+@functools.lru_cache(maxsize=None)
+def default_gazetteer():
+    # cities.csv, loaded on first use; tools.py and the prefetcher share this one
+    return Gazetteer.load()
+
+
+def _random_name(rng):
+    words = rng.randint(1, 3)
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))).title()
+        for _ in range(words)
+    )
+
+
+if __name__ == "__main__":
+    # Lookup cost should stay flat while the table grows 100x
+    rng = random.Random(0)
+    lookups = 100_000
+
+    for size in (1_000, 10_000, 100_000):
+        gazetteer = Gazetteer()
+        names = []
+        for i in range(size):
+            name = _random_name(rng)
+            names.append(name)
+            gazetteer.add(City(name, "20C", "Clear", 300.0), aliases=[f"alias{i}"])
+
+        asked = [rng.choice(names) for _ in range(lookups)]
+        queries = {
+            "exact": asked,
+            "alias": [f"ALIAS{rng.randrange(size)}" for _ in range(lookups)],
+            "in sentence": [f"weather in {name}, today" for name in asked],
+            "prefix": [rng.choice(names)[:8] for _ in range(lookups)]
+        }
+
+        timings = []
+        for label, batch in queries.items():
+            started = time.perf_counter()
+            for query in batch:
+                gazetteer.lookup(query)
+            timings.append(f"{label} {(time.perf_counter() - started) / lookups * 1e6:.2f}us")
+        print(f"{size:>7,} cities, gazetteer:         " + ", ".join(timings))
+
+        # The old get_weather, with one `elif "<name>" in city` branch per generated city.
+        # Returns the branch it took instead of that branch's weather dict
+        chain = [name.lower() for name in names]
+
+        def old_get_weather(city):
+            city = city.lower().strip()
+            for name in chain:
+                if name in city:
+                    return name
+            return None
+
+        # Same query sets; the chain is slow, so 1,000 of each
+        timings = []
+        for label, batch in queries.items():
+            started = time.perf_counter()
+            for query in batch[:1000]:
+                old_get_weather(query)
+            timings.append(f"{label} {(time.perf_counter() - started) / 1000 * 1e6:.2f}us")
+        # A short name inside "weather" or "today" ends the scan early, with the wrong city
+        wrong = sum(old_get_weather(query) != name.lower() for query, name in zip(queries["in sentence"][:1000], asked))
+        timings.append(f"{wrong / 10:.0f}% of sentences got the wrong city")
+        print(f"{size:>7,} cities, old if/elif chain: " + ", ".join(timings))
@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_common.gazetteer import default_gazetteer, normalize
+
+# "72 kg", "72.5kgs", "72 kilos"
+_WEIGHT = re.compile(r"(\d+(?:\.\d+)?)\s*(?:kg|kgs|kilo|kilos|kilograms?)\b", re.I)
+# "1.78 m", "178 cm", "1.78 meters"
+_HEIGHT = re.compile(r"(\d+(?:\.\d+)?)\s*(cm|m|meters?|metres?)\b", re.I)
+
+# Returned by take() when nothing usable was prefetched
+MISS = object()
+
+
+def guess_weather(query):
+    # Every city the gazetteer finds in the sentence
+    return [("get_weather", {"city": city.name}) for city in default_gazetteer().find_in_text(query)]
+
+
+def guess_bmi(query):
+    # Needs both a weight and a height, otherwise there is nothing to compute
+    weight = _WEIGHT.search(query)
+    height = _HEIGHT.search(query)
+    if not weight or not height:
+        return []
+
+    height_m = float(height.group(1))
+    if height.group(2).lower() == "cm":
+        height_m /= 100
+    return [("calc_bmi", {"weight_kg": float(weight.group(1)), "height_m": height_m})]
+
+
+def _weather_key(args):
+    # "London, UK" and "london" are the same call as far as get_weather goes
+    city = str(args.get("city", ""))
+    match = default_gazetteer().lookup(city)
+    return match.name if match else normalize(city)
+
+
+def _plain_key(args):
+    return tuple(sorted(
+        (name, round(float(value), 2) if isinstance(value, (int, float)) else normalize(str(value)))
+        for name, value in args.items()
+    ))
+
+
+class ToolPrefetcher:
+    """
+    Start cheap, side-effect free tools from a guess while the model is still deciding.
+
+    Guessers read the user query (a city name, a weight and a height) and
+    name the calls the model will probably make. Those run on a thread pool
+    during the first model request. When the model asks for the same call,
+    the finished (or half finished) result is used; anything else is dropped.
+
+    Usage:
+        prefetcher = ToolPrefetcher(registry)
+        batch = prefetcher.start(user_query)
+        response = client.models.generate_content(...)
+        result = prefetcher.take(batch, call)   # MISS -> run the tool as usual
+        prefetcher.finish(batch)
+    """
+
+    def __init__(self, registry, guessers=(guess_weather, guess_bmi), pool=None, max_guesses=4):
+        self.registry = registry
+        self.guessers = guessers
+        self.pool = pool or ThreadPoolExecutor(max_workers=4)
+        self.max_guesses = max_guesses
+
+        # How to tell that two argument dicts are the same call, per tool
+        self.keys = {"get_weather": _weather_key}
+
+        self.lock = threading.Lock()
+        self.stats = {"prefetched": 0, "hits": 0, "wasted": 0, "saved_seconds": 0.0}
+
+    def key(self, name, args):
+        return name, self.keys.get(name, _plain_key)(args or {})
+
+    def _run(self, name, args):
+        started = time.perf_counter()
+        result = self.registry.call(name, args)
+        return result, started, time.perf_counter()
+
+    def start(self, query):
+        """Launch the guessed calls and return the batch of pending futures."""
+
+        batch = {}
+        for guesser in self.guessers:
+            for name, args in guesser(query):
+                if name not in self.registry or len(batch) >= self.max_guesses:
+                    continue
+                key = self.key(name, args)
+                if key not in batch:
+                    batch[key] = self.pool.submit(self._run, name, args)
+
+        with self.lock:
+            self.stats["prefetched"] += len(batch)
+        return batch
+
+    def take(self, batch, call):
+        """The prefetched result for a function call, or MISS."""
+
+        future = batch.pop(self.key(call.name, call.args), None)
+        if future is None:
+            return MISS
+
+        asked = time.perf_counter()
+        try:
+            result, started, finished = future.result()
+        except Exception:
+            # Let the normal path run it again and report the error properly
+            return MISS
+
+        with self.lock:
+            self.stats["hits"] += 1
+            # Whatever ran before the model asked is time we didn't wait for
+            self.stats["saved_seconds"] += max(0.0, min(finished, asked) - started)
+        return result
+
+    def finish(self, batch):
+        # Guesses the model never asked for
+        for future in batch.values():
+            future.cancel()
+        with self.lock:
+            self.stats["wasted"] += len(batch)
+        batch.clear()
+
+    def summary(self):
+        prefetched = self.stats["prefetched"]
+        rate = self.stats["hits"] / prefetched if prefetched else 0.0
+        return (
+            f"Prefetch: {self.stats['hits']}/{prefetched} guesses used ({rate:.0%}), "
+            f"{self.stats['wasted']} wasted, {self.stats['saved_seconds'] * 1000:.1f}ms of tool time hidden"
+        )
+
+
+if __name__ == "__main__":
+    from types import SimpleNamespace
+
+    from agent_common.tool_registry import ToolRegistry
+
+    def slow_weather(city: str):
+        """Look a city up in cities.csv, as slow as a real weather API."""
+        time.sleep(0.2)
+        match = default_gazetteer().lookup(city)
+        return {"temp": match.temp, "condition": match.condition} if match else None
+
+    slow_weather.__name__ = "get_weather"
+    prefetcher = ToolPrefetcher(ToolRegistry([slow_weather]))
+
+    # The model "decides" for 300ms, then asks for a tool (or not)
+    for query, asked in [
+        ("What is the weather in Tokyo?", {"city": "Tokyo"}),
+        ("Is it raining in london, UK right now?", {"city": "London, UK"}),
+        ("Compare the weather in Nagpur and San Francisco", {"city": "Nagpur"}),
+        ("Tell me a joke", None)
+    ]:
+        batch = prefetcher.start(query)
+        time.sleep(0.3)
+        if asked:
+            result = prefetcher.take(batch, SimpleNamespace(name="get_weather", args=asked))
+            print(f"{query!r}: {'hit' if result is not MISS else 'miss'}")
+        prefetcher.finish(batch)
+
+    print(prefetcher.summary())
@@ -0,0 +1,283 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from google.genai import types
+from pydantic import BaseModel
+
+# Where cached replies live and how big the folder may grow
+DEFAULT_CACHE_DIR = os.environ.get("GENAI_CACHE_DIR", ".genai_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def _canonical(value):
+    """
+    Turn anything we may pass to generate_content into plain JSON data,
+    so the same request always hashes to the same key.
+    """
+
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, bytes):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, BaseModel):
+        return _canonical(value.model_dump(mode="json", exclude_none=True))
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        # A response_schema like Order: the JSON schema is what the model sees
+        return value.model_json_schema()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if typing.get_origin(value) is not None:
+        # Generic schemas like list[Order]
+        return {
+            "origin": repr(typing.get_origin(value)),
+            "args": [_canonical(arg) for arg in typing.get_args(value)]
+        }
+    if callable(value):
+        # Python tools: the SDK builds the declaration from name, signature and docstring
+        return {
+            "tool": getattr(value, "__name__", repr(value)),
+            "signature": str(inspect.signature(value)),
+            "doc": inspect.getdoc(value)
+        }
+    return repr(value)
+
+
+def _is_valid(validate, response):
+    try:
+        return bool(validate(response))
+    except Exception:
+        return False
+
+
+def _digest(value):
+    data = json.dumps(_canonical(value), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache for generate_content replies.
+
+    Entries are keyed by model, a hash of the contents and the request config
+    (system_instruction, response_schema, tools, ...). Every entry has a TTL and
+    the folder is kept under max_bytes by evicting the least recently used files.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "evictions": 0,
+            "bytes_read": 0,
+            "bytes_written": 0
+        }
+
+        self._lock = threading.Lock()
+        # key -> file size, oldest access first
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+        # File mtime doubles as "last used", so the LRU order survives restarts
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def make_key(self, model, contents, config=None):
+        request = {"model": model, "contents": _digest(contents)}
+
+        if config is not None:
+            # Every field that changes the reply; http_options only changes transport
+            request["config"] = {
+                name: _canonical(getattr(config, name))
+                for name in type(config).model_fields
+                if name != "http_options" and getattr(config, name) is not None
+            }
+
+        return _digest(request)
+
+    def get(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            entry = json.loads(raw)
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+
+        if entry["expires_at"] < time.time():
+            self._remove(key)
+            return None
+
+        # Touch the file so it counts as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            # Another process evicted it after we read it; the entry we have is still good
+            pass
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            self.stats["bytes_read"] += len(raw)
+
+        return types.GenerateContentResponse.model_validate(entry["response"])
+
+    def put(self, key, response, ttl=None):
+        entry = {
+            "expires_at": time.time() + (self.ttl if ttl is None else ttl),
+            "response": response.model_dump(
+                mode="json",
+                exclude_none=True,
+                exclude={"parsed", "sdk_http_response"}
+            )
+        }
+        raw = json.dumps(entry).encode("utf-8")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        # Write then rename, so readers never see half a file
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(raw)
+            self._total_bytes += len(raw)
+            self.stats["bytes_written"] += len(raw)
+
+        self._evict()
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or not self._index:
+                    return
+                key, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                self.stats["evictions"] += 1
+
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, key):
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+
+    def _remove(self, key):
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _lookup(self, model, contents, config, use_cache, refresh, validate):
+        if not use_cache:
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None, None
+
+        key = self.make_key(model, contents, config)
+        if refresh:
+            # Ask the model again, and let its answer replace the stored one
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return key, None
+
+        response = self.get(key)
+        if response is not None and validate is not None and not _is_valid(validate, response):
+            # A reply that was stored before the caller could check it; don't serve it again
+            self._remove(key)
+            response = None
+
+        with self._lock:
+            self.stats["hits" if response is not None else "misses"] += 1
+
+        return key, response
+
+    def _store(self, key, response, ttl, validate):
+        # Don't remember empty or blocked replies, or ones the caller can't use
+        if key is None or not response.candidates:
+            return
+        if validate is not None and not _is_valid(validate, response):
+            return
+        self.put(key, response, ttl=ttl)
+
+    def generate_content(self, client, *, model, contents, config=None, use_cache=True, ttl=None,
+                         refresh=False, validate=None):
+        """
+        Drop-in for client.models.generate_content.
+
+        Pass use_cache=False for calls whose answer should change between runs,
+        like the google_search grounding calls.
+        refresh=True skips the lookup but stores the new reply over the old one
+        (for retries after a bad answer).
+        validate(response) -> bool: only replies it accepts are stored or served.
+        """
+
+        key, response = self._lookup(model, contents, config, use_cache, refresh, validate)
+        if response is not None:
+            return response
+
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        self._store(key, response, ttl, validate)
+        return response
+
+    async def generate_content_async(self, client, *, model, contents, config=None, use_cache=True, ttl=None,
+                                     refresh=False, validate=None):
+        """Same as generate_content, for client.aio callers."""
+
+        key, response = self._lookup(model, contents, config, use_cache, refresh, validate)
+        if response is not None:
+            return response
+
+        response = await client.aio.models.generate_content(model=model, contents=contents, config=config)
+        self._store(key, response, ttl, validate)
+        return response
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (
+            f"Cache: {self.stats['hits']} hits, {self.stats['misses']} misses "
+            f"({hit_rate:.0%} hit rate), {self.stats['bypassed']} bypassed, "
+            f"{self.stats['bytes_read']} bytes read, {self.stats['bytes_written']} bytes written, "
+            f"{self.stats['evictions']} evictions"
+        )
+
+
+# Shared instance, so every script in this folder uses the same cache
+response_cache = ResponseCache()
@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+from google.genai import types
+
+from agent_common.response_cache import DEFAULT_CACHE_DIR, response_cache
+
+# Grounded facts go stale faster than plain model replies
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_SIMILARITY = 0.8
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+SEARCH_PROMPT = "Please answer this using Google Search: {query}"
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Words that don't change what is being asked
+_STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "of", "in", "on", "at", "to",
+    "for", "and", "or", "do", "does", "did", "me", "tell", "please", "what", "whats",
+    "who", "whos", "s", "currently", "current", "now", "right", "today"
+}
+
+GroundedAnswer = namedtuple("GroundedAnswer", ["text", "sources", "cached", "age"])
+
+
+def normalize_query(query: str) -> str:
+    # "  Who runs SpaceX?? " -> "who runs spacex"
+    query = unicodedata.normalize("NFKD", query)
+    query = "".join(ch for ch in query if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD.sub(" ", query.lower()).split())
+
+
+def query_tokens(normalized: str):
+    words = set(normalized.split())
+    # A question made only of stop words still needs something to compare
+    return frozenset(words - _STOP_WORDS) or frozenset(words)
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _grounding(response):
+    # Keep the grounding metadata as plain JSON so it survives a restart
+    candidates = response.candidates or []
+    metadata = candidates[0].grounding_metadata if candidates else None
+    if metadata is None:
+        return {}
+    return metadata.model_dump(mode="json", exclude_none=True)
+
+
+def _sources(grounding):
+    return [
+        {"title": chunk["web"].get("title"), "uri": chunk["web"].get("uri")}
+        for chunk in grounding.get("grounding_chunks", [])
+        if chunk.get("web")
+    ]
+
+
+def cache_key(query, model=DEFAULT_MODEL, prompt=SEARCH_PROMPT):
+    # The same question asked through another model or prompt is a different answer
+    return model, prompt, normalize_query(query)
+
+
+class SearchCache:
+    """
+    Answers from Google Search grounding, kept by model, prompt and normalized query.
+
+    - exact: "Who runs SpaceX?" and "who runs spacex" share one entry
+    - near-duplicate (optional): queries whose word sets overlap by at
+      least `similarity` (Jaccard) reuse the answer, e.g. "Who runs SpaceX?"
+      and "Who currently runs SpaceX"
+    - entries older than `ttl` seconds are searched again
+    - empty answers are never stored
+
+    Every new answer is appended as one JSON line to a log next to the
+    response cache, with the grounding metadata, so sources can still be
+    shown for a cached answer. The log is rewritten from the live entries
+    only once it has grown to twice their number.
+
+    Usage:
+        answer = search_cache.search(client, "Who runs SpaceX?")
+        print(answer.text, answer.sources, answer.cached)
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, similarity=DEFAULT_SIMILARITY, max_entries=5_000):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "search_answers.jsonl")
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        # Oldest first: a stored answer always goes to the end, so eviction pops from the front
+        self.entries = OrderedDict()
+        # word -> keys whose query contains it, so near matches only check a few entries
+        self.by_word = {}
+        # Lines in the log file, live or not, to know when it is worth compacting
+        self.log_lines = 0
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "expired": 0}
+
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            print("Search cache file is unreadable. Starting empty.")
+            return
+
+        # Later lines win, so a re-searched query ends up with its newest answer
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Half a line from a process that stopped mid-write
+                continue
+            key = cache_key(entry["query"], entry.get("model", DEFAULT_MODEL), entry.get("prompt", SEARCH_PROMPT))
+            self._drop(key)
+            self._index(key, entry)
+        self.log_lines = len(lines)
+        self._evict()
+        if lines and not lines[-1].endswith("\n"):
+            # Start clean, or the next append would be glued onto the broken line
+            self.save()
+
+    def append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One short write per answer; appends from other processes don't clobber it
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.log_lines += 1
+
+        if self.log_lines > 2 * max(len(self.entries), 64):
+            self.save()
+
+    def save(self):
+        # Rewrite the log with only the live entries, then swap it in
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self.log_lines = len(self.entries)
+
+    def _index(self, key, entry):
+        self.entries[key] = entry
+        for word in query_tokens(key[2]):
+            self.by_word.setdefault(word, set()).add(key)
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        for word in query_tokens(key[2]):
+            keys = self.by_word.get(word)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.by_word[word]
+
+    def _evict(self):
+        # Oldest answers go first when the table is full
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+
+    def _fresh(self, entry, ttl):
+        return time.time() - entry["created"] < ttl
+
+    def lookup(self, query, ttl=None, model=DEFAULT_MODEL, prompt=SEARCH_PROMPT):
+        """Return (entry, match) for a fresh cached answer, or (None, None)."""
+
+        ttl = self.ttl if ttl is None else ttl
+        key = cache_key(query, model, prompt)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if self._fresh(entry, ttl):
+                    self.stats["hits"] += 1
+                    return entry, "exact"
+                self.stats["expired"] += 1
+                self._drop(key)
+
+            if self.similarity:
+                tokens = query_tokens(key[2])
+                candidates = set()
+                for word in tokens:
+                    candidates |= self.by_word.get(word, set())
+
+                best, best_score = None, self.similarity
+                for candidate in candidates:
+                    if candidate[:2] != key[:2]:
+                        continue
+                    score = _jaccard(tokens, query_tokens(candidate[2]))
+                    if score >= best_score and self._fresh(self.entries[candidate], ttl):
+                        best, best_score = candidate, score
+                if best is not None:
+                    self.stats["near_hits"] += 1
+                    return self.entries[best], "near"
+
+            self.stats["misses"] += 1
+            return None, None
+
+    def store(self, query, text, grounding, model=DEFAULT_MODEL, prompt=SEARCH_PROMPT):
+        entry = {
+            "query": query,
+            "model": model,
+            "prompt": prompt,
+            "text": text,
+            "grounding": grounding,
+            "created": time.time()
+        }
+        if not text:
+            # Blocked or empty reply: hand it back once, but search again next time
+            return entry
+
+        key = cache_key(query, model, prompt)
+        with self.lock:
+            self._drop(key)
+            self._index(key, entry)
+            self._evict()
+            self.append(entry)
+        return entry
+
+    def _answer(self, entry, cached):
+        return GroundedAnswer(
+            text=entry["text"],
+            sources=_sources(entry["grounding"]),
+            cached=cached,
+            age=time.time() - entry["created"]
+        )
+
+    def search(self, client, query, model=DEFAULT_MODEL, prompt=SEARCH_PROMPT, ttl=None):
+        """Answer `query` with Google Search grounding, from the cache when possible."""
+
+        entry, match = self.lookup(query, ttl, model, prompt)
+        if entry is not None:
+            return self._answer(entry, match)
+
+        google_res = response_cache.generate_content(
+            client,
+            model=model,
+            contents=prompt.format(query=query),
+            config=types.GenerateContentConfig(
+                tools=[types.Tool(google_search=types.GoogleSearch())]
+            ),
+            # Freshness is handled here, by our own TTL
+            use_cache=False
+        )
+        entry = self.store(query, google_res.text, _grounding(google_res), model, prompt)
+        return self._answer(entry, None)
+
+    async def search_async(self, client, query, model=DEFAULT_MODEL, prompt=SEARCH_PROMPT, ttl=None):
+        entry, match = self.lookup(query, ttl, model, prompt)
+        if entry is not None:
+            return self._answer(entry, match)
+
+        google_res = await response_cache.generate_content_async(
+            client,
+            model=model,
+            contents=prompt.format(query=query),
+            config=types.GenerateContentConfig(
+                tools=[types.Tool(google_search=types.GoogleSearch())]
+            ),
+            use_cache=False
+        )
+        entry = self.store(query, google_res.text, _grounding(google_res), model, prompt)
+        return self._answer(entry, None)
+
+    def summary(self):
+        lookups = sum(self.stats[k] for k in ("hits", "near_hits", "misses"))
+        reused = self.stats["hits"] + self.stats["near_hits"]
+        rate = reused / lookups if lookups else 0.0
+        return f"Search cache: {self.stats} ({rate:.0%} of searches answered without a model call)"
+
+
+# One shared cache, like response_cache
+search_cache = SearchCache()
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = SearchCache(path=os.path.join(DEFAULT_CACHE_DIR, "search_answers_demo.jsonl"))
+    for query in sys.argv[1:] or ["Who runs SpaceX?", "who runs spacex", "Who currently runs SpaceX"]:
+        key = normalize_query(query)
+        entry, match = cache.lookup(query)
+        print(f"{query!r} -> {key!r}: {match or 'miss'}")
+        if entry is None:
+            cache.store(query, f"(demo answer for {query})", {})
+    print(cache.summary())
+
+    # Another prompt or model is another answer, and empty answers aren't kept
+    other_prompt = "Answer this using google search: {query}"
+    assert cache.lookup("Who runs SpaceX?", prompt=other_prompt) == (None, None)
+    assert cache.lookup("Who runs SpaceX?", model="gemini-2.5-pro") == (None, None)
+    cache.store("Who runs Tesla?", None, {})
+    assert cache.lookup("Who runs Tesla?") == (None, None)
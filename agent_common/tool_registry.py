@@ -0,0 +1,109 @@
+import time
+
+from google.genai import types
+
+
+class ToolRegistry:
+    """
+    Compile tool functions into FunctionDeclarations once and reuse them.
+
+    Passing raw functions in tools=[...] makes the SDK read their signature
+    and docstring again on every request. The registry does it once, keeps
+    the resulting types.Tool, and also owns the name -> function lookup.
+
+    Usage:
+        registry = ToolRegistry([get_weather, request_google_search])
+        config = types.GenerateContentConfig(tools=registry.tools)
+        result = registry.call(call.name, call.args)
+    """
+
+    def __init__(self, functions=(), api_option="GEMINI_API"):
+        self.api_option = api_option
+        self.functions = {}
+        self.declarations = []
+        self._tool = None
+
+        for function in functions:
+            self.register(function)
+
+    def register(self, function):
+        # Same conversion the SDK runs for a plain function, done once here
+        declaration = types.FunctionDeclaration.from_callable_with_api_option(
+            callable=function,
+            api_option=self.api_option,
+            use_json_schema=True
+        )
+
+        self.functions[declaration.name] = function
+        self.declarations.append(declaration)
+        self._tool = None
+        return function
+
+    @property
+    def tool(self):
+        # Built on first use after the last register(), then shared by every request
+        if self._tool is None:
+            self._tool = types.Tool(function_declarations=list(self.declarations))
+        return self._tool
+
+    @property
+    def tools(self):
+        return [self.tool]
+
+    def get(self, name):
+        return self.functions.get(name)
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    def call(self, name, args=None):
+        tool_function = self.functions.get(name)
+        if tool_function is None:
+            raise KeyError(f"Unknown tool: {name}")
+        return tool_function(**(args or {}))
+
+
+if __name__ == "__main__":
+    # Per-request config cost: raw functions (what the SDK converts every call) vs the registry
+    from google import genai
+    from google.genai import _transformers
+
+    def get_weather(city: str):
+        """
+        Generate the current weather for a specific city.
+
+        Args:
+            city (str): The name of the city (e.g., "London", "New York").
+
+        Returns:
+            dict: A dictionary containing temperature and condition.
+        """
+        return {"temp": "25C", "condition": "Clear"}
+
+    def request_google_search(query: str):
+        """
+        Use this tool to search Google for current events or facts.
+        """
+        return "This is a placeholder."
+
+    api_client = genai.Client(api_key="benchmark-only")._api_client
+    registry = ToolRegistry([get_weather, request_google_search])
+    rounds = 5_000
+
+    def build_config(tools):
+        config = types.GenerateContentConfig(
+            tools=tools,
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+        )
+        # The SDK turns every entry of tools into a types.Tool before sending
+        return _transformers.t_tools(api_client, config.tools)
+
+    for label, tools in (
+        ("raw functions", [get_weather, request_google_search]),
+        ("ToolRegistry", registry.tools)
+    ):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            build_config(tools)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<14} {elapsed / rounds * 1e6:8.1f}us per request config")
@@ -0,0 +1,12 @@
+"""
+Orchestration-overhead benchmarks for the week1-week3 agents.
+
+Everything runs against a local fake genai.Client, so the numbers are
+the time our own loops spend outside the network. Run from the repo root:
+
+    python -m benchmarks --turns 2000
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+
+from benchmarks.fake_genai import FakeClient, canned_reply, patched_client
@@ -0,0 +1,41 @@
+import argparse
+import json
+import sys
+
+from benchmarks.agent_loops import SCENARIOS, compare, print_report, run_all, save_baseline
+
+parser = argparse.ArgumentParser(description="Measure agent loop overhead against a fake genai.Client.")
+parser.add_argument("--turns", type=int, default=2000, help="Turns per scenario")
+parser.add_argument("--session-turns", type=int, default=50, help="Start a fresh agent every N turns")
+parser.add_argument("--latency", type=float, default=0.0, help="Fake model latency per request, in seconds")
+parser.add_argument("--alloc-turns", type=int, default=200, help="Turns traced with tracemalloc")
+parser.add_argument("--only", nargs="*", choices=[s.name for s in SCENARIOS], help="Run only these scenarios")
+parser.add_argument("--baseline", help="Fail when results are worse than this JSON file")
+parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline (0.25 = 25%%)")
+parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+args = parser.parse_args()
+
+results = run_all(args.turns, args.session_turns, args.latency, args.alloc_turns, args.only)
+print_report(results)
+
+# Numbers from an agent that kept failing mean nothing
+failed = {name: m for name, m in results.items() if m["errors"]}
+if failed:
+    print("Agent errors:")
+    for name, m in failed.items():
+        print(f"  {name}: {m['errors']} errors, first: {m['first_error']}")
+    sys.exit(1)
+
+if args.save_baseline:
+    save_baseline(results, args.save_baseline)
+    print(f"Baseline saved to {args.save_baseline}")
+
+if args.baseline:
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
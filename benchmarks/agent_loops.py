@@ -0,0 +1,233 @@
+import contextlib
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from benchmarks.fake_genai import FakeClient, patched_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEEK_PREFIX = os.path.join(REPO_ROOT, "learning-agentic-ai-")
+SHARED_PREFIX = os.path.join(REPO_ROOT, "agent_common")
+
+# Metrics that fail the run when they grow past the baseline
+CHECKED_METRICS = ("cpu_p50_us", "cpu_p99_us", "serialize_us_per_turn", "request_kb_per_turn", "alloc_peak_kb")
+
+Scenario = namedtuple("Scenario", ["name", "week", "module", "start_session", "queries"])
+
+
+def load_week_module(week, module):
+    """
+    Import `module` from one week folder. Every week has its own tools.py,
+    agent.py, ... so anything imported from another week is dropped first,
+    along with agent_common so its caches start empty for every scenario.
+    """
+
+    for name, loaded in list(sys.modules.items()):
+        path = getattr(loaded, "__file__", None) or ""
+        if path.startswith((WEEK_PREFIX, SHARED_PREFIX)):
+            del sys.modules[name]
+
+    sys.path[:] = [path for path in sys.path if not path.startswith(WEEK_PREFIX)]
+    sys.path.insert(0, f"{WEEK_PREFIX}{week}")
+    return importlib.import_module(module)
+
+
+def _run_agent_session(module):
+    # run_agent keeps no history, so a session is just the function
+    return module.run_agent
+
+
+def _smart_agent_session(module):
+    return module.SmartAgent().chat
+
+
+def _coach_session(module):
+    # Coach reloads fitness_log.json on start; begin each session from nothing
+    if os.path.exists(module.chat_file):
+        os.remove(module.chat_file)
+    return module.Coach().chat
+
+
+SCENARIOS = [
+    Scenario("run_agent", "week2", "assistant", _run_agent_session, [
+        "What is the weather in Tokyo?",
+        "Who won the last IPL?",
+        "My name is Yash. Can you remember my name?"
+    ]),
+    Scenario("SmartAgent.chat", "week3", "smart_agent", _smart_agent_session, [
+        "Hi, I am Yash.",
+        "What is the weather in London?",
+        "Is that city in India?",
+        "Who is the CEO of OpenAI?"
+    ]),
+    Scenario("Coach.chat", "week3", "fitness_bot", _coach_session, [
+        "Hi! My name is Yash.",
+        "I weigh 72 kg and my height is 1.78 m.",
+        "Who is the prime minister of India?",
+        "What should I eat after a workout?"
+    ])
+]
+
+
+class ErrorCounter:
+    """
+    Stands in for stdout while the agents run. The agents catch their own
+    exceptions and print or return "Error: ...", so count those instead of
+    letting them vanish.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+
+    def check(self, text):
+        if isinstance(text, str) and "Error:" in text:
+            self.count += text.count("Error:")
+            if self.first is None:
+                self.first = text.strip()
+
+    def write(self, text):
+        self.check(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _turns(scenario, count, session_turns, module):
+    # Yields (chat function, query); a new agent every session_turns turns
+    chat = None
+    for turn in range(count):
+        if turn % session_turns == 0:
+            chat = scenario.start_session(module)
+        # Unique text per turn, so the response cache doesn't turn this into a cache benchmark
+        query = f"{scenario.queries[turn % len(scenario.queries)]} #{turn}"
+        yield chat, query
+
+
+def run_scenario(scenario, turns=2000, session_turns=50, latency=0.0, alloc_turns=200, warmup=20):
+    """Drive one agent loop through `turns` turns and return its metrics."""
+
+    module = load_week_module(scenario.week, scenario.module)
+    walls, cpus = [], []
+    errors = ErrorCounter()
+
+    with contextlib.redirect_stdout(errors):
+        # First calls pay for lazy imports and pydantic schema builds; keep them out of the numbers
+        for chat, query in _turns(scenario, warmup, session_turns, module):
+            errors.check(chat(query))
+        FakeClient.reset_stats()
+
+        for chat, query in _turns(scenario, turns, session_turns, module):
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+            reply = chat(query)
+            errors.check(reply)
+            cpus.append(time.process_time() - cpu_started)
+            walls.append(time.perf_counter() - wall_started)
+
+        requests = FakeClient.stats["requests"]
+        request_bytes = FakeClient.stats["request_bytes"]
+        serialize_seconds = FakeClient.stats["serialize_seconds"]
+
+        # Allocations in their own pass: tracemalloc slows everything down
+        peaks = []
+        tracemalloc.start()
+        retained_started = tracemalloc.get_traced_memory()[0]
+        for chat, query in _turns(scenario, alloc_turns, session_turns, module):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            errors.check(chat(query))
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - retained_started
+        tracemalloc.stop()
+
+    walls.sort()
+    cpus.sort()
+    waited = latency * requests / turns
+
+    return {
+        "turns": turns,
+        "requests_per_turn": requests / turns,
+        "wall_p50_ms": percentile(walls, 0.50) * 1e3,
+        "wall_p99_ms": percentile(walls, 0.99) * 1e3,
+        "overhead_p50_ms": max(0.0, percentile(walls, 0.50) - waited) * 1e3,
+        "cpu_p50_us": percentile(cpus, 0.50) * 1e6,
+        "cpu_p99_us": percentile(cpus, 0.99) * 1e6,
+        "serialize_us_per_turn": serialize_seconds / turns * 1e6,
+        "request_kb_per_turn": request_bytes / turns / 1024,
+        "alloc_peak_kb": sum(peaks) / max(1, len(peaks)) / 1024,
+        "retained_bytes_per_turn": retained / max(1, alloc_turns),
+        "errors": errors.count,
+        "first_error": errors.first
+    }
+
+
+def run_all(turns=2000, session_turns=50, latency=0.0, alloc_turns=200, only=None):
+    results = {}
+    real_cwd = os.getcwd()
+    real_env = {name: os.environ.get(name) for name in ("GENAI_CACHE_DIR",)}
+
+    # Logs and cache files land in a scratch folder, never in the repo
+    with tempfile.TemporaryDirectory() as workdir, patched_client(latency=latency):
+        os.chdir(workdir)
+        os.environ["GENAI_CACHE_DIR"] = os.path.join(workdir, ".genai_cache")
+        try:
+            for scenario in SCENARIOS:
+                if only and scenario.name not in only:
+                    continue
+                results[scenario.name] = run_scenario(scenario, turns, session_turns, latency, alloc_turns)
+        finally:
+            os.chdir(real_cwd)
+            for name, value in real_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    return results
+
+
+def print_report(results):
+    print(
+        f"{'scenario':<16} {'wall p50/p99 ms':>16} {'overhead p50':>12} {'cpu p50/p99 us':>16} "
+        f"{'serialize us':>12} {'request KB':>10} {'alloc KB':>9} {'retained B':>10}"
+    )
+    for name, m in results.items():
+        print(
+            f"{name:<16} {m['wall_p50_ms']:>7.2f}/{m['wall_p99_ms']:<8.2f} {m['overhead_p50_ms']:>12.2f} "
+            f"{m['cpu_p50_us']:>7.0f}/{m['cpu_p99_us']:<8.0f} {m['serialize_us_per_turn']:>12.0f} "
+            f"{m['request_kb_per_turn']:>10.1f} {m['alloc_peak_kb']:>9.1f} {m['retained_bytes_per_turn']:>10.0f}"
+        )
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Return one message per metric that got worse than baseline * (1 + tolerance)."""
+
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in CHECKED_METRICS:
+            if metric in old and old[metric] > 0 and metrics[metric] > old[metric] * (1 + tolerance):
+                change = metrics[metric] / old[metric] - 1
+                regressions.append(f"{name} {metric}: {old[metric]:.1f} -> {metrics[metric]:.1f} (+{change:.0%})")
+    return regressions
+
+
+def save_baseline(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
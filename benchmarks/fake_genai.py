@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import json
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from google import genai
+from google.genai import types
+
+_BMI = re.compile(r"(\d+(?:\.\d+)?)\s*kg.*?(\d+(?:\.\d+)?)\s*m\b", re.I)
+_CITY = re.compile(r"weather (?:in|for) ([A-Za-z ]+?)(?:\?|$| today| right now)", re.I)
+
+
+def _as_contents(contents):
+    # The SDK accepts a plain string, one Content or a list of them
+    if isinstance(contents, str):
+        return [types.Content(role="user", parts=[types.Part(text=contents)])]
+    if isinstance(contents, types.Content):
+        return [contents]
+    return [
+        types.Content(role="user", parts=[types.Part(text=item)]) if isinstance(item, str) else item
+        for item in contents
+    ]
+
+
+def _declared_tools(config):
+    names = set()
+    for tool in (config.tools or []) if config else []:
+        for declaration in getattr(tool, "function_declarations", None) or []:
+            names.add(declaration.name)
+    return names
+
+
+def _text(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(prompt_token_count=0, candidates_token_count=0)
+    )
+
+
+def _call(name, args):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[
+            types.Part(function_call=types.FunctionCall(name=name, args=args))
+        ]))]
+    )
+
+
+def canned_reply(contents, config):
+    """
+    What the fake model answers. Decision turns (automatic calling off)
+    pick a tool from keywords in the last user message; every other turn
+    gets a short text answer.
+    """
+
+    last = contents[-1]
+    tools = _declared_tools(config)
+    deciding = (
+        config is not None
+        and config.automatic_function_calling is not None
+        and config.automatic_function_calling.disable
+    )
+
+    if deciding and last.role == "user":
+        text = " ".join(part.text or "" for part in last.parts)
+
+        city = _CITY.search(text)
+        if city and "get_weather" in tools:
+            return _call("get_weather", {"city": city.group(1).strip()})
+
+        bmi = _BMI.search(text)
+        if bmi and "calc_bmi" in tools:
+            return _call("calc_bmi", {"weight_kg": float(bmi.group(1)), "height_m": float(bmi.group(2))})
+
+        if text.lower().startswith("who") and "request_google_search" in tools:
+            return _call("request_google_search", {"query": text})
+
+    return _text("Copy that. Here is a short answer from the fake model.")
+
+
+class FakeModels:
+    """Stand-in for client.models: canned replies after `latency` seconds."""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def _reply(self, model, contents, config):
+        owner = self.owner
+
+        # The real SDK turns the request into JSON before sending it; do the same so it gets counted
+        started = time.perf_counter()
+        contents = _as_contents(contents)
+        body = json.dumps({
+            "model": model,
+            "contents": [content.model_dump(mode="json", exclude_none=True) for content in contents],
+            "config": config.model_dump(mode="json", exclude_none=True) if config is not None else None
+        })
+        serialize_seconds = time.perf_counter() - started
+
+        with owner.lock:
+            owner.stats["requests"] += 1
+            owner.stats["request_bytes"] += len(body)
+            owner.stats["serialize_seconds"] += serialize_seconds
+
+        return owner.responder(contents, config)
+
+    def generate_content(self, *, model, contents, config=None):
+        reply = self._reply(model, contents, config)
+        if self.owner.latency:
+            time.sleep(self.owner.latency)
+        return reply
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        yield self.generate_content(model=model, contents=contents, config=config)
+
+    def embed_content(self, *, model, contents, config=None):
+        # Words hashed into the requested number of dimensions: same text, same vector
+        owner = self.owner
+        dimensions = (config.output_dimensionality if config is not None else None) or 768
+        texts = [contents] if isinstance(contents, str) else contents
+
+        embeddings = []
+        for text in texts:
+            values = [0.0] * dimensions
+            for word in re.findall(r"\w+", text.lower()):
+                values[zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+            embeddings.append(types.ContentEmbedding(values=values))
+
+        with owner.lock:
+            owner.stats["embed_requests"] += 1
+        if owner.latency:
+            time.sleep(owner.latency)
+        return types.EmbedContentResponse(embeddings=embeddings)
+
+
+class FakeAsyncModels(FakeModels):
+    async def generate_content(self, *, model, contents, config=None):
+        reply = self._reply(model, contents, config)
+        if self.owner.latency:
+            await asyncio.sleep(self.owner.latency)
+        return reply
+
+
+class FakeClient:
+    """
+    Drop-in for genai.Client that never touches the network.
+
+    All instances share the class-level settings below, because the agents
+    build their own client inside their modules:
+
+        with patched_client(latency=0.05):
+            agent = SmartAgent()
+    """
+
+    latency = 0.0
+    responder = staticmethod(canned_reply)
+    lock = threading.Lock()
+    stats = {"requests": 0, "request_bytes": 0, "serialize_seconds": 0.0, "embed_requests": 0}
+
+    def __init__(self, *args, **kwargs):
+        self.models = FakeModels(self)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self))
+
+    @classmethod
+    def reset_stats(cls):
+        with cls.lock:
+            cls.stats = {"requests": 0, "request_bytes": 0, "serialize_seconds": 0.0, "embed_requests": 0}
+
+
+@contextlib.contextmanager
+def patched_client(latency=0.0, responder=canned_reply):
+    """Swap genai.Client for FakeClient everywhere while the block runs."""
+
+    real_client = genai.Client
+    FakeClient.latency = latency
+    FakeClient.responder = staticmethod(responder)
+    FakeClient.reset_stats()
+    genai.Client = FakeClient
+    try:
+        yield FakeClient
+    finally:
+        genai.Client = real_client
@@ -4,6 +4,10 @@ from dotenv import load_dotenv
 from google.genai import types
 from pydantic import BaseModel, Field
 
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from stream_parse import StructuredStream
+
 load_dotenv()
 
 client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
@@ -15,36 +19,42 @@ class Order(BaseModel):
     quantity: int = Field(description="The number of items ordered")
     price_estimate: float = Field(description="Estimate cost: $15 per pizza, $2 per drink")
 
-# User Input
-user_command = "I'm super hungry! Get me four large pepperoni pizza and a coke."
-
-try:
-    # API Call
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=user_command,
-        config=types.GenerateContentConfig(
-            response_mime_type="application/json",
-            response_schema=Order
+def stream_order(user_command: str) -> StructuredStream:
+    # Yields (field, value) while the model is still writing; .result holds the Order
+    return StructuredStream(client, Order, user_command)
+
+if __name__ == "__main__":
+    # User Input
+    user_command = "I'm super hungry! Get me four large pepperoni pizza and a coke."
+
+    try:
+        # API Call
+        response = response_cache.generate_content(
+            client,
+            model="gemini-2.5-flash",
+            contents=user_command,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=Order
+            )
         )
-    )
 
-    # Validation
-    my_order = Order.model_validate_json(response.text)
+        # Validation
+        my_order = Order.model_validate_json(response.text)
 
-    # Use the Data
-    print("Order Received!")
-    print(f"Item: {my_order.item}")
-    print(f"Qty: {my_order.quantity}")
-    print(f"Cost: ${my_order.price_estimate}")
+        # Use the Data
+        print("Order Received!")
+        print(f"Item: {my_order.item}")
+        print(f"Qty: {my_order.quantity}")
+        print(f"Cost: ${my_order.price_estimate}")
 
-    # Prove it's a real data, not text
-    total = my_order.price_estimate * 1.1
-    print(f"Total with Tax: ${total:.2f}")
+        # Prove it's a real data, not text
+        total = my_order.price_estimate * 1.1
+        print(f"Total with Tax: ${total:.2f}")
 
-    # : -> "I am about to give you special formatting instructions."
-    # .2 -> "Keep exactly 2 digits after the decimal point."
-    # f -> "Treat this as a float (a number with decimals)."
+        # : -> "I am about to give you special formatting instructions."
+        # .2 -> "Keep exactly 2 digits after the decimal point."
+        # f -> "Treat this as a float (a number with decimals)."
 
-except Exception as e:
-    print(f"Error: {e}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,226 @@
+import gc
+import json
+import random
+import time
+from contextlib import contextmanager
+from typing import Annotated
+
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict
+
+from schemas import PizzaOrder
+
+
+def _row_type(model):
+    """
+    A TypedDict with the same fields and rules as the model.
+
+    Checking plain dicts is ~10x cheaper than building model objects,
+    so we use it to find bad rows and for the columnar output.
+    """
+
+    fields = {}
+    for name, field in model.model_fields.items():
+        annotation = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+        fields[name] = annotation if field.is_required() else NotRequired[annotation]
+    return TypedDict(f"{model.__name__}Row", fields)
+
+
+# Build the validators once; building them is the slow part
+order_list_adapter = TypeAdapter(list[PizzaOrder])
+order_row_adapter = TypeAdapter(list[_row_type(PizzaOrder)])
+
+
+class BatchResult:
+    """
+    Outcome of validating many rows at once.
+
+    orders: the valid PizzaOrder objects (None in columnar mode)
+    columns: NumPy columns of the valid rows (only in columnar mode)
+    rows: the input index of each valid row
+    errors: input index -> list of pydantic error dicts for every bad row
+    """
+
+    def __init__(self, rows, errors, orders=None, columns=None):
+        self.rows = rows
+        self.errors = errors
+        self.orders = orders
+        self.columns = columns
+
+    def __repr__(self):
+        return f"BatchResult({len(self.rows)} valid, {len(self.errors)} invalid)"
+
+
+def _group_errors(error: ValidationError):
+    errors = {}
+    for detail in error.errors(include_url=False):
+        if not detail["loc"]:
+            # The batch itself is wrong (an object, a number, ...), so there are no rows to report
+            raise ValueError(f"Expected a list of orders, got {type(detail['input']).__name__}: {detail['msg']}")
+        # loc starts with the row index, the rest points inside that row
+        row = detail["loc"][0]
+        detail["loc"] = detail["loc"][1:]
+        errors.setdefault(row, []).append(detail)
+    return errors
+
+
+@contextmanager
+def _gc_paused():
+    # Hundreds of thousands of new objects at once set off full GC passes that
+    # find nothing to free (orders have no cycles); that cost more than the validation
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _find_errors(rows):
+    # The cheap dict check, only to learn which rows are bad
+    try:
+        order_row_adapter.validate_python(rows)
+        return {}
+    except ValidationError as e:
+        return _group_errors(e)
+
+
+def _result(checked, good_rows, errors, columnar):
+    if columnar:
+        return BatchResult(good_rows, errors, columns=to_columns(checked))
+    return BatchResult(good_rows, errors, orders=checked)
+
+
+def validate_batch(rows, columnar=False) -> BatchResult:
+    """
+    Validate a whole list of dicts without raising.
+
+    Bad rows are reported in `errors`; good rows become PizzaOrder objects,
+    or NumPy columns if columnar=True (no model objects are built then).
+    Raises ValueError if `rows` is not a list.
+    """
+
+    if columnar:
+        # Checked dicts are all the columns need, so no model objects at all
+        try:
+            return _result(order_row_adapter.validate_python(rows), list(range(len(rows))), {}, columnar)
+        except ValidationError as e:
+            errors = _group_errors(e)
+        good_rows = [i for i in range(len(rows)) if i not in errors]
+        return _result(order_row_adapter.validate_python([rows[i] for i in good_rows]), good_rows, errors, columnar)
+
+    # Finding bad rows with the dict check is ~6x cheaper than building models,
+    # so every good row becomes a PizzaOrder exactly once
+    errors = _find_errors(rows)
+    good_rows = [i for i in range(len(rows)) if i not in errors]
+    with _gc_paused():
+        orders = order_list_adapter.validate_python([rows[i] for i in good_rows] if errors else rows)
+    return _result(orders, good_rows, errors, columnar)
+
+
+def validate_batch_json(data, columnar=False) -> BatchResult:
+    """
+    Same as validate_batch, for a JSON array (str or bytes).
+    Parsing and checking happen together in pydantic-core when every row is good.
+    Raises ValueError if the JSON is not an array.
+    """
+
+    adapter = order_row_adapter if columnar else order_list_adapter
+    try:
+        with _gc_paused():
+            checked = adapter.validate_json(data)
+    except ValidationError:
+        # Fall back to the dict path so we can tell good rows from bad ones
+        return validate_batch(json.loads(data), columnar=columnar)
+    return _result(checked, list(range(len(checked))), {}, columnar)
+
+
+def _intern(values):
+    # Map each distinct string to a small int code, in order of first appearance
+    codes = {}
+    return [codes.setdefault(value, len(codes)) for value in values], list(codes)
+
+
+def to_columns(rows):
+    """
+    Columnar view of validated rows (dicts or PizzaOrder objects).
+
+    quantity -> int64 array, item/flavor -> int32 category codes plus the
+    list of categories, so "pizza" is stored once instead of per row.
+    """
+
+    import numpy as np
+
+    rows = [row.model_dump() if isinstance(row, PizzaOrder) else row for row in rows]
+    default_quantity = PizzaOrder.model_fields["quantity"].default
+
+    item_codes, items = _intern(row["item"] for row in rows)
+    flavor_codes, flavors = _intern(row["flavor"] for row in rows)
+
+    return {
+        "quantity": np.fromiter(
+            (row.get("quantity", default_quantity) for row in rows), dtype=np.int64, count=len(rows)
+        ),
+        "item": np.asarray(item_codes, dtype=np.int32),
+        "item_categories": items,
+        "flavor": np.asarray(flavor_codes, dtype=np.int32),
+        "flavor_categories": flavors
+    }
+
+
+def validate_one_by_one(rows):
+    # The schemas.py way: one constructor call and one try/except per row
+    orders, errors = [], {}
+    for i, row in enumerate(rows):
+        try:
+            orders.append(PizzaOrder(**row))
+        except Exception as e:
+            errors[i] = e
+    return orders, errors
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    items = ["pizza", "burger", "pasta", "coke"]
+    flavors = ["cheese", "pepperoni", "veggie", "bbq", "classic"]
+
+    rows = []
+    for i in range(200_000):
+        row = {"item": rng.choice(items), "flavor": rng.choice(flavors), "quantity": rng.randint(1, 9)}
+        # 1 in 20 rows is broken, like a real extraction run
+        if i % 20 == 0:
+            del row["item"]
+        rows.append(row)
+    payload = json.dumps(rows)
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<32} {elapsed:6.3f}s  {len(rows) / elapsed:>12,.0f} rows/sec")
+        return result
+
+    print(f"Validating {len(rows):,} rows")
+    timed("PizzaOrder(**row) loop", lambda: validate_one_by_one(rows))
+    timed("validate_batch", lambda: validate_batch(rows))
+    result = timed("validate_batch columnar", lambda: validate_batch(rows, columnar=True))
+    timed("validate_batch_json columnar", lambda: validate_batch_json(payload, columnar=True))
+
+    print(result)
+    first_bad = min(result.errors)
+    print(f"First bad row {first_bad}: {result.errors[first_bad]}")
+
+    columns = result.columns
+    pizza = columns["item_categories"].index("pizza")
+    print(f"Total pizzas ordered: {columns['quantity'][columns['item'] == pizza].sum()}")
+
+    # Input that isn't an array is one clear error, not an IndexError
+    for bad_batch in ('{"a": 1}', "42"):
+        for columnar in (False, True):
+            try:
+                validate_batch_json(bad_batch, columnar=columnar)
+            except ValueError as e:
+                assert "Expected a list of orders" in str(e), e
+            else:
+                raise AssertionError(f"{bad_batch} was accepted")
@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+
+from google.genai import types
+
+from agent import Order, client
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+
+# Same request as agent.py, but built once and shared by every order
+order_config = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=Order
+)
+
+
+def read_commands(path):
+    """
+    Stream order texts from a JSONL file, one per line.
+
+    A line can be a plain JSON string ("Get me two pizzas") or an object
+    with a "text" (or "user_command") field and an optional "id".
+    Yields (id, text, error) tuples so bad lines are reported, not fatal.
+    """
+
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"Bad JSON on line {line_no}: {e}"
+                continue
+
+            if isinstance(record, str):
+                yield line_no, record, None
+            elif isinstance(record, dict):
+                text = record.get("text") or record.get("user_command")
+                order_id = record.get("id", line_no)
+                if text:
+                    yield order_id, text, None
+                else:
+                    yield order_id, None, f"No 'text' field on line {line_no}"
+            else:
+                yield line_no, None, f"Unsupported record on line {line_no}"
+
+
+async def extract_order(user_command: str, model: str = "gemini-2.5-flash"):
+    # Non-blocking version of the call in agent.py
+    response = await response_cache.generate_content_async(
+        client,
+        model=model,
+        contents=user_command,
+        config=order_config
+    )
+
+    return Order.model_validate_json(response.text)
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile, good enough for a summary line
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def run_bulk(input_path, output_path, concurrency=16, model="gemini-2.5-flash"):
+    """
+    Extract every order in input_path with at most `concurrency` requests in flight.
+    Each result (or failure) is written to output_path as soon as it finishes.
+    """
+
+    # A small queue keeps memory flat: we never read far ahead of the workers
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    counts = {"ok": 0, "failed": 0}
+
+    with open(output_path, "w") as out:
+
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        async def producer():
+            for order_id, text, error in read_commands(input_path):
+                if error:
+                    counts["failed"] += 1
+                    write({"id": order_id, "ok": False, "error": error})
+                    continue
+                await queue.put((order_id, text))
+
+            # One stop signal per worker
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+
+                order_id, text = item
+                started = time.perf_counter()
+                try:
+                    order = await extract_order(text, model=model)
+                    elapsed = time.perf_counter() - started
+                    counts["ok"] += 1
+                    write({
+                        "id": order_id,
+                        "ok": True,
+                        "order": order.model_dump(),
+                        "latency_ms": round(elapsed * 1000, 1)
+                    })
+                except Exception as e:
+                    elapsed = time.perf_counter() - started
+                    counts["failed"] += 1
+                    write({
+                        "id": order_id,
+                        "ok": False,
+                        "error": str(e),
+                        "latency_ms": round(elapsed * 1000, 1)
+                    })
+                latencies.append(elapsed)
+
+        started = time.perf_counter()
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    total = counts["ok"] + counts["failed"]
+
+    print(f"Processed {total} orders ({counts['ok']} ok, {counts['failed']} failed) in {wall_time:.2f}s")
+    print(f"Throughput: {total / wall_time if wall_time else 0:.2f} orders/sec")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.0f}ms, p95: {percentile(latencies, 95) * 1000:.0f}ms")
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract many orders concurrently.")
+    parser.add_argument("input", help="JSONL file with one order text per line")
+    parser.add_argument("output", help="JSONL file for results and failures")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    args = parser.parse_args()
+
+    asyncio.run(run_bulk(args.input, args.output, concurrency=args.concurrency, model=args.model))
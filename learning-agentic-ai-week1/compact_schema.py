@@ -0,0 +1,141 @@
+import json
+import re
+import sys
+
+from google.genai import types
+from pydantic import Field, create_model
+
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+
+# Words that cost tokens but tell the model nothing
+_FILLER = re.compile(r"^(the|a|an)\s+", re.I)
+_QUOTED = re.compile(r"'[^']+'")
+
+# Rough rule of thumb for English/JSON text
+CHARS_PER_TOKEN = 4
+
+
+def _short_names(field_names):
+    # price_estimate -> "pe", item -> "i"; add a digit if two fields collide
+    names = {}
+    taken = set()
+    for name in field_names:
+        short = "".join(part[0] for part in name.split("_") if part) or name
+        candidate, n = short, 2
+        while candidate in taken:
+            candidate, n = f"{short}{n}", n + 1
+        taken.add(candidate)
+        names[name] = candidate
+    return names
+
+
+def trim_description(description, max_words=8):
+    """
+    Shorten a Field description but keep any quoted options,
+    since those are what the model actually has to choose from.
+    """
+
+    if not description:
+        return None
+
+    text = _FILLER.sub("", " ".join(description.split()))
+    words = text.split(" ")
+    if len(words) <= max_words:
+        return text
+
+    head = " ".join(words[:max_words]).rstrip(",:;.")
+    options = [option for option in _QUOTED.findall(text) if option not in head]
+    return f"{head}: {', '.join(options)}" if options else head
+
+
+class CompactSchema:
+    """
+    Send a Pydantic model to the model with short keys and trimmed descriptions,
+    then map the reply back to the original model.
+
+    Usage:
+        compact = CompactSchema(Ticket)
+        ticket = compact.generate(client, "The server is down!")
+    """
+
+    def __init__(self, model, max_words=8, descriptions=None):
+        self.model = model
+        self.short_names = _short_names(model.model_fields)
+        self.long_names = {short: name for name, short in self.short_names.items()}
+        self.calls = []
+
+        descriptions = descriptions or {}
+        fields = {}
+        for name, field in model.model_fields.items():
+            description = descriptions.get(name) or trim_description(field.description, max_words)
+            default = field.default if not field.is_required() else ...
+            fields[self.short_names[name]] = (field.annotation, Field(default, description=description))
+
+        self.compact_model = create_model(f"{model.__name__}Compact", **fields)
+        self.config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=self.compact_model
+        )
+
+        # What the schema itself costs us, in characters, in each mode
+        self._schema_chars_full = len(json.dumps(model.model_json_schema()))
+        self._schema_chars_compact = len(json.dumps(self.compact_model.model_json_schema()))
+
+    def expand(self, text):
+        """Turn a compact JSON reply back into the original model."""
+
+        compact = self.compact_model.model_validate_json(text)
+        return self.model(**{self.long_names[short]: value for short, value in compact})
+
+    def generate(self, client, contents, model="gemini-2.5-flash"):
+        response = response_cache.generate_content(
+            client,
+            model=model,
+            contents=contents,
+            config=self.config
+        )
+
+        result = self.expand(response.text)
+        self._record(response, result)
+        return result
+
+    def _record(self, response, result):
+        usage = response.usage_metadata
+        prompt_tokens = usage.prompt_token_count if usage else None
+        output_tokens = usage.candidates_token_count if usage else None
+
+        # We can't see what the long-key call would have cost without making it,
+        # so estimate from the size difference of the schema and of the reply
+        full_reply = json.dumps(result.model_dump())
+        compact_reply = json.dumps({self.short_names[name]: value for name, value in result.model_dump().items()})
+        saved_prompt = (self._schema_chars_full - self._schema_chars_compact) // CHARS_PER_TOKEN
+        saved_output = (len(full_reply) - len(compact_reply)) // CHARS_PER_TOKEN
+
+        call = {
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "est_prompt_tokens_saved": saved_prompt,
+            "est_output_tokens_saved": saved_output
+        }
+        self.calls.append(call)
+        print(
+            f"[compact {self.model.__name__}] prompt {prompt_tokens} tokens (~{saved_prompt} saved), "
+            f"output {output_tokens} tokens (~{saved_output} saved)"
+        )
+
+
+if __name__ == "__main__":
+    from agent import Order, client
+
+    compact_order = CompactSchema(Order)
+    print(f"Short keys: {compact_order.short_names}")
+    print(json.dumps(compact_order.compact_model.model_json_schema(), indent=2))
+
+    user_command = sys.argv[1] if len(sys.argv) > 1 else "I'm super hungry! Get me four large pepperoni pizza and a coke."
+
+    try:
+        my_order = compact_order.generate(client, user_command)
+        print(f"Order Received! {my_order}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -1,13 +1,17 @@
 # Import Google GenAI library to use the AI models
 from google import genai
 from google.genai import types
-import json
 # Import 'os' to access the computer's env variables
 import os
 
 # Import the function to load .env file
 from dotenv import load_dotenv
 
+# Reuse earlier answers to the same prompt instead of calling the model again
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from json_repair import JsonRepairer
+
 # Searches for a .env file and loads the variables into python
 load_dotenv()
 
@@ -27,28 +31,37 @@ Return the result in this JSON format:
 User Request: "I want a huge pepperoni pizza"
 """
 
-try:
+# Fix broken replies locally before paying for another round trip
+repairer = JsonRepairer(fields=["item", "flavor", "size"], defaults={"size": "medium"})
+
+def ask_model(retry):
     # Sends a message to the AI model
-    response = client.models.generate_content(
+    response = response_cache.generate_content(
+        client,
         model="gemini-2.5-flash",
         contents=prompt,
         
         config=types.GenerateContentConfig(
             response_mime_type="application/json"
-        )
+        ),
+        # A retry must reach the model, and its reply replaces the cached broken one
+        refresh=retry
     )
-    # Print the success message
-    print("Success! AI says:")
     # Print the actual text response from the AI
     print(response.text)
+    return response.text
+
+try:
     # print(response.text["item"])
     # print(response.text[10])
-    data = json.loads(response.text)
+    data = repairer.extract(ask_model)
+    # Print the success message
+    print("Success! AI says:")
     print(data)
     print(data["item"])
     print(data["flavor"])
-    print(data["sizes"])
+    print(data["size"])
+    print(f"Repair stats: {repairer.stats} (repair rate {repairer.repair_rate:.0%})")
 except Exception as e:
     # If sometihng breaks, print the error so we can fix it
     print(f"Error: {e}")
-    
\ No newline at end of file
@@ -0,0 +1,240 @@
+import difflib
+import json
+import re
+
+# ```json ... ``` wrappers the model sometimes adds around the body
+_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*(?:```\s*)?$", re.S)
+# A bare value (number or literal) that the cut-off may have left unfinished
+_LAST_VALUE = re.compile(r"(?<=[:\[,])(\s*)([-+.\w]+)$")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_LITERALS = ("true", "false", "null")
+
+
+def _scan(text):
+    """
+    (outside, open_string): outside[i] is False for every char of a string,
+    quotes included, and open_string is True if the text ends inside one.
+    """
+
+    outside = []
+    in_string = False
+    escape = False
+
+    for char in text:
+        if in_string:
+            outside.append(False)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        else:
+            outside.append(char != '"')
+            in_string = char == '"'
+
+    return outside, in_string
+
+
+def _drop_trailing_commas(text):
+    # [1, 2,] -> [1, 2]; a ",]" inside a string value is left as it is
+    outside, _ = _scan(text)
+    drop = set()
+    comma = None
+
+    for index, char in enumerate(text):
+        if not outside[index]:
+            comma = None
+        elif char == ",":
+            comma = index
+        elif char in "}]":
+            if comma is not None:
+                drop.add(comma)
+            comma = None
+        elif not char.isspace():
+            comma = None
+
+    return "".join(char for index, char in enumerate(text) if index not in drop)
+
+
+def _finish_value(token):
+    # What a value cut off mid-way should become: "nul" -> "null", "1." -> "1", "-" -> "" (drop it)
+    if token in _LITERALS or _NUMBER.fullmatch(token):
+        return token
+    for literal in _LITERALS:
+        if literal.startswith(token):
+            return literal
+    token = token.rstrip(".eE+-")
+    return token if _NUMBER.fullmatch(token) else ""
+
+
+def _close_truncated(text):
+    """
+    Finish a body that was cut off: close an open string and any open
+    brackets, complete or drop a half-written number or literal, and drop
+    a dangling key or comma at the end.
+    """
+
+    outside, in_string = _scan(text)
+    stack = []
+
+    for char, counts in zip(text, outside):
+        if not counts:
+            continue
+        if char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    else:
+        # Complete or drop a number or literal that was cut off: {"a": nul -> {"a": null
+        text = _LAST_VALUE.sub(lambda match: match.group(1) + _finish_value(match.group(2)), text.rstrip())
+
+    text = text.rstrip()
+    if stack and stack[-1] == "}":
+        # {"a": 1, "b"   or   {"a": 1, "b":   -> drop the key that never got a value
+        text = re.sub(r'(?<=[{,])\s*"[^"]*"\s*:?\s*$', "", text)
+    text = text.rstrip().rstrip(",")
+
+    return text + "".join(reversed(stack))
+
+
+def parse_lenient(text):
+    """
+    Try hard to read a JSON object out of a model reply.
+    Returns a dict, or None if nothing usable was found.
+    """
+
+    if not text:
+        return None
+
+    match = _FENCE.match(text)
+    if match:
+        text = match.group(1)
+
+    # Skip any chatter before the first brace
+    start = text.find("{")
+    if start == -1:
+        return None
+    text = text[start:]
+
+    for candidate in (text, _drop_trailing_commas(text)):
+        try:
+            data = json.loads(candidate)
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        data = json.loads(_drop_trailing_commas(_close_truncated(text)))
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        return None
+
+
+def fit_to_schema(data, fields, defaults=None, cutoff=0.75):
+    """
+    Rename near-miss keys to the expected names ("sizes" -> "size",
+    "Flavour" -> "flavor") and fill missing fields from defaults.
+    Returns (fitted dict, list of still-missing fields).
+    """
+
+    defaults = defaults or {}
+    fitted = {}
+    lowered = {field.lower(): field for field in fields}
+
+    for key, value in data.items():
+        if key in fields:
+            fitted[key] = value
+            continue
+        match = difflib.get_close_matches(key.lower(), list(lowered), n=1, cutoff=cutoff)
+        if match and lowered[match[0]] not in fitted:
+            fitted[lowered[match[0]]] = value
+
+    for field, default in defaults.items():
+        if fitted.get(field) in (None, ""):
+            fitted[field] = default
+
+    missing = [field for field in fields if field not in fitted]
+    return fitted, missing
+
+
+class JsonRepairer:
+    """
+    Repair model replies locally and only ask the model again when that fails.
+    Counts how often repair worked, so we know how many round trips it saved.
+    """
+
+    def __init__(self, fields, defaults=None):
+        self.fields = list(fields)
+        self.defaults = defaults or {}
+        self.stats = {"clean": 0, "repaired": 0, "unrepairable": 0, "re_requests": 0, "failed": 0}
+
+    def repair(self, text):
+        """Returns a dict with every expected field, or None."""
+
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict) and all(field in data for field in self.fields):
+                self.stats["clean"] += 1
+                return data
+        except (json.JSONDecodeError, TypeError):
+            pass
+
+        data = parse_lenient(text)
+        if data is not None:
+            data, missing = fit_to_schema(data, self.fields, self.defaults)
+
+        if data is None or missing:
+            self.stats["unrepairable"] += 1
+            return None
+
+        self.stats["repaired"] += 1
+        return data
+
+    def extract(self, ask_model, max_re_requests=1):
+        """
+        ask_model(retry) returns the raw reply text. It is called again
+        (with retry=True) only when the reply can't be repaired locally.
+        """
+
+        for attempt in range(max_re_requests + 1):
+            if attempt:
+                self.stats["re_requests"] += 1
+
+            data = self.repair(ask_model(attempt > 0))
+            if data is not None:
+                return data
+
+        self.stats["failed"] += 1
+        raise ValueError(f"Could not get {self.fields} from the model reply")
+
+    @property
+    def repair_rate(self):
+        # Share of broken replies we fixed without another model call
+        broken = self.stats["repaired"] + self.stats["unrepairable"]
+        return self.stats["repaired"] / broken if broken else 1.0
+
+
+if __name__ == "__main__":
+    # Commas and brackets inside string values are text, not JSON to repair
+    assert parse_lenient('{"note": "a,]", "items": [1, 2,],}') == {"note": "a,]", "items": [1, 2]}
+    assert parse_lenient('{"note": "x, }", "size": "large",') == {"note": "x, }", "size": "large"}
+
+    # Replies cut off in the middle of a number or literal
+    for cut, expected in [
+        ('{"a": 1, "b": nul', {"a": 1, "b": None}),
+        ('{"a": tr', {"a": True}),
+        ('{"a": fals', {"a": False}),
+        ('{"a": 1.', {"a": 1}),
+        ('{"a": [1, 2.5e', {"a": [1, 2.5]}),
+        ('{"a": 1, "b": -', {"a": 1}),
+        ('{"a": [1, -', {"a": [1]}),
+        ('{"quantity": 4, "item": "pizza", "flavor": "pepperoni", "price_estimate": 1', {
+            "quantity": 4, "item": "pizza", "flavor": "pepperoni", "price_estimate": 1
+        })
+    ]:
+        assert parse_lenient(cut) == expected, (cut, parse_lenient(cut))
+    print("json_repair: all repairs as expected")
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import sys
+
+from google.genai import types
+from pydantic import Field, TypeAdapter
+
+from agent import Order, client
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+
+
+# Same Mold as agent.py, plus the id of the command it came from
+class BatchedOrder(Order):
+    id: str = Field(description="The id of the user command this order was extracted from")
+
+
+batched_adapter = TypeAdapter(list[BatchedOrder])
+
+batch_config = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=list[BatchedOrder]
+)
+
+batch_prompt = """
+Extract one order from each user command below.
+Return exactly one item per command and copy the command's id into the "id" field.
+
+{commands}
+"""
+
+
+class OrderBatcher:
+    """
+    Collect short order commands and send them to the model together.
+
+    A batch is sent when `max_batch` commands are waiting or `max_wait_ms`
+    has passed since the first one arrived. Each caller of submit() gets
+    back only its own Order. Commands the model skipped are retried on
+    their own, up to `max_attempts` times.
+    """
+
+    def __init__(self, max_batch=16, max_wait_ms=25, max_attempts=3, max_in_flight=4, model="gemini-2.5-flash"):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_attempts = max_attempts
+        self.model = model
+
+        self.stats = {"batches": 0, "commands": 0, "retried": 0, "failed": 0}
+
+        self._queue = asyncio.Queue()
+        self._ids = itertools.count(1)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self._collector = None
+
+    async def __aenter__(self):
+        self._collector = asyncio.create_task(self._collect())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._collector.cancel()
+        await asyncio.gather(self._collector, return_exceptions=True)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, user_command: str) -> Order:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put({"id": f"c{next(self._ids)}", "command": user_command, "future": future, "attempts": 0})
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # Keep filling the batch until it is full or the wait is over
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        try:
+            self.stats["batches"] += 1
+            self.stats["commands"] += len(batch)
+
+            commands = "\n".join(f"{item['id']}: {item['command']}" for item in batch)
+            ids = {item["id"] for item in batch}
+
+            def answers_every_command(response):
+                # Only a reply that parses and covers the whole batch is worth caching
+                return ids <= {order.id for order in batched_adapter.validate_json(response.text)}
+
+            try:
+                response = await response_cache.generate_content_async(
+                    client,
+                    model=self.model,
+                    contents=batch_prompt.format(commands=commands),
+                    config=batch_config,
+                    # A retried command must reach the model, not the reply that skipped it
+                    refresh=any(item["attempts"] for item in batch),
+                    validate=answers_every_command
+                )
+                results = {order.id: order for order in batched_adapter.validate_json(response.text)}
+            except Exception as e:
+                # The whole call failed: every command in it counts as missing
+                results = {}
+                error = e
+            else:
+                error = None
+
+            for item in batch:
+                order = results.get(item["id"])
+                if order is not None:
+                    if not item["future"].done():
+                        item["future"].set_result(Order(**order.model_dump(exclude={"id"})))
+                    continue
+
+                # Only the commands the model skipped go round again
+                item["attempts"] += 1
+                if item["attempts"] < self.max_attempts:
+                    self.stats["retried"] += 1
+                    await self._queue.put(item)
+                else:
+                    self.stats["failed"] += 1
+                    if not item["future"].done():
+                        item["future"].set_exception(
+                            error or RuntimeError(f"No order returned for command {item['id']}")
+                        )
+        finally:
+            self._in_flight.release()
+
+
+async def extract_many(user_commands, **batcher_options):
+    async with OrderBatcher(**batcher_options) as batcher:
+        results = await asyncio.gather(
+            *(batcher.submit(command) for command in user_commands),
+            return_exceptions=True
+        )
+        print(f"Batcher stats: {batcher.stats}")
+        return results
+
+
+if __name__ == "__main__":
+    user_commands = sys.argv[1:] or [
+        "I'm super hungry! Get me four large pepperoni pizza.",
+        "Two cokes please.",
+        "One veggie burger for me.",
+        "Three garlic breads, extra cheese."
+    ]
+
+    for command, result in zip(user_commands, asyncio.run(extract_many(user_commands))):
+        if isinstance(result, Exception):
+            print(f"{command} -> Error: {result}")
+        else:
+            print(f"{command} -> {result.quantity}x {result.flavor} {result.item} (${result.price_estimate})")
@@ -0,0 +1,201 @@
+import json
+import sys
+
+from google.genai import types
+from pydantic import TypeAdapter
+
+
+class IncrementalObjectParser:
+    """
+    Parse a JSON object that arrives in pieces.
+
+    feed() returns the top-level (key, value) pairs that became complete
+    with this chunk, so a field can be used before the object is closed.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+
+        # Book-keeping for the value currently being read
+        self.value_start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        fields = []
+
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+
+            if self.state == "start":
+                if char == "{":
+                    self.state = "key"
+                elif not char.isspace():
+                    raise ValueError(f"Expected '{{' at position {self.pos}, got {char!r}")
+
+            elif self.state == "key":
+                if char == '"':
+                    self.state = "key_body"
+                    self.value_start = self.pos
+                elif char == "}":
+                    self.state = "done"
+                elif not (char.isspace() or char == ","):
+                    raise ValueError(f"Expected a key at position {self.pos}, got {char!r}")
+
+            elif self.state == "key_body":
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.key = json.loads(self.buffer[self.value_start:self.pos + 1])
+                    self.state = "colon"
+
+            elif self.state == "colon":
+                if char == ":":
+                    self.state = "value"
+                elif not char.isspace():
+                    raise ValueError(f"Expected ':' at position {self.pos}, got {char!r}")
+
+            elif self.state == "value":
+                if not char.isspace():
+                    self.value_start = self.pos
+                    self.depth = 0
+                    self.in_string = char == '"'
+                    if char in "{[":
+                        self.depth = 1
+                    self.state = "value_body"
+
+            elif self.state == "value_body":
+                complete = self._step_value(char)
+                if complete is not None:
+                    fields.append((self.key, json.loads(complete)))
+                    self.state = "after_value"
+                    # A bare number/true/false/null ends on the delimiter, so look at it again
+                    if self.buffer[self.value_start] not in '"{[' and self.buffer[self.pos] in ",}":
+                        continue
+
+            elif self.state == "after_value":
+                if char == ",":
+                    self.state = "key"
+                elif char == "}":
+                    self.state = "done"
+                elif not char.isspace():
+                    raise ValueError(f"Expected ',' or '}}' at position {self.pos}, got {char!r}")
+
+            elif self.state == "done":
+                if not char.isspace():
+                    raise ValueError(f"Unexpected data after the object at position {self.pos}")
+
+            self.pos += 1
+
+        return fields
+
+    def _step_value(self, char):
+        """Advance the current value by one char; return its source text once it is complete."""
+
+        first = self.buffer[self.value_start]
+
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                if first == '"':
+                    return self.buffer[self.value_start:self.pos + 1]
+            return None
+
+        if first in "{[":
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    return self.buffer[self.value_start:self.pos + 1]
+            return None
+
+        # Numbers and literals have no closing mark; they end at the next delimiter
+        if char in ",}" or char.isspace():
+            return self.buffer[self.value_start:self.pos]
+        return None
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+
+class StructuredStream:
+    """
+    Stream a response_schema reply field by field.
+
+    Iterating yields (field_name, value) as soon as each field is complete,
+    already validated against that field's type. After the loop, `result`
+    holds the full Pydantic object, validated once more as a whole.
+    """
+
+    def __init__(self, client, schema, contents, model="gemini-2.5-flash"):
+        self.client = client
+        self.schema = schema
+        self.contents = contents
+        self.model = model
+        self.result = None
+        self.text = ""
+
+        # One adapter per field, built once per stream
+        self._adapters = {
+            name: TypeAdapter(field.annotation) for name, field in schema.model_fields.items()
+        }
+
+    def __iter__(self):
+        parser = IncrementalObjectParser()
+
+        chunks = self.client.models.generate_content_stream(
+            model=self.model,
+            contents=self.contents,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=self.schema
+            )
+        )
+
+        for chunk in chunks:
+            if not chunk.text:
+                continue
+
+            self.text += chunk.text
+            for name, value in parser.feed(chunk.text):
+                adapter = self._adapters.get(name)
+                yield name, adapter.validate_python(value) if adapter else value
+
+        # Final check on the whole body, same as the non-streaming path
+        self.result = self.schema.model_validate_json(self.text)
+
+
+if __name__ == "__main__":
+    from triage import stream_ticket
+
+    user_command = sys.argv[1] if len(sys.argv) > 1 else "Our production database is down and customers can't pay!"
+
+    try:
+        stream = stream_ticket(user_command)
+
+        for name, value in stream:
+            print(f"{name}: {value}")
+
+            # Routing can start while the model is still writing the reasoning
+            if name == "department":
+                print(f"-> Dispatching to the {value} queue now")
+
+        print(f"Validated ticket: {stream.result}")
+
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,236 @@
+import argparse
+import json
+import pickle
+import random
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from triage import Ticket, triage_with_gemini
+
+
+def load_labelled_tickets(path):
+    """
+    Read tickets that Gemini (or a human) already labelled.
+
+    One JSON object per line: {"text": ..., "category": ..., "department": ..., "reasoning": ...}
+    Returns a list of (text, Ticket) pairs.
+    """
+
+    tickets = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            ticket = Ticket(
+                category=record["category"],
+                department=record["department"],
+                reasoning=record.get("reasoning", "")
+            )
+            tickets.append((record["text"], ticket))
+    return tickets
+
+
+class LocalTicketClassifier:
+    """
+    TF-IDF + logistic regression, one model per Ticket field.
+
+    predict() only answers when both fields are above `threshold` confidence,
+    so unclear tickets can still go to Gemini.
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        self.category_model = LogisticRegression(max_iter=1000)
+        self.department_model = LogisticRegression(max_iter=1000)
+
+    def fit(self, labelled_tickets):
+        texts = [text for text, _ in labelled_tickets]
+        features = self.vectorizer.fit_transform(texts)
+
+        self.category_model.fit(features, [t.category for _, t in labelled_tickets])
+        self.department_model.fit(features, [t.department for _, t in labelled_tickets])
+        return self
+
+    def predict(self, text: str):
+        """Returns (Ticket or None, confidence)."""
+
+        features = self.vectorizer.transform([text])
+        category_probs = self.category_model.predict_proba(features)[0]
+        department_probs = self.department_model.predict_proba(features)[0]
+
+        category_idx = category_probs.argmax()
+        department_idx = department_probs.argmax()
+
+        # The ticket is only as certain as its least certain field
+        confidence = float(min(category_probs[category_idx], department_probs[department_idx]))
+        if confidence < self.threshold:
+            return None, confidence
+
+        ticket = Ticket(
+            category=self.category_model.classes_[category_idx],
+            department=self.department_model.classes_[department_idx],
+            reasoning=f"Classified locally (confidence {confidence:.2f})"
+        )
+        return ticket, confidence
+
+    def save(self, path):
+        # Pickle the fitted parts, not the class, so the file loads from any script
+        with open(path, "wb") as f:
+            pickle.dump({
+                "threshold": self.threshold,
+                "vectorizer": self.vectorizer,
+                "category_model": self.category_model,
+                "department_model": self.department_model
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+
+        model = cls(threshold=state["threshold"])
+        model.vectorizer = state["vectorizer"]
+        model.category_model = state["category_model"]
+        model.department_model = state["department_model"]
+        return model
+
+
+class TicketRouter:
+    """
+    Answer with the local model when it is confident, otherwise ask Gemini.
+    Keeps counts and timings so we can see what the fast path saves.
+    """
+
+    def __init__(self, local_model, fallback=triage_with_gemini, llm_cost_per_call: float = 0.0002):
+        self.local_model = local_model
+        self.fallback = fallback
+        self.llm_cost_per_call = llm_cost_per_call
+
+        self.stats = {"local": 0, "remote": 0, "local_seconds": 0.0, "remote_seconds": 0.0}
+
+    def triage(self, text: str) -> Ticket:
+        started = time.perf_counter()
+        ticket, _ = self.local_model.predict(text)
+        self.stats["local_seconds"] += time.perf_counter() - started
+
+        if ticket is not None:
+            self.stats["local"] += 1
+            return ticket
+
+        started = time.perf_counter()
+        ticket = self.fallback(text)
+        self.stats["remote_seconds"] += time.perf_counter() - started
+        self.stats["remote"] += 1
+        return ticket
+
+    def report(self, llm_latency: float = None):
+        """
+        llm_latency: seconds per Gemini call. Defaults to the average we measured,
+        which needs at least one remote call.
+        """
+
+        total = self.stats["local"] + self.stats["remote"]
+        if total == 0:
+            return "No tickets routed yet."
+
+        if llm_latency is None:
+            llm_latency = self.stats["remote_seconds"] / self.stats["remote"] if self.stats["remote"] else 0.0
+
+        # Every ticket pays for the local check; only local answers skip the model call
+        saved_seconds = self.stats["local"] * llm_latency - self.stats["local_seconds"]
+        saved_cost = self.stats["local"] * self.llm_cost_per_call
+
+        return (
+            f"Handled locally: {self.stats['local']}/{total} ({self.stats['local'] / total:.0%})\n"
+            f"Local check: {self.stats['local_seconds'] / total * 1e6:.0f}us per ticket\n"
+            f"Latency saved: {saved_seconds:.2f}s, estimated cost saved: ${saved_cost:.4f}"
+        )
+
+
+def replay_benchmark(path, threshold=0.8, train_fraction=0.7, llm_latency=1.0, llm_cost=0.0002, seed=0):
+    """
+    Replay a labelled ticket file: train on part of it, route the rest.
+
+    The stored labels stand in for Gemini, so no API calls are made;
+    llm_latency and llm_cost describe what each avoided call would have cost.
+    """
+
+    tickets = load_labelled_tickets(path)
+    random.Random(seed).shuffle(tickets)
+
+    split = int(len(tickets) * train_fraction)
+    train, test = tickets[:split], tickets[split:]
+    if not train or not test:
+        raise ValueError("Need enough labelled tickets for both a train and a test split.")
+
+    model = LocalTicketClassifier(threshold=threshold).fit(train)
+
+    expected = {}
+    def replay_fallback(text):
+        return expected[text]
+
+    router = TicketRouter(model, fallback=replay_fallback, llm_cost_per_call=llm_cost)
+
+    correct_local = 0
+    for text, label in test:
+        expected[text] = label
+        before = router.stats["local"]
+        ticket = router.triage(text)
+
+        if router.stats["local"] > before:
+            correct_local += ticket.category == label.category and ticket.department == label.department
+
+    print(f"Trained on {len(train)} tickets, replayed {len(test)} (threshold {threshold})")
+    print(router.report(llm_latency=llm_latency))
+    if router.stats["local"]:
+        print(f"Local accuracy: {correct_local / router.stats['local']:.1%}")
+
+    return router
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fast path for ticket triage.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Fit the local model on labelled tickets")
+    train_parser.add_argument("labelled", help="JSONL file of labelled tickets")
+    train_parser.add_argument("--model", default="ticket_model.pkl")
+    train_parser.add_argument("--threshold", type=float, default=0.8)
+
+    bench_parser = subparsers.add_parser("bench", help="Replay a labelled ticket file")
+    bench_parser.add_argument("labelled", help="JSONL file of labelled tickets")
+    bench_parser.add_argument("--threshold", type=float, default=0.8)
+    bench_parser.add_argument("--train-fraction", type=float, default=0.7)
+    bench_parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per Gemini call")
+    bench_parser.add_argument("--llm-cost", type=float, default=0.0002, help="Dollars per Gemini call")
+
+    triage_parser = subparsers.add_parser("triage", help="Triage one ticket")
+    triage_parser.add_argument("text")
+    triage_parser.add_argument("--model", default="ticket_model.pkl")
+
+    args = parser.parse_args()
+
+    if args.command == "train":
+        model = LocalTicketClassifier(threshold=args.threshold).fit(load_labelled_tickets(args.labelled))
+        model.save(args.model)
+        print(f"Saved local ticket model to {args.model}")
+    elif args.command == "bench":
+        replay_benchmark(
+            args.labelled,
+            threshold=args.threshold,
+            train_fraction=args.train_fraction,
+            llm_latency=args.llm_latency,
+            llm_cost=args.llm_cost
+        )
+    else:
+        router = TicketRouter(LocalTicketClassifier.load(args.model))
+        ticket = router.triage(args.text)
+        print(f"Ticket category: {ticket.category}")
+        print(f"Ticket department: {ticket.department}")
+        print(f"Reason: {ticket.reasoning}")
+        print(router.report())
@@ -4,8 +4,21 @@ from google.genai import types
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from stream_parse import StructuredStream
+from compact_schema import CompactSchema
+
 load_dotenv()
-client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+
+# Built on first use, so importing Ticket (e.g. for the offline classifier) needs no API key
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+    return _client
 
 # Define the Mold (Schema)
 class Ticket(BaseModel):
@@ -13,12 +26,17 @@ class Ticket(BaseModel):
     department: str = Field(description="The team needed: 'DevOps', 'Support' or 'Billing'")
     reasoning: str = Field(description="The short explanation about your decision")
 
-# User Input
-user_command = "I'm very hungry! Please help me."
+# Opt-in: same Ticket, fewer tokens on the wire
+compact_ticket = CompactSchema(Ticket)
+
+def triage_with_gemini(user_command: str, compact: bool = False) -> Ticket:
+    if compact:
+        # Short keys and trimmed descriptions; the reply is mapped back to a Ticket
+        return compact_ticket.generate(get_client(), user_command)
 
-try:
     # API Call
-    response = client.models.generate_content(
+    response = response_cache.generate_content(
+        get_client(),
         model="gemini-2.5-flash",
         contents=user_command,
         config=types.GenerateContentConfig(
@@ -28,12 +46,23 @@ try:
     )
 
     # Validation
-    my_ticket = Ticket.model_validate_json(response.text)
+    return Ticket.model_validate_json(response.text)
+
+def stream_ticket(user_command: str) -> StructuredStream:
+    # Lets callers route on department before the reasoning is finished
+    return StructuredStream(get_client(), Ticket, user_command)
+
+if __name__ == "__main__":
+    # User Input
+    user_command = "I'm very hungry! Please help me."
+
+    try:
+        my_ticket = triage_with_gemini(user_command)
 
-    print("Ticket Generated!")
-    print(f"Ticket category: {my_ticket.category}")
-    print(f"Ticket department: {my_ticket.department}")
-    print(f"Reason: {my_ticket.reasoning}")
+        print("Ticket Generated!")
+        print(f"Ticket category: {my_ticket.category}")
+        print(f"Ticket department: {my_ticket.department}")
+        print(f"Reason: {my_ticket.reasoning}")
 
-except Exception as e:
-    print(f"Error: {e}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -2,8 +2,14 @@ from google import genai
 import os
 from google.genai import types
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
 from tools import get_weather
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.tool_registry import ToolRegistry
+from agent_common.response_cache import response_cache
+from agent_common.search_cache import search_cache
+from agent_common.prefetch import MISS, ToolPrefetcher
 
 load_dotenv()
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
@@ -15,84 +21,114 @@ def request_google_search(query: str):
     """
     return "This is a placeholder."
 
-function_map = {
-    "get_weather": get_weather,
-    "request_google_search": request_google_search # Map the dummy tool
-}
+# Declarations are compiled once here, and the registry maps names back to functions
+registry = ToolRegistry([
+    # Custom tool
+    get_weather,
+
+    # Give fake tool to catch google search
+    request_google_search
+])
+
+# Request configs never change, so build them once too
+decision_config = types.GenerateContentConfig(
+    tools=registry.tools,
+    # We keep this disabled so we can handle get_weather manually.
+    # If we use built-in google search it work automatically because it's server-side.
+    automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+)
+
+# Enable tools again for the final answer
+answer_config = types.GenerateContentConfig(tools=registry.tools)
+
+# Tool calls from one model turn run side by side on these threads
+tool_pool = ThreadPoolExecutor(max_workers=8)
+
+# Guesses local tool calls from the query and runs them during the first model call
+prefetcher = ToolPrefetcher(registry)
+
+def google_search(search_query):
+    # Make a call specifically for Google Search, unless we answered it recently
+    answer = search_cache.search(client, search_query)
+    if answer.cached:
+        print(f"Search cache {answer.cached} hit ({answer.age:.0f}s old)")
+    return answer.text
+
+def execute_tool_call(call, prefetched=None):
+    """Run one function call and return the dict we send back as its function_response."""
+
+    try:
+        if call.name == "request_google_search":
+            print("Triggering real google search API...")
+
+            # Grab the query AI wanted to search for
+            search_result = google_search(call.args.get('query'))
+            print(f"Google Search result: {search_result}")
+            return {"result": search_result}
+
+        if call.name not in registry:
+            return {"error": f"Unknown tool: {call.name}"}
+
+        # Already started while the model was thinking? Use that result
+        tool_result = prefetcher.take(prefetched, call) if prefetched else MISS
+        if tool_result is MISS:
+            tool_result = registry.call(call.name, call.args)
+        print(f"Tool result: {tool_result}")
+        return tool_result if isinstance(tool_result, dict) else {"result": tool_result}
+    except Exception as e:
+        # One failing tool shouldn't sink the others; tell the model instead
+        return {"error": str(e)}
 
 def run_agent(user_query):
+    # Start the tools we can guess from the query before asking the model
+    prefetched = prefetcher.start(user_query)
+
     try:
         print(f"User: {user_query}")
 
-        response = client.models.generate_content(
+        response = response_cache.generate_content(
+            client,
             model="gemini-2.5-flash",
             contents=user_query,
-            config=types.GenerateContentConfig(
-                tools=[
-                    # Custom tool
-                    get_weather, 
-                    
-                    # Give fake tool to catch google search
-                    request_google_search
-                ],
-                # We keep this disabled so we can handle get_weather manually.
-                # If we use built-in google search it work automatically because it's server-side.
-                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
-            )
+            config=decision_config
         )
 
         # The AI wants to use tools
         if response.function_calls:
-            for call in response.function_calls:
+            calls = response.function_calls
+            for call in calls:
                 print(f"Agent decided to use custom tool: {call.name}")
-                
-                tool_function = function_map.get(call.name)
-                
-                if call.name == "request_google_search":
-                    print("Triggering real google search API...")
-
-                    # Grab the query AI wanted to search for
-                    search_query = call.args.get('query')
-
-                    # Make a call specifically for Google Search
-                    google_res = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=f"Please answer this using Google Search: {search_query}",
-                        config=types.GenerateContentConfig(
-                            # Enable real built-in tool here
-                            tools=[types.Tool(google_search=types.GoogleSearch())]
-                        )
-                    )
-
-                    # Print the Google answer
-                    print(f"Google Search result: {google_res.text}")
-                else:
-                    tool_result = tool_function(**call.args)
-                    print(f"Tool result: {tool_result}")
-                    
-                    # Send result back
-                    custom_tool_res = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=[
-                            types.Content(role="user", parts=[types.Part(text=user_query)]),
-                            response.candidates[0].content,
-                            types.Content(role="tool", parts=[types.Part(
-                                function_response={
-                                    "name": call.name,
-                                    "response": tool_result
-                                }
-                            )])
-                        ],
-                        # Enable tools again for the final answer
-                        config=types.GenerateContentConfig(
-                            tools=[get_weather, request_google_search]
+
+            # Run every call from this turn at the same time, search included
+            results = list(tool_pool.map(lambda call: execute_tool_call(call, prefetched), calls))
+
+            # Send all results back in one follow-up request
+            custom_tool_res = response_cache.generate_content(
+                client,
+                model="gemini-2.5-flash",
+                contents=[
+                    types.Content(role="user", parts=[types.Part(text=user_query)]),
+                    response.candidates[0].content,
+                    types.Content(role="tool", parts=[
+                        types.Part(
+                            function_response={
+                                "name": call.name,
+                                "response": result
+                            }
                         )
-                    )
-                    print(f"Custom Tool result: {custom_tool_res.text}")
+                        for call, result in zip(calls, results)
+                    ])
+                ],
+                config=answer_config
+            )
+            print(f"Custom Tool result: {custom_tool_res.text}")
         else:
             print(f"Assistant: {response.text}")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        # Drop the guesses the model didn't ask for
+        prefetcher.finish(prefetched)
 
 if __name__ == "__main__":
     # Search (Automatic Google Grounding)
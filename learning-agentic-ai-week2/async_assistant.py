@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+import time
+
+from google.genai import types
+
+from assistant import client, decision_config, registry
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from agent_common.search_cache import search_cache
+
+MODEL = "gemini-2.5-flash"
+
+# Same prebuilt config as run_agent: registry tools, automatic calling off
+agent_config = decision_config
+
+
+async def google_search_async(search_query):
+    # Repeated questions across queries share one grounded answer
+    answer = await search_cache.search_async(client, search_query, model=MODEL)
+    return answer.text
+
+
+async def execute_tool_call_async(call):
+    try:
+        if call.name == "request_google_search":
+            return {"result": await google_search_async(call.args.get("query"))}
+
+        if call.name not in registry:
+            return {"error": f"Unknown tool: {call.name}"}
+
+        # Plain Python tools may block, so give them a worker thread
+        tool_result = await asyncio.to_thread(registry.call, call.name, call.args)
+        return tool_result if isinstance(tool_result, dict) else {"result": tool_result}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def run_agent_async(user_query, max_steps=5):
+    """
+    The run_agent tool loop as a coroutine: ask the model, run the tools it
+    asks for, send the results back, until it answers in plain text.
+    """
+
+    contents = [types.Content(role="user", parts=[types.Part(text=user_query)])]
+
+    for _ in range(max_steps):
+        response = await response_cache.generate_content_async(
+            client,
+            model=MODEL,
+            contents=contents,
+            config=agent_config
+        )
+
+        if not response.function_calls:
+            return response.text
+
+        calls = response.function_calls
+        results = await asyncio.gather(*(execute_tool_call_async(call) for call in calls))
+
+        contents.append(response.candidates[0].content)
+        contents.append(types.Content(role="tool", parts=[
+            types.Part(function_response={"name": call.name, "response": result})
+            for call, result in zip(calls, results)
+        ]))
+
+    return "Stopped: too many tool steps for one query."
+
+
+async def serve(queries, concurrency=32, timeout=60.0, on_result=None):
+    """
+    Answer many queries with at most `concurrency` running at once.
+
+    `queries` can be any iterable (a list, or a generator reading a file);
+    it is consumed lazily. Each query gets `timeout` seconds. on_result is
+    called with one dict per query as soon as it finishes.
+    """
+
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"ok": 0, "timeout": 0, "error": 0}
+    latencies = []
+
+    async def producer():
+        for query_id, query in enumerate(queries):
+            await queue.put((query_id, query))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            query_id, query = item
+            started = time.perf_counter()
+            record = {"id": query_id, "query": query}
+            try:
+                record["answer"] = await asyncio.wait_for(run_agent_async(query), timeout)
+                record["status"] = "ok"
+            except asyncio.TimeoutError:
+                record["status"] = "timeout"
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = str(e)
+
+            elapsed = time.perf_counter() - started
+            record["latency_ms"] = round(elapsed * 1000, 1)
+            latencies.append(elapsed)
+            stats[record["status"]] += 1
+
+            if on_result:
+                on_result(record)
+
+    started = time.perf_counter()
+    await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    total = sum(stats.values())
+    if total:
+        print(f"Served {total} queries in {wall_time:.2f}s ({total / wall_time:.1f} queries/sec): {stats}")
+        print(f"Latency p50: {latencies[total // 2] * 1000:.0f}ms, max: {latencies[-1] * 1000:.0f}ms")
+
+    return stats
+
+
+def read_queries(path):
+    # One query per line; plain text or a JSON string/object with a "query" field
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                yield line
+                continue
+            yield record.get("query", line) if isinstance(record, dict) else str(record)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many agent queries concurrently.")
+    parser.add_argument("input", help="File with one query per line")
+    parser.add_argument("output", help="JSONL file for the answers")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed per query")
+    args = parser.parse_args()
+
+    with open(args.output, "w") as out:
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        asyncio.run(serve(read_queries(args.input), concurrency=args.concurrency, timeout=args.timeout, on_result=write))
@@ -0,0 +1,11 @@
+# The infrastructure every week shares (response cache, gazetteer, tool
+# registry, ...) lives in agent_common/ at the repo root, the same way
+# benchmarks/ does. Importing this module makes that package importable
+# when a script is run from its week folder.
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    # Appended, so a week's own modules still win over anything at the root
+    sys.path.append(REPO_ROOT)
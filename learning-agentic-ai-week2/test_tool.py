@@ -3,28 +3,30 @@ import os
 from google.genai import types
 from dotenv import load_dotenv
 from tools import get_weather
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from agent_common.tool_registry import ToolRegistry
 
 load_dotenv()
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
-# Map: Connect string names to real functions
+# Registry: Connect string names to real functions
 # AI sends the string 'get_weather'. We need to know which function it is.
-function_map = {
-    "get_weather": get_weather,
-}
+# It also reads your docstring once here, instead of on every request.
+registry = ToolRegistry([get_weather])
 
 user_query = "What is the weather like today in New York city?"
 print("User Query:", user_query)
 
 try:
-    response1 = client.models.generate_content(
+    response1 = response_cache.generate_content(
+        client,
         model="gemini-2.5-flash",
         contents=user_query,
 
         config=types.GenerateContentConfig(
-            # We pass the actual Python function here. 
-            # The SDK automatically reads your docstring!
-            tools=[get_weather],
+            # We pass the declarations the registry built from our function
+            tools=registry.tools,
             # This forces the model to PAUSE and give you the tool call request
             automatic_function_calling=types.AutomaticFunctionCallingConfig(
                 disable=True
@@ -40,7 +42,7 @@ try:
             print(f"\nAI wants to call a function: {call.name} with {call.args}")
 
             # Lookup the real function from our map
-            tool_function = function_map.get(call.name)
+            tool_function = registry.get(call.name)
 
             if tool_function:
                 # Execute the function. We unpack the dictionary arguments into the function.
@@ -50,7 +52,8 @@ try:
 
                 # Send the result back to AI
                 # We create a new history containing the result
-                response2 = client.models.generate_content(
+                response2 = response_cache.generate_content(
+                    client,
                     model="gemini-2.5-flash",
                     contents=[
                         # We send the *entire* history back
@@ -69,7 +72,7 @@ try:
                         )])
                     ],
                     config=types.GenerateContentConfig(
-                        tools=[get_weather]
+                        tools=registry.tools
                     )
                 )
 
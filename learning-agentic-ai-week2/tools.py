@@ -1,3 +1,16 @@
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.gazetteer import TTLMemo, default_gazetteer
+
+# Loaded once: a hash map for names/aliases plus a prefix trie (see agent_common/gazetteer.py)
+gazetteer = default_gazetteer()
+
+# Weather per city, remembered until that city's TTL runs out
+weather_memo = TTLMemo()
+
+def fetch_weather(city):
+    # Mock data from agent_common/cities.csv. A real weather API call would go here.
+    return {"temp": city.temp, "condition": city.condition}
+
 # This is a 'Mock' function.
 def get_weather(city: str):
     # Docstring
@@ -11,20 +24,15 @@ def get_weather(city: str):
         dict: A dictionary containing temperature and condition.
     """
 
-    # Normalize input to handle case sensitivity
-    city = city.lower().strip()
-
-    if "london" in city:
-        return {"temp": "15C", "condition": "Cloudy"}
-    elif "tokyo" in city:
-        return {"temp": "12C", "condition": "Rainy"}
-    elif "san francisco" in city:
-        return {"temp": "20C", "condition": "Sunny"}
-    elif "nagpur" in city:
-        return {"temp": "32C", "condition": "Hot"}
-    else:
+    # Normalizes case, accents and punctuation, then looks the city up
+    match = gazetteer.lookup(city)
+
+    if match is None:
         # Default fallback for unknown cities
         return {"temp": "25C", "condition": "Clear"}
+
+    # Copy, so callers can't change the memoized answer
+    return dict(weather_memo.get_or_compute(match.name, lambda: fetch_weather(match), match.ttl))
     
 # Test it manually
 if __name__ == "__main__":
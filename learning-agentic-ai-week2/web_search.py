@@ -1,5 +1,35 @@
 # Failed!
-import wikipedia
+import os
+
+import wiki_index
+
+# Only the live path needs the wikipedia package
+try:
+    import wikipedia
+except ImportError:
+    wikipedia = None
+
+# Point this at a file built with `python wiki_index.py build <dump> <db>` to search offline
+WIKI_INDEX_DB = os.environ.get("WIKI_INDEX_DB")
+
+def search_offline(query: str, db_path: str):
+    """Same answers as search_web, from the local FTS5 index. No network."""
+
+    results = wiki_index.search(db_path, query)
+
+    if not results:
+        return "No results found."
+
+    first_result, abstract = results[0]
+
+    if wiki_index.is_disambiguation(first_result, abstract):
+        # Offer the other top hits, like wikipedia's DisambiguationError options
+        options = [title for title, _ in results[1:]]
+        return f"Ambiguous search. Options: {options[:5]}"
+
+    summary = wiki_index.first_sentences(abstract, 3)
+
+    return f"Page: {first_result}\nSummary: {summary}"
 
 def search_web(query: str):
     """
@@ -13,6 +43,15 @@ def search_web(query: str):
         str: A summary of the Wikipedia page.
     """
     print(f"Searching Wikipedia for: {query}")
+
+    if WIKI_INDEX_DB:
+        try:
+            return search_offline(query, WIKI_INDEX_DB)
+        except Exception as e:
+            return f"Search error: {e}"
+
+    if wikipedia is None:
+        return "Search error: install 'wikipedia' or set WIKI_INDEX_DB to an offline index."
     
     try:
         # 1. Search for the most relevant page
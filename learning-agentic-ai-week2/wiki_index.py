@@ -0,0 +1,176 @@
+import argparse
+import bz2
+import gzip
+import json
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+# Title matches count more than abstract matches when ranking
+TITLE_WEIGHT = 10.0
+ABSTRACT_WEIGHT = 1.0
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Words that match most of the index and say nothing about the topic
+STOPWORDS = frozenset("""
+a an and are as at be by did do does for from how i in is it me of on or tell the
+to was were what when where which who whom why will with you about please
+""".split())
+
+_connections = threading.local()
+
+
+def _open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_abstracts(path):
+    """
+    Stream (title, abstract) pairs from a Wikipedia abstracts dump
+    (enwiki-latest-abstract.xml[.gz|.bz2]) or from a JSONL file
+    (.jsonl[.gz|.bz2]) with "title" and "abstract" fields. Nothing is loaded whole.
+    """
+
+    if path.endswith((".jsonl", ".jsonl.gz", ".jsonl.bz2")):
+        with _open_dump(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["title"], record.get("abstract", "")
+        return
+
+    with _open_dump(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+
+        for event, elem in context:
+            if event != "end" or elem.tag != "doc":
+                continue
+
+            title = (elem.findtext("title") or "").removeprefix("Wikipedia: ").strip()
+            abstract = (elem.findtext("abstract") or "").strip()
+            if title:
+                yield title, abstract
+
+            # Drop the parsed <doc> so memory stays flat over millions of pages
+            root.clear()
+
+
+def build_index(dump_path, db_path, batch_size=10_000):
+    """Build (or rebuild) the SQLite FTS5 index from a dump."""
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("DROP TABLE IF EXISTS pages")
+    conn.execute(
+        "CREATE VIRTUAL TABLE pages USING fts5(title, abstract, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+    count = 0
+    batch = []
+    for title, abstract in iter_abstracts(dump_path):
+        batch.append((title, abstract))
+        if len(batch) >= batch_size:
+            conn.executemany("INSERT INTO pages(title, abstract) VALUES (?, ?)", batch)
+            conn.commit()
+            count += len(batch)
+            batch.clear()
+            print(f"Indexed {count:,} pages...", end="\r")
+
+    if batch:
+        conn.executemany("INSERT INTO pages(title, abstract) VALUES (?, ?)", batch)
+        count += len(batch)
+
+    # Merge the index segments so lookups touch fewer b-trees
+    conn.execute("INSERT INTO pages(pages) VALUES('optimize')")
+    conn.commit()
+    conn.close()
+
+    print(f"Indexed {count:,} pages into {db_path} in {time.perf_counter() - started:.1f}s")
+    return count
+
+
+def _connection(db_path):
+    # One read-only connection per thread and database, reused across lookups
+    cache = getattr(_connections, "by_path", None)
+    if cache is None:
+        cache = _connections.by_path = {}
+    if db_path not in cache:
+        cache[db_path] = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    return cache[db_path]
+
+
+def to_match_query(query, any_word=False):
+    """
+    Free text -> FTS5 query. Every word must match (or any of them, with
+    any_word=True), each quoted so "?" or "-" can't break the syntax.
+    Stopwords are dropped unless the query is nothing but stopwords ("The Who").
+    """
+
+    words = _WORD.findall(query.lower())
+    words = [word for word in words if word not in STOPWORDS] or words
+    return (" OR " if any_word else " AND ").join(f'"{word}"' for word in words)
+
+
+def search(db_path, query, limit=5):
+    """
+    Top `limit` (title, abstract) pairs for a query, best BM25 score first.
+    Pages with every word come first; if there are none, any word will do.
+    """
+
+    for any_word in (False, True):
+        match = to_match_query(query, any_word)
+        if not match:
+            return []
+
+        rows = _connection(db_path).execute(
+            f"SELECT title, abstract FROM pages WHERE pages MATCH ? "
+            f"ORDER BY bm25(pages, {TITLE_WEIGHT}, {ABSTRACT_WEIGHT}) LIMIT ?",
+            (match, limit)
+        ).fetchall()
+        if rows or " " not in match:
+            return rows
+    return rows
+
+
+def is_disambiguation(title, abstract):
+    return title.endswith("(disambiguation)") or "may refer to" in abstract[:200]
+
+
+def first_sentences(text, count=3):
+    return " ".join(_SENTENCE_END.split(text.strip())[:count])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Wikipedia abstracts index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Index an abstracts dump (streamed)")
+    build_parser.add_argument("dump", help="enwiki-latest-abstract.xml[.gz|.bz2] or a .jsonl[.gz|.bz2] file")
+    build_parser.add_argument("db", help="SQLite file to write")
+
+    search_parser = subparsers.add_parser("search", help="Query the index")
+    search_parser.add_argument("db")
+    search_parser.add_argument("query")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.dump, args.db)
+    else:
+        started = time.perf_counter()
+        results = search(args.db, args.query)
+        elapsed = (time.perf_counter() - started) * 1000
+        for title, abstract in results:
+            print(f"- {title}: {first_sentences(abstract, 1)}")
+        print(f"({len(results)} results in {elapsed:.1f}ms)")
@@ -0,0 +1,371 @@
+import csv
+import io
+import itertools
+
+import numpy as np
+
+# Only needed for .parquet files
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_csv = pq = None
+
+# WHO adult BMI bands: below 18.5, 18.5-25, 25-30, 30-35, 35-40, 40 and up
+WHO_EDGES = np.array([18.5, 25.0, 30.0, 35.0, 40.0])
+WHO_LABELS = (
+    "Underweight", "Healthy weight", "Overweight",
+    "Obesity class I", "Obesity class II", "Obesity class III"
+)
+# Category code for rows we couldn't compute
+INVALID = -1
+# Outside these the numbers are computed but flagged: probably cm typed as m, or lb as kg
+PLAUSIBLE_HEIGHT_M = (0.5, 2.8)
+PLAUSIBLE_WEIGHT_KG = (2.0, 400.0)
+
+DEFAULT_CHUNK_ROWS = 250_000
+# Columns process_file adds after the input's own
+RESULT_COLUMNS = ["bmi", "category", "plausible"]
+
+
+class BmiBatch:
+    """
+    BMI for many people at once, one NumPy array per column.
+
+    bmi: float64, NaN where the row is invalid
+    category: int8 index into WHO_LABELS, INVALID (-1) where the row is invalid
+    valid: True where weight and height are finite numbers above zero
+    plausible: valid and inside the PLAUSIBLE_* ranges
+    """
+
+    def __init__(self, bmi, category, valid, plausible):
+        self.bmi = bmi
+        self.category = category
+        self.valid = valid
+        self.plausible = plausible
+
+    def __len__(self):
+        return len(self.bmi)
+
+    def __repr__(self):
+        return f"BmiBatch({len(self)} rows, {int(self.valid.sum())} valid)"
+
+    def labels(self):
+        # The code is shifted by one so INVALID lands on "invalid"
+        return np.array(("invalid",) + WHO_LABELS, dtype=object)[self.category + 1]
+
+    def counts(self):
+        """
+        Plausible rows per WHO band, plus "invalid" and "implausible".
+        Every row is in exactly one of them: a band total never includes a
+        height typed in cm or a weight in lb.
+        """
+
+        per_band = np.bincount(self.category[self.plausible], minlength=len(WHO_LABELS))
+        counts = {"invalid": int((~self.valid).sum())}
+        counts.update(zip(WHO_LABELS, per_band.tolist()))
+        counts["implausible"] = int((self.valid & ~self.plausible).sum())
+        return counts
+
+
+def compute(weight_kg, height_m):
+    """BMI and WHO band for every (weight_kg, height_m) pair. Bad rows are masked, never raised."""
+
+    weight = np.asarray(weight_kg, dtype=np.float64)
+    height = np.asarray(height_m, dtype=np.float64)
+
+    valid = np.isfinite(weight) & np.isfinite(height) & (weight > 0) & (height > 0)
+    # Invalid rows divide by 1 and are then overwritten, so no warnings and no inf
+    safe_height = np.where(valid, height, 1.0)
+    bmi = np.where(valid, weight / (safe_height * safe_height), np.nan)
+
+    category = np.searchsorted(WHO_EDGES, bmi, side="right").astype(np.int8)
+    category[~valid] = INVALID
+
+    plausible = (
+        valid
+        & (height >= PLAUSIBLE_HEIGHT_M[0]) & (height <= PLAUSIBLE_HEIGHT_M[1])
+        & (weight >= PLAUSIBLE_WEIGHT_KG[0]) & (weight <= PLAUSIBLE_WEIGHT_KG[1])
+    )
+    return BmiBatch(bmi, category, valid, plausible)
+
+
+def _parse_rows(records, columns):
+    # Slow path for a chunk with blanks, text or quoting in it: bad cells become NaN
+    data = np.full((len(records), len(columns)), np.nan)
+    for row, fields in enumerate(records):
+        for column, index in enumerate(columns):
+            try:
+                data[row, column] = float(fields[index])
+            except (IndexError, ValueError):
+                pass
+    return data
+
+
+def _csv_line_chunks(path, chunk_rows, weight_col, height_col):
+    # The header first, then (raw lines, weight/height data) per chunk: one data row per line, blank lines included
+    with open(path, "r", newline="") as f:
+        header = next(csv.reader([f.readline()]))
+        try:
+            columns = (header.index(weight_col), header.index(height_col))
+        except ValueError:
+            raise ValueError(f"{path} needs '{weight_col}' and '{height_col}' columns, found {header}") from None
+        yield header
+
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+
+            if any('"' in line for line in lines):
+                # Quoted cells can hold commas and newlines, which loadtxt would split on.
+                # Read on until every quote is closed, so no row is cut in two.
+                while sum(line.count('"') for line in lines) % 2:
+                    line = f.readline()
+                    if not line:
+                        break
+                    lines.append(line)
+                records = list(csv.reader(lines))
+                yield _row_texts(records), _parse_rows(records, columns)
+                continue
+
+            try:
+                if not any(line.strip() for line in lines):
+                    raise ValueError("only blank lines")
+                # C parser, fast when every cell is a plain number
+                data = np.loadtxt(lines, delimiter=",", usecols=columns, ndmin=2, comments=None)
+                if len(data) != len(lines):
+                    # loadtxt skips blank lines; they have to stay, as invalid rows
+                    raise ValueError("blank lines")
+            except ValueError:
+                data = _parse_rows(list(csv.reader(lines)), columns)
+            yield lines, data
+
+
+class _Collector(list):
+    # File-like target for csv.writer that keeps each row as its own string
+    write = list.append
+
+
+def _row_texts(records):
+    # Parsed rows back to CSV text, one string per row (a quoted cell may still hold a newline)
+    rows = _Collector()
+    writer = csv.writer(rows, lineterminator="")
+    for fields in records:
+        writer.writerow(fields)
+    return rows
+
+
+def _csv_chunks(path, chunk_rows, weight_col, height_col):
+    chunks = _csv_line_chunks(path, chunk_rows, weight_col, height_col)
+    next(chunks)
+    for _, data in chunks:
+        yield data[:, 0], data[:, 1]
+
+
+def _parquet_chunks(path, chunk_rows, weight_col, height_col, columns=None):
+    if pq is None:
+        raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)")
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns or [weight_col, height_col]):
+        # Nulls come out as NaN, so they end up masked as invalid
+        yield batch, tuple(
+            batch.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False) for name in (weight_col, height_col)
+        )
+
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, weight_col="weight_kg", height_col="height_m"):
+    """
+    (weight, height) arrays of up to chunk_rows rows each, from a CSV or Parquet file.
+    Rows stay in file order; blank or broken CSV lines come out as NaN.
+    """
+
+    if path.endswith(".parquet"):
+        return (pair for _, pair in _parquet_chunks(path, chunk_rows, weight_col, height_col))
+    return _csv_chunks(path, chunk_rows, weight_col, height_col)
+
+
+def stream(path, chunk_rows=DEFAULT_CHUNK_ROWS, weight_col="weight_kg", height_col="height_m"):
+    """(weight, height, BmiBatch) per chunk; memory stays at one chunk however big the file is."""
+
+    for weight, height in read_chunks(path, chunk_rows, weight_col, height_col):
+        yield weight, height, compute(weight, height)
+
+
+def _result_cells(batch):
+    # The three columns we add, as CSV text
+    labels = batch.labels()
+    return [
+        f"{b:.2f},{label},{int(ok)}" if label != "invalid" else ",invalid,0"
+        for b, label, ok in zip(batch.bmi.tolist(), labels, batch.plausible.tolist())
+    ]
+
+
+def _write_csv_lines(f, lines, batch, width):
+    # Every input line as it was, with the results on the end: other columns and row order carry through.
+    # A blank line gets empty cells, so it still has as many columns as the header.
+    blank = "," * (width - 1)
+    lines = (line.rstrip("\r\n") or blank for line in lines)
+    f.writelines(f"{line},{cells}\n" for line, cells in zip(lines, _result_cells(batch)))
+
+
+def _source_chunks(src, chunk_rows, weight_col, height_col):
+    # The column names first, then (rows as CSV lines or None, rows as an Arrow batch or None, weight, height)
+    if src.endswith(".parquet"):
+        if pq is None:
+            raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        columns = pq.ParquetFile(src).schema_arrow.names
+        yield columns
+        for batch, (weight, height) in _parquet_chunks(src, chunk_rows, weight_col, height_col, columns):
+            yield None, batch, weight, height
+    else:
+        chunks = _csv_line_chunks(src, chunk_rows, weight_col, height_col)
+        yield next(chunks)
+        for lines, data in chunks:
+            yield lines, None, data[:, 0], data[:, 1]
+
+
+def _as_csv_lines(batch):
+    # An Arrow batch as CSV lines without a header, for Parquet in -> CSV out
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_batches([batch]), buffer, pa_csv.WriteOptions(include_header=False))
+    return buffer.getvalue().decode("utf-8").splitlines()
+
+
+def _as_table(header, lines, numbers):
+    # CSV lines as an Arrow table, for CSV in -> Parquet out: weight and height as the
+    # numbers we parsed (null where unreadable), every other column as text
+    columns = [[] for _ in header]
+    for fields in csv.reader(lines):
+        for index, column in enumerate(columns):
+            column.append(fields[index] if index < len(fields) else None)
+    table = {name: pa.array(column, type=pa.string()) for name, column in zip(header, columns)}
+    for name, values in numbers.items():
+        table[name] = pa.array(values, mask=np.isnan(values))
+    return pa.table(table)
+
+
+def process_file(src, dst, chunk_rows=DEFAULT_CHUNK_ROWS, weight_col="weight_kg", height_col="height_m"):
+    """
+    Read src, write every row with its BMI and WHO band to dst (CSV or
+    Parquet, by extension), one chunk at a time. Every input column is kept,
+    and rows stay in input order (blank CSV lines come out as invalid rows).
+    Returns the counts per band (see BmiBatch.counts).
+    """
+
+    totals = dict.fromkeys(("invalid",) + WHO_LABELS + ("implausible",), 0)
+    chunks = _source_chunks(src, chunk_rows, weight_col, height_col)
+    header = next(chunks)
+    clashes = [name for name in RESULT_COLUMNS if name in header]
+    if clashes:
+        raise ValueError(f"{src} already has {clashes} columns; process the original file instead")
+    writer = None
+    f = None
+    try:
+        if dst.endswith(".parquet"):
+            if pq is None:
+                raise ImportError("Writing Parquet needs pyarrow (pip install pyarrow)")
+        else:
+            f = open(dst, "w", newline="")
+            csv.writer(f, lineterminator="\n").writerow(header + RESULT_COLUMNS)
+
+        for lines, rows, weight, height in chunks:
+            batch = compute(weight, height)
+            for key, count in batch.counts().items():
+                totals[key] += count
+
+            if f is not None:
+                _write_csv_lines(f, lines if lines is not None else _as_csv_lines(rows), batch, len(header))
+                continue
+
+            table = rows if rows is not None else _as_table(header, lines, {weight_col: weight, height_col: height})
+            table = pa.Table.from_batches([table]) if isinstance(table, pa.RecordBatch) else table
+            for name, values in zip(RESULT_COLUMNS, (
+                pa.array(batch.bmi, mask=~batch.valid), pa.array(batch.labels().tolist()), pa.array(batch.plausible)
+            )):
+                table = table.append_column(name, values)
+            if writer is None:
+                writer = pq.ParquetWriter(dst, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+        if f is not None:
+            f.close()
+    return totals
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import time
+
+    from tools import calc_bmi
+
+    if len(sys.argv) == 3:
+        # python bmi_engine.py cohort.csv results.csv
+        started = time.perf_counter()
+        print(process_file(sys.argv[1], sys.argv[2]))
+        print(f"Done in {time.perf_counter() - started:.1f}s")
+        sys.exit()
+
+    # A synthetic cohort of 2 million adults, with a few broken rows mixed in
+    rng = np.random.default_rng(7)
+    rows = 2_000_000
+    weight = rng.normal(75, 15, rows).round(1)
+    height = rng.normal(1.70, 0.1, rows).round(2)
+    weight[::10_000] = np.nan
+    height[5::10_000] = 0
+
+    started = time.perf_counter()
+    batch = compute(weight, height)
+    vector_time = time.perf_counter() - started
+
+    def scalar_bmi(weight_kg, height_m):
+        # calc_bmi as it was before this module: plain Python, one person per call
+        try:
+            return f"{weight_kg / (height_m ** 2):.2f}"
+        except Exception:
+            return None
+
+    # Per-person loops, timed on a slice of the clean rows (they're slow)
+    sample = 100_000
+    clean = batch.valid
+    pairs = list(zip(weight[clean][:sample].tolist(), height[clean][:sample].tolist()))
+    print(f"{rows:,} rows, vectorized: {vector_time * 1000:.0f}ms ({rows / vector_time / 1e6:.1f}M rows/s)")
+    for name, function in (("scalar formula", scalar_bmi), ("calc_bmi wrapper", calc_bmi)):
+        started = time.perf_counter()
+        for w, h in pairs:
+            function(w, h)
+        per_row = (time.perf_counter() - started) / len(pairs)
+        print(f"{name:>16} loop: ~{per_row * rows:.1f}s ({1 / per_row / 1e3:.0f}k rows/s), "
+              f"{per_row * rows / vector_time:.0f}x slower than vectorized")
+    print(batch.counts())
+
+    with tempfile.TemporaryDirectory() as workdir:
+        src = os.path.join(workdir, "cohort.csv")
+        with open(src, "w") as f:
+            f.write("id,weight_kg,height_m\n")
+            f.writelines(f"{i},{w},{h}\n" for i, (w, h) in enumerate(zip(weight.tolist(), height.tolist())))
+
+        started = time.perf_counter()
+        totals = process_file(src, os.path.join(workdir, "results.csv"))
+        elapsed = time.perf_counter() - started
+        print(f"CSV in -> CSV out: {elapsed:.1f}s ({rows / elapsed / 1e3:.0f}k rows/s), {totals['invalid']:,} invalid rows")
+
+        # Quoted cells may hold commas and newlines; they must not shift or split a row
+        quoted = os.path.join(workdir, "quoted.csv")
+        with open(quoted, "w", newline="") as f:
+            f.write('note,weight_kg,height_m\n"x,1,2,y",72,1.78\n"two\nlines, too",80,1.8\n\nplain,60,1.7\n')
+        for chunk_rows in (1, 2, DEFAULT_CHUNK_ROWS):
+            out = os.path.join(workdir, "quoted_out.csv")
+            process_file(quoted, out, chunk_rows=chunk_rows)
+            with open(out, newline="") as f:
+                result = list(csv.reader(f))
+            assert [row[0] for row in result] == ["note", "x,1,2,y", "two\nlines, too", "", "plain"], result
+            assert [row[3] for row in result[1:]] == ["22.72", "24.69", "", "20.76"], result
+            weight = np.concatenate([w for w, _, _ in stream(quoted, chunk_rows)])
+            assert np.array_equal(weight, [72, 80, np.nan, 60], equal_nan=True), weight
+        print("Quoted cells (commas, newlines) and blank lines keep their rows.")
@@ -0,0 +1,357 @@
+import datetime
+import os
+import threading
+import time
+import uuid
+
+from google.genai import types
+
+from context_window import TokenCounter
+
+# Gemini won't cache less than this (2.5 Flash; 2.5 Pro needs 4096)
+DEFAULT_MIN_TOKENS = 1024
+DEFAULT_TTL = 60 * 60
+# Extend the cache when it has less than this many seconds left
+RENEW_MARGIN = 5 * 60
+
+
+def _stable_prefix_length(history):
+    # Everything before the last user message; the current turn is the part that still changes
+    for index in range(len(history) - 1, -1, -1):
+        if history[index].role == "user" and any(part.text for part in history[index].parts or []):
+            return index
+    return 0
+
+
+class ContextCache:
+    """
+    Keep the persona, the tools and the settled part of the conversation in
+    a Gemini cached-content entry, and send only the new messages.
+
+    - the cache is created once persona + prefix reach min_tokens
+      (smaller caches are refused by the API)
+    - when the uncached part of the prefix has grown by refresh_tokens,
+      a new cache with the longer prefix replaces the old one
+    - the TTL is extended automatically while the agent is in use;
+      an expired or missing cache is simply rebuilt
+    - record(response) tallies prompt tokens vs tokens served from the cache
+
+    Only worth it for agents that send their whole history (persona_agent).
+    With a short window (persistent_agent, fitness_bot: persona + 12
+    messages) the stable prefix never reaches min_tokens, so no cache would
+    ever be created; those agents send plain requests instead.
+
+    Usage:
+        context_cache = ContextCache(client, model, system_instruction=persona, tools=tools)
+        contents, config = context_cache.request(history, automatic_function_calling=...)
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        context_cache.record(response)
+    """
+
+    def __init__(self, client, model, system_instruction=None, tools=None, ttl=DEFAULT_TTL,
+                 min_tokens=DEFAULT_MIN_TOKENS, refresh_tokens=2048, counter=None):
+        self.client = client
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.refresh_tokens = refresh_tokens
+        # Thresholds only need an estimate, so no count_tokens calls here
+        self.counter = counter or TokenCounter(model=model)
+
+        self.lock = threading.Lock()
+        self.name = None
+        self.expires_at = 0.0
+        # The exact Content objects in the cache, to check the history still starts with them
+        self.cached = []
+        self.cached_tokens = 0
+        self._base_tokens = None
+        self._disabled_until = 0.0
+
+        self.stats = {
+            "requests": 0, "cached_requests": 0, "creates": 0, "renewals": 0,
+            "deletes": 0, "errors": 0, "prompt_tokens": 0, "cached_tokens": 0
+        }
+
+    def base_tokens(self):
+        # Persona and tool declarations, counted once
+        if self._base_tokens is None:
+            text = self.system_instruction or ""
+            for tool in self.tools or []:
+                for declaration in getattr(tool, "function_declarations", None) or []:
+                    text += f"\n{declaration.name}: {declaration.description or ''}"
+            self._base_tokens = self.counter.count(text)
+        return self._base_tokens
+
+    def _prefix_tokens(self, contents):
+        return self.base_tokens() + sum(self.counter.count_content(content) for content in contents)
+
+    def _matches(self, history):
+        cached = self.cached
+        return len(history) >= len(cached) and all(a is b for a, b in zip(history, cached))
+
+    def request(self, history, **config):
+        """(contents, config) for the next generate_content call on `history`."""
+
+        with self.lock:
+            self.stats["requests"] += 1
+            now = time.time()
+
+            if self.name and (now >= self.expires_at or not self._matches(history)):
+                # History was rewritten (or the cache ran out): this cache is no use any more
+                self._drop()
+
+            stable = history[:_stable_prefix_length(history)]
+            if now >= self._disabled_until:
+                grown = self._prefix_tokens(stable[len(self.cached):]) - self.base_tokens() if self.name else 0
+                if self.name is None and self._prefix_tokens(stable) >= self.min_tokens:
+                    self._create(stable)
+                elif self.name and grown >= self.refresh_tokens:
+                    self._create(stable)
+
+            if self.name and self.expires_at - now < RENEW_MARGIN:
+                self._renew()
+
+            if self.name is None:
+                # Plain request: persona and tools travel with every call
+                return list(history), types.GenerateContentConfig(
+                    system_instruction=self.system_instruction,
+                    tools=self.tools,
+                    **config
+                )
+
+            self.stats["cached_requests"] += 1
+            return history[len(self.cached):], types.GenerateContentConfig(cached_content=self.name, **config)
+
+    def _create(self, prefix):
+        old_name = self.name
+        try:
+            cache = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    contents=list(prefix) or None,
+                    system_instruction=self.system_instruction,
+                    tools=self.tools,
+                    ttl=f"{self.ttl}s",
+                    display_name="agent-context"
+                )
+            )
+        except Exception as e:
+            # Too small, unsupported model, no network... send full requests for a while
+            self.stats["errors"] += 1
+            self._disabled_until = time.time() + 60
+            print(f"Context cache unavailable, sending full prompts. Error: {e}")
+            return
+
+        self.name = cache.name
+        self.expires_at = time.time() + self.ttl
+        self.cached = list(prefix)
+        usage = cache.usage_metadata
+        self.cached_tokens = usage.total_token_count if usage and usage.total_token_count else self._prefix_tokens(prefix)
+        self.stats["creates"] += 1
+
+        if old_name:
+            self._delete(old_name)
+
+    def _renew(self):
+        try:
+            self.client.caches.update(name=self.name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+            self.expires_at = time.time() + self.ttl
+            self.stats["renewals"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+            self._drop()
+
+    def _delete(self, name):
+        try:
+            self.client.caches.delete(name=name)
+            self.stats["deletes"] += 1
+        except Exception:
+            # It expires on its own anyway
+            self.stats["errors"] += 1
+
+    def _drop(self):
+        if self.name:
+            self._delete(self.name)
+        self.name = None
+        self.cached = []
+        self.cached_tokens = 0
+
+    def record(self, response):
+        usage = response.usage_metadata
+        if usage is None:
+            return
+        with self.lock:
+            self.stats["prompt_tokens"] += usage.prompt_token_count or 0
+            self.stats["cached_tokens"] += usage.cached_content_token_count or 0
+
+    def close(self):
+        with self.lock:
+            self._drop()
+
+    def summary(self):
+        prompt = self.stats["prompt_tokens"]
+        cached = self.stats["cached_tokens"]
+        share = cached / prompt if prompt else 0.0
+        return (
+            f"Context cache: {prompt:,} prompt tokens, {cached:,} served from cache ({share:.0%}), "
+            f"{prompt - cached:,} billed at the full rate; {self.stats['creates']} caches created"
+        )
+
+
+class LocalCacheService:
+    """
+    Offline stand-in for client.caches: create/get/update/delete with TTLs,
+    holding the cached persona, tools and contents in memory.
+    """
+
+    def __init__(self, counter=None):
+        self.counter = counter or TokenCounter()
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def _cached_content(self, name, entry):
+        return types.CachedContent(
+            name=name,
+            model=entry["model"],
+            expire_time=datetime.datetime.fromtimestamp(entry["expires_at"], datetime.timezone.utc),
+            usage_metadata=types.CachedContentUsageMetadata(total_token_count=entry["tokens"])
+        )
+
+    def _ttl_seconds(self, ttl):
+        return float(str(ttl or f"{DEFAULT_TTL}s").rstrip("s"))
+
+    def create(self, *, model, config=None):
+        contents = list(config.contents or []) if config else []
+        instruction = config.system_instruction if config else None
+        tokens = sum(self.counter.count_content(content) for content in contents)
+        tokens += self.counter.count(instruction if isinstance(instruction, str) else "")
+
+        with self.lock:
+            # Unique across processes: the name ends up in response cache keys on disk
+            name = f"cachedContents/local-{uuid.uuid4().hex}"
+            self.entries[name] = {
+                "model": model,
+                "contents": contents,
+                "system_instruction": instruction,
+                "tools": config.tools if config else None,
+                "tokens": tokens,
+                "expires_at": time.time() + self._ttl_seconds(config.ttl if config else None)
+            }
+            return self._cached_content(name, self.entries[name])
+
+    def get(self, *, name, config=None):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or entry["expires_at"] <= time.time():
+                self.entries.pop(name, None)
+                raise KeyError(f"Cached content not found: {name}")
+            return self._cached_content(name, entry)
+
+    def update(self, *, name, config=None):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or entry["expires_at"] <= time.time():
+                raise KeyError(f"Cached content not found: {name}")
+            entry["expires_at"] = time.time() + self._ttl_seconds(config.ttl if config else None)
+            return self._cached_content(name, entry)
+
+    def delete(self, *, name, config=None):
+        with self.lock:
+            self.entries.pop(name, None)
+
+    def expand(self, config):
+        """The cached entry behind config.cached_content, as the server would use it."""
+
+        with self.lock:
+            entry = self.entries.get(config.cached_content)
+            if entry is None or entry["expires_at"] <= time.time():
+                raise KeyError(f"Cached content not found: {config.cached_content}")
+            return entry
+
+
+class LocalCachingModels:
+    """client.models wrapper that resolves cached_content through a LocalCacheService."""
+
+    def __init__(self, models, caches):
+        self.inner = models
+        self.caches = caches
+
+    def generate_content(self, *, model, contents, config=None):
+        cached_tokens = 0
+        if config is not None and config.cached_content:
+            entry = self.caches.expand(config)
+            if isinstance(contents, str):
+                contents = [types.Content(role="user", parts=[types.Part(text=contents)])]
+            contents = entry["contents"] + list(contents)
+            config = config.model_copy(update={
+                "cached_content": None,
+                "system_instruction": entry["system_instruction"],
+                "tools": entry["tools"]
+            })
+            cached_tokens = entry["tokens"]
+
+        response = self.inner.generate_content(model=model, contents=contents, config=config)
+
+        # Report usage the way the API does: the full prompt, and how much of it came from the cache
+        counter = self.caches.counter
+        if isinstance(contents, str):
+            prompt_tokens = counter.count(contents)
+        else:
+            prompt_tokens = sum(counter.count_content(content) for content in contents)
+        if config is not None and isinstance(config.system_instruction, str):
+            prompt_tokens += counter.count(config.system_instruction)
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            cached_content_token_count=cached_tokens or None,
+            candidates_token_count=response.usage_metadata.candidates_token_count if response.usage_metadata else None
+        )
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class LocalCachingClient:
+    """Wrap any client (a real one, or a fake) so context caching runs fully offline."""
+
+    def __init__(self, client):
+        self.inner = client
+        self.caches = LocalCacheService()
+        self.models = LocalCachingModels(client.models, self.caches)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def caching_client(client):
+    # LOCAL_CONTEXT_CACHE=1 swaps client.caches for the in-memory stand-in, for offline runs
+    if os.environ.get("LOCAL_CONTEXT_CACHE"):
+        return LocalCachingClient(client)
+    return client
+
+
+if __name__ == "__main__":
+    from types import SimpleNamespace
+
+    class EchoModels:
+        def generate_content(self, *, model, contents, config=None):
+            return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+                role="model", parts=[types.Part(text="Affirmative. " * 30)]
+            ))])
+
+    persona = "You are 'Orbit', a futuristic AI assistant for space travelers. " * 40
+    client = LocalCachingClient(SimpleNamespace(models=EchoModels()))
+    context_cache = ContextCache(client, "gemini-2.5-flash", system_instruction=persona, counter=TokenCounter())
+
+    history = []
+    for turn in range(1, 201):
+        history.append(types.Content(role="user", parts=[types.Part(text=f"Status report {turn}, please. " * 10)]))
+        contents, config = context_cache.request(history)
+        response = client.models.generate_content(model="gemini-2.5-flash", contents=contents, config=config)
+        context_cache.record(response)
+        history.append(response.candidates[0].content)
+
+        if turn in (10, 50, 200):
+            print(f"turn {turn:>3}: sent {len(contents)} of {len(history) - 1} messages. {context_cache.summary()}")
@@ -0,0 +1,287 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+
+# Rough rule of thumb for English text, used when nothing better is available
+CHARS_PER_TOKEN = 4
+# Role markers and separators the API adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation.
+Keep names, facts the user shared, decisions and open questions. Drop small talk.
+Write at most {words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+def _text_of(content):
+    return "\n".join(part.text for part in content.parts or [] if part.text)
+
+
+class TokenCounter:
+    """
+    Count tokens without a network call.
+
+    1. the SDK's LocalTokenizer, if sentencepiece is installed
+    2. otherwise len(text) / 4
+    3. only with use_api=True: client.models.count_tokens before the estimate,
+       once per distinct text (cached). It is a blocking round trip, so leave
+       it off on the chat path.
+    """
+
+    def __init__(self, client=None, model="gemini-2.5-flash", use_api=False, max_entries=10_000):
+        self.client = client
+        self.model = model
+        self.use_api = use_api and client is not None
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"local": 0, "api": 0, "estimated": 0, "cached": 0}
+
+        self.tokenizer = None
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+            self.tokenizer = LocalTokenizer(model_name=model)
+        except Exception:
+            # Optional: needs sentencepiece and a one-time tokenizer download
+            pass
+
+    def remember(self, text, tokens):
+        # Exact counts we got for free (usage_metadata) go straight into the cache
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        with self.lock:
+            self.cache[key] = tokens
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def count(self, text):
+        if not text:
+            return 0
+
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        with self.lock:
+            tokens = self.cache.get(key)
+            if tokens is not None:
+                self.cache.move_to_end(key)
+                self.stats["cached"] += 1
+                return tokens
+
+        tokens = self._count_uncached(text)
+        self.remember(text, tokens)
+        return tokens
+
+    def _count_uncached(self, text):
+        if self.tokenizer is not None:
+            try:
+                self.stats["local"] += 1
+                return self.tokenizer.count_tokens(text).total_tokens
+            except Exception:
+                self.tokenizer = None
+
+        if self.use_api:
+            try:
+                result = self.client.models.count_tokens(model=self.model, contents=text)
+                self.stats["api"] += 1
+                return result.total_tokens
+            except Exception:
+                # No network, no key, or a fake client: stop trying
+                self.use_api = False
+
+        self.stats["estimated"] += 1
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def count_content(self, content):
+        return self.count(_text_of(content)) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    Keep what we send to the model under max_tokens, however long the chat gets.
+
+    The newest turns go verbatim. When they no longer fit, the oldest
+    user/model exchanges are taken out and folded into a running summary
+    by a background thread, so the request never waits for it. The summary
+    is sent as the system instruction.
+
+    Usage:
+        window = ContextWindow(client, max_tokens=4000)
+        window.add(user_content)
+        response = client.models.generate_content(
+            model=..., contents=window.contents(), config=window.config()
+        )
+        window.add(response.candidates[0].content, tokens=...)
+    """
+
+    def __init__(self, client, model="gemini-2.5-flash", max_tokens=4000, summary_tokens=500, counter=None,
+                 max_pending=200, use_cache=True):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        # The summary may take at most a quarter of the window
+        self.summary_tokens = min(summary_tokens, max_tokens // 4)
+        self.max_pending = max_pending
+        self.use_cache = use_cache
+        self.counter = counter or TokenCounter(client, model)
+
+        self.lock = threading.Lock()
+        # [(content, tokens)], oldest first
+        self.turns = []
+        self.turn_tokens = 0
+        self.summary = ""
+        self.summary_token_count = 0
+        # Taken out of the window, waiting to be folded into the summary
+        self.pending = []
+
+        self.summarizer = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"summaries": 0, "folded_turns": 0, "summary_errors": 0, "dropped_turns": 0}
+
+    @property
+    def verbatim_budget(self):
+        # Room for the summary is kept aside, so the total stays under max_tokens
+        return self.max_tokens - self.summary_tokens
+
+    def add(self, content, tokens=None):
+        """Append one message. `tokens` can be an exact count, e.g. from usage_metadata."""
+
+        if tokens is None:
+            tokens = self.counter.count_content(content)
+        else:
+            self.counter.remember(_text_of(content), tokens)
+            tokens += MESSAGE_OVERHEAD_TOKENS
+
+        with self.lock:
+            self.turns.append((content, tokens))
+            self.turn_tokens += tokens
+            folded = self._evict()
+
+        if folded:
+            self.summarizer.submit(self._fold)
+
+    def _evict(self):
+        # Drop whole exchanges from the front, so the window still starts with a user message
+        folded = False
+        while self.turn_tokens > self.verbatim_budget and len(self.turns) > 1:
+            end = 1
+            while end < len(self.turns) - 1 and self.turns[end][0].role != "user":
+                end += 1
+            for content, tokens in self.turns[:end]:
+                self.pending.append(content)
+                self.turn_tokens -= tokens
+            del self.turns[:end]
+            folded = True
+
+        # If summaries keep failing, don't let the next summary prompt grow forever
+        overflow = len(self.pending) - self.max_pending
+        if overflow > 0:
+            del self.pending[:overflow]
+            self.stats["dropped_turns"] += overflow
+        return folded
+
+    def _fold(self):
+        with self.lock:
+            batch = list(self.pending)
+            summary = self.summary
+        if not batch:
+            return
+
+        messages = "\n".join(f"{content.role}: {_text_of(content)}" for content in batch)
+        prompt = SUMMARY_PROMPT.format(
+            words=int(self.summary_tokens * 0.6),
+            summary=summary or "(none yet)",
+            messages=messages
+        )
+
+        try:
+            response = response_cache.generate_content(
+                self.client,
+                model=self.model,
+                contents=prompt,
+                use_cache=self.use_cache
+            )
+            new_summary = (response.text or "").strip()
+        except Exception as e:
+            # Keep the turns pending; the next fold tries again with them included
+            self.stats["summary_errors"] += 1
+            print(f"Summary failed, will retry later. Error: {e}")
+            return
+
+        tokens = self.counter.count(new_summary)
+        if tokens > self.summary_tokens:
+            # The model went long; cut it so the ceiling still holds
+            new_summary = new_summary[:self.summary_tokens * CHARS_PER_TOKEN]
+            tokens = self.counter.count(new_summary)
+
+        with self.lock:
+            self.summary = new_summary
+            self.summary_token_count = min(tokens, self.summary_tokens)
+            # Anything dropped meanwhile was at the front, so remove by identity
+            folded = {id(content) for content in batch}
+            self.pending = [content for content in self.pending if id(content) not in folded]
+            self.stats["summaries"] += 1
+            self.stats["folded_turns"] += len(batch)
+
+    def contents(self):
+        with self.lock:
+            return [content for content, _ in self.turns]
+
+    def config(self, **kwargs):
+        """A GenerateContentConfig carrying the summary (and anything else passed in)."""
+
+        with self.lock:
+            summary = self.summary
+        if summary:
+            kwargs["system_instruction"] = "Summary of the earlier conversation:\n" + summary
+        return types.GenerateContentConfig(**kwargs) if kwargs else None
+
+    def token_count(self):
+        with self.lock:
+            return self.turn_tokens + self.summary_token_count
+
+    def wait(self):
+        # Block until every queued summary is done (handy in tests and before exit)
+        self.summarizer.submit(lambda: None).result()
+
+
+if __name__ == "__main__":
+    import time
+    from types import SimpleNamespace
+
+    # A summarizer that takes 10ms, to show the ceiling holding over a long chat
+    class SummaryModels:
+        def generate_content(self, *, model, contents, config=None):
+            time.sleep(0.01)
+            return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+                role="model",
+                parts=[types.Part(text="User is Yash, training for a 10k, asked about diet and sleep.")]
+            ))])
+
+    fake_client = SimpleNamespace(models=SummaryModels())
+    window = ContextWindow(fake_client, max_tokens=2000, summary_tokens=300, counter=TokenCounter(), use_cache=False)
+    sent, full = [], 0
+
+    for turn in range(1, 1001):
+        user = types.Content(role="user", parts=[types.Part(text=f"Question {turn}: " + "how should I plan this week? " * 6)])
+        reply = types.Content(role="model", parts=[types.Part(text="Here is a plan for you. " * 20)])
+        window.add(user)
+        sent.append(window.token_count())
+        full += window.counter.count_content(user)
+        window.add(reply)
+        full += window.counter.count_content(reply)
+
+        if turn in (10, 100, 1000):
+            window.wait()
+            print(
+                f"turn {turn:>4}: full history ~{full:>7,} tokens, sent {window.token_count():>5,} "
+                f"(max seen {max(sent):,}, ceiling {window.max_tokens:,}), summaries {window.stats['summaries']}"
+            )
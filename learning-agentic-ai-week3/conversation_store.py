@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from history_codec import pack, unpack
+from journal import ChatJournal
+
+DEFAULT_USER = "default"
+DEFAULT_SESSION = "default"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def file_id(value):
+    """
+    A user or session id as a file name part: a readable slug plus a hash of
+    the raw id, so "john_doe" and "john.doe" (or "John" and "john" on a
+    case-insensitive disk) never share a file.
+    """
+
+    value = str(value)
+    slug = _UNSAFE.sub("_", value)[:40]
+    return f"{slug}-{hashlib.sha256(value.encode('utf-8')).hexdigest()[:12]}"
+
+
+class JournalStore:
+    """
+    One ChatJournal file per (user, session). The default user and session
+    keep the original single file (mission_log.jsonl), so nothing changes
+    for a one-person setup; other users get mission_log.<user>.<session>.jsonl.
+    """
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self.legacy_path = legacy_path
+
+    def session(self, user_id=DEFAULT_USER, session_id=DEFAULT_SESSION):
+        if user_id == DEFAULT_USER and session_id == DEFAULT_SESSION:
+            return ChatJournal(self.path, legacy_path=self.legacy_path)
+
+        base, ext = os.path.splitext(self.path)
+        return ChatJournal(f"{base}.{file_id(user_id)}.{file_id(session_id)}{ext}")
+
+
+class SQLiteStore:
+    """
+    Every user's sessions in one SQLite database (WAL mode).
+
+    - sessions: one row per (user_id, session name)
+    - turns: (session, seq) -> role + parts, clustered by that key so
+      "last N messages of this session" is one short index range scan.
+      parts is a history_codec blob (msgpack, zstd for long messages);
+      rows written as JSON text by older versions still load.
+
+    WAL lets many readers run while one writer commits; each turn's messages
+    go in as one transaction. Connections are per thread, so agents for
+    different users can run on a thread pool.
+
+    Several agents can share one database: with a namespace ("mission_log",
+    "fitness_log") their session names are stored as "<namespace>:<name>",
+    so their conversations never mix. legacy_paths (a journal .jsonl or an
+    old .json array) are imported once into the default user's default
+    session, the first time it is loaded empty.
+
+    Usage:
+        store = SQLiteStore("conversations.db")
+        session = store.session("user-42", "fitness")
+        history = session.load(last=40)
+        session.append([{"role": "user", "parts": [{"text": "Hi"}]}])
+    """
+
+    def __init__(self, path="conversations.db", busy_timeout_ms=5_000, namespace=None, legacy_paths=()):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.namespace = namespace
+        self.legacy_paths = list(legacy_paths)
+        self._local = threading.local()
+
+        conn = self.connection()
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    next_seq INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    UNIQUE (user_id, name)
+                );
+                CREATE TABLE IF NOT EXISTS turns (
+                    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    parts TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID;
+            """)
+
+    def connection(self):
+        # One connection per thread, reused for every call on that thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _prefix(self):
+        return f"{self.namespace}:" if self.namespace else ""
+
+    def session(self, user_id=DEFAULT_USER, session_id=DEFAULT_SESSION):
+        # Same rule as JournalStore: only the default conversation inherits the old files
+        default = user_id == DEFAULT_USER and session_id == DEFAULT_SESSION
+        return SQLiteSession(
+            self, str(user_id), f"{self._prefix()}{session_id}", legacy_paths=self.legacy_paths if default else ()
+        )
+
+    def session_id(self, user_id, name):
+        conn = self.connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR IGNORE INTO sessions(user_id, name, created, updated) VALUES (?, ?, ?, ?)",
+            (user_id, name, now, now)
+        )
+        return conn.execute(
+            "SELECT id FROM sessions WHERE user_id = ? AND name = ?", (user_id, name)
+        ).fetchone()[0]
+
+    def sessions(self, user_id):
+        """Session names for one user, most recently used first."""
+
+        prefix = self._prefix()
+        rows = self.connection().execute(
+            "SELECT name FROM sessions WHERE user_id = ? ORDER BY updated DESC", (user_id,)
+        )
+        return [name[len(prefix):] for (name,) in rows if name.startswith(prefix)]
+
+
+def _load_parts(parts):
+    # Old rows are JSON text, new ones binary
+    if isinstance(parts, bytes):
+        return unpack(parts)[0]
+    return json.loads(parts)
+
+
+class SQLiteSession:
+    """One conversation inside a SQLiteStore; same methods as ChatJournal."""
+
+    def __init__(self, store, user_id, name, legacy_paths=()):
+        self.store = store
+        self.user_id = user_id
+        self.name = name
+        self.legacy_paths = legacy_paths
+        self.id = store.session_id(user_id, name)
+        # Lowest seq handed out by load()/load_older(), and the lowest seq in the session
+        self._loaded_start = None
+        self._first_seq = None
+
+    def _rows(self, rows):
+        return [{"role": role, "parts": _load_parts(parts)} for role, parts in rows]
+
+    def load(self, last=None, max_tokens=None):
+        conn = self.store.connection()
+        bounds = "SELECT coalesce(min(seq), 0), coalesce(max(seq) + 1, 0) FROM turns WHERE session_id = ?"
+        self._first_seq, next_seq = conn.execute(bounds, (self.id,)).fetchone()
+        if next_seq == 0 and self._import_legacy():
+            self._first_seq, next_seq = conn.execute(bounds, (self.id,)).fetchone()
+        entries, self._loaded_start = self._before(next_seq, last, max_tokens)
+        return entries
+
+    def _import_legacy(self):
+        # The chat from before the switch to SQLite: the journal, or else the old JSON array
+        for path in self.legacy_paths:
+            if not os.path.exists(path):
+                continue
+            print(f"SQLite store: importing {path} into {self.store.path}...")
+            try:
+                if path.endswith(".json"):
+                    with open(path, "r") as f:
+                        entries = json.load(f)
+                else:
+                    journal = ChatJournal(path)
+                    entries = journal.load()
+                    journal.close()
+            except (OSError, ValueError) as e:
+                print(f"SQLite store: could not read {path}. Error: {e}")
+                continue
+            self.append([entry for entry in entries if "role" in entry])
+            return True
+        return False
+
+    def load_older(self, count=None, max_tokens=None):
+        if self._loaded_start is None:
+            return []
+        entries, self._loaded_start = self._before(self._loaded_start, count, max_tokens)
+        return entries
+
+    def _before(self, end_seq, count, max_tokens):
+        # Newest first with a LIMIT, so only the rows we return are read
+        query = "SELECT seq, role, parts FROM turns WHERE session_id = ? AND seq < ? ORDER BY seq DESC"
+        params = [self.id, end_seq]
+        if count is not None:
+            query += " LIMIT ?"
+            params.append(count)
+
+        rows = []
+        budget = None if max_tokens is None else max_tokens * 4
+        for seq, role, parts in self.store.connection().execute(query, params):
+            if budget is not None:
+                budget -= len(parts)
+                if budget < 0 and rows:
+                    break
+            rows.append((seq, role, parts))
+
+        rows.reverse()
+        start = rows[0][0] if rows else end_seq
+        return self._rows((role, parts) for _, role, parts in rows), start
+
+    def older_pages(self, count):
+        # Same as ChatJournal.older_pages: its own cursor, load_older() is not moved
+        end_seq = self._loaded_start
+        while end_seq is not None and end_seq > self._first_seq:
+            entries, end_seq = self._before(end_seq, count, None)
+            if not entries:
+                return
+            yield entries
+
+    @property
+    def has_older(self):
+        return self._loaded_start is not None and self._loaded_start > self._first_seq
+
+    def approx_tokens(self):
+        # Same estimate as ChatJournal: stored bytes / 4
+        (size,) = self.store.connection().execute(
+            "SELECT coalesce(sum(length(parts)), 0) FROM turns WHERE session_id = ?", (self.id,)
+        ).fetchone()
+        return size // 4
+
+    def append(self, entries):
+        """All messages from one turn, in one transaction."""
+
+        if not entries:
+            return
+
+        conn = self.store.connection()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two writers to one session can't pick the same seq
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (next_seq,) = conn.execute("SELECT next_seq FROM sessions WHERE id = ?", (self.id,)).fetchone()
+            conn.executemany(
+                "INSERT INTO turns(session_id, seq, role, parts, created) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.id, next_seq + i, entry["role"], pack(entry["parts"]), now)
+                    for i, entry in enumerate(entries)
+                ]
+            )
+            conn.execute(
+                "UPDATE sessions SET next_seq = ?, updated = ? WHERE id = ?",
+                (next_seq + len(entries), now, self.id)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reset(self):
+        conn = self.store.connection()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (self.id,))
+        self._loaded_start = self._first_seq = None
+
+
+def open_store(path, legacy_path=None):
+    """
+    The store the agents use: SQLite when CHAT_STORE_DB points at a database
+    file, otherwise the JSONL journal at `path`.
+    """
+
+    db_path = os.environ.get("CHAT_STORE_DB")
+    if db_path:
+        # One database for every agent, each in its own namespace ("mission_log", "fitness_log")
+        namespace = os.path.splitext(os.path.basename(path))[0]
+        return SQLiteStore(db_path, namespace=namespace, legacy_paths=[p for p in (path, legacy_path) if p])
+    return JournalStore(path, legacy_path)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Many users chatting at once: every worker thread appends a turn, then reloads the tail
+    users, turns_per_user, threads = 10_000, 5, 16
+    message = {"role": "model", "parts": [{"text": "Copy that. Trajectory calculated. " * 4}]}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = SQLiteStore(os.path.join(workdir, "conversations.db"))
+
+        def one_user(user):
+            session = store.session(f"user-{user}", "mission")
+            session.load(last=40)
+            for turn in range(turns_per_user):
+                session.append([{"role": "user", "parts": [{"text": f"turn {turn}"}]}, message])
+            return len(session.load(last=4))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            loaded = list(pool.map(one_user, range(users)))
+        elapsed = time.perf_counter() - started
+
+        total_turns = users * turns_per_user
+        print(
+            f"{users:,} users x {turns_per_user} turns on {threads} threads: {elapsed:.2f}s "
+            f"({total_turns / elapsed:,.0f} turns/sec, {len(loaded)} tail loads)"
+        )
+        print(f"Sessions for user-7: {store.sessions('user-7')}")
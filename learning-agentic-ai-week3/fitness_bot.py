@@ -1,10 +1,20 @@
-import json
+import itertools
 from google import genai
 import os
 from google.genai import types 
 from dotenv import load_dotenv
 
 from tools import calc_bmi
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import DEFAULT_CACHE_DIR, response_cache
+from agent_common.search_cache import search_cache
+from agent_common.prefetch import MISS, ToolPrefetcher
+from agent_common.tool_registry import ToolRegistry
+from context_window import TokenCounter
+from conversation_store import DEFAULT_SESSION, DEFAULT_USER, open_store
+from history_codec import content_to_record, record_to_content
+from vector_memory import GeminiEmbedder, HashEmbedder, VectorMemory, memory_path, turn_texts
+from user_profile import ProfileStore
 
 load_dotenv()
 
@@ -17,23 +27,65 @@ Your tone is simple, calm and like a supportive big brother.
 According to the need you can call request_google_search when there is a need of live events, facts and current info.
 """
 
-chat_file = "fitness_log.json"
+chat_file = "fitness_log.jsonl"
+legacy_file = "fitness_log.json"
+# Messages loaded at startup and sent with each request; the profile and recall carry older facts
+memory_window = 12
+# Past turns recalled from vector memory for each question
+recall_k = 3
+# Log entries read per step when indexing an old log into vector memory
+backfill_page = 500
 
-function_map = {
-    "calc_bmi": calc_bmi
-}
+# JSONL journal by default; set CHAT_STORE_DB=conversations.db to keep every user in SQLite
+chat_store = open_store(chat_file, legacy_file)
+# One small JSON profile per user (profiles/<user>-<hash>.json), shared with the other agents
+profile_store = ProfileStore()
 
 class Coach:
-    def __init__(self):
+    def __init__(self, user_id=DEFAULT_USER, session_id=DEFAULT_SESSION, store=None):
         self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
         self.model = "gemini-2.5-flash"
 
-        self.tools_config = [
+        # Declarations are compiled once per coach and reused by every request
+        self.registry = ToolRegistry([
             self.request_google_search,
             calc_bmi
-        ]
+        ])
+        self.tools_config = self.registry.tools
+
+        # Token estimates for the context log line; no API calls.
+        # No context cache here: persona + tools + a 12-message window stay well under
+        # the 1024 tokens Gemini needs before it will cache anything
+        self.counter = TokenCounter(model=self.model)
+
+        # "I weigh 72 kg and I am 1.78 m" -> calc_bmi starts before the model asks
+        self.prefetcher = ToolPrefetcher(self.registry)
+
+        # This user's conversation; each save writes just the new messages
+        self.user_id = user_id
+        self.memory = (store or chat_store).session(user_id, session_id)
+
+        # Every past turn as a vector, so old facts (like the last BMI) can be found without replaying the log
+        self.vector_memory = VectorMemory(
+            memory_path(os.path.join(DEFAULT_CACHE_DIR, "vector_memory"), user_id, session_id),
+            GeminiEmbedder(self.client),
+            fallback=HashEmbedder()
+        )
 
         self.history = self.load_memory()
+        self.saved_count = len(self.history)
+
+        if self.vector_memory.is_new:
+            # First run with vector memory: index the existing log once, a page at a time, in the background
+            self.vector_memory.backfill(itertools.chain(
+                [list(self.history)],
+                (self.to_contents(page) for page in self.memory.older_pages(backfill_page))
+            ))
+
+        # Name, height, weight and last BMI as a typed profile, instead of re-reading the transcript
+        self.profile = profile_store.load(user_id)
+        # Rough size of the whole conversation, to show what the profile + window saves (estimated, no API calls)
+        self.transcript_tokens = self.memory.approx_tokens()
 
     def request_google_search(self, query: str):
         """
@@ -43,42 +95,88 @@ class Coach:
         return "placeholder"
     
     def save_memory(self):
-        serializable_history = []
-
-        for item in self.history:
-            text_parts = []
-            for part in item.parts:
-                if part.text:
-                    text_parts.append({'text': part.text})
-
-            if text_parts:
-                serializable_history.append({
-                    'role': item.role,
-                    'parts': text_parts
-                })
-        
-        with open(chat_file, "w") as f:
-            json.dump(serializable_history, f, indent=2)
+        # Full messages, tool turns included, so the BMI isn't recalculated after a restart
+        new_messages = self.history[self.saved_count:]
+        serializable_history = [content_to_record(item) for item in new_messages]
+
+        self.memory.append(serializable_history)
+        self.vector_memory.add(new_messages)
+        # Facts from this turn: what the user typed, and calc_bmi's inputs and result
+        if self.profile.learn_from_turn(new_messages):
+            profile_store.save(self.user_id, self.profile)
+        self.transcript_tokens += sum(self.counter.count_content(item) for item in new_messages)
+        self.saved_count = len(self.history)
+        self.trim_history()
+
+    def trim_history(self):
+        # Once the history is twice the window, drop the older half in one go.
+        # Those turns stay on disk and in vector memory. Cutting in one go, not a
+        # message per turn, keeps the context cache valid until the next cut.
+        if len(self.history) <= 2 * memory_window:
+            return
+
+        cut = len(self.history) - memory_window
+        # The history has to start with a user message
+        while cut < len(self.history) and not (
+            self.history[cut].role == 'user' and any(part.text for part in self.history[cut].parts)
+        ):
+            cut += 1
+        if cut < len(self.history):
+            del self.history[:cut]
+            self.saved_count -= cut
+
+    def recall(self, user_query):
+        # The past turns closest to this question, except the ones still in the history
+        hits = self.vector_memory.search(user_query, k=recall_k, exclude=turn_texts(self.history))
+        if not hits:
+            return None
+        return "Notes from earlier conversations (use them if relevant):\n" + "\n\n".join(text for _, text in hits)
+
+    def with_notes(self, notes, query_index):
+        # Notes ride along in this request's user message only; they are never saved
+        if not notes:
+            return self.history
+        contents = list(self.history)
+        query = contents[query_index]
+        contents[query_index] = types.Content(role='user', parts=[types.Part(text=notes)] + list(query.parts))
+        return contents
+
+    def log_context_tokens(self, request_history):
+        # What this request carries (profile + recent window) vs replaying the whole transcript.
+        # Both are local estimates, so the log line costs no API calls
+        counter = self.counter
+        sent = sum(counter.count_content(item) for item in request_history)
+        full = self.transcript_tokens + counter.count_content(self.history[-1])
+        print(f"Context: {sent:,} tokens sent instead of {full:,} for the full transcript ({full - sent:,} saved)")
 
     def load_memory(self):
-        if os.path.exists(chat_file):
-            print("Fitness log found. Loading previous fitness data...")
+        try:
+            # Only the most recent messages; older ones stay on disk until asked for
+            data = self.memory.load(last=memory_window)
+            # Conversations have to start with a user message
+            while data and data[0].get("role") != "user" and self.memory.has_older:
+                data[:0] = self.memory.load_older(1)
+        except Exception as e:
+            print(f"Corrupt log file. Starting fresh. Error: {e}")
+            return []
 
+        print("Fitness log found. Loading previous fitness data..." if data else "No previous logs. Initialing fresh plan.")
+        return self.to_contents(data)
+
+    def load_older_memory(self, count=memory_window):
+        older = self.to_contents(self.memory.load_older(count))
+        self.history[:0] = older
+        self.saved_count += len(older)
+        return len(older)
+
+    def to_contents(self, data):
+        restored_history = []
+        for item in data:
             try:
-                with open(chat_file, "r") as f:
-                    data = json.load(f)
-                    restored_history = []
-                    for item in data:
-                        parts = [types.Part(text=p['text']) for p in item['parts'] if 'text' in p]
-
-                        if parts:
-                            restored_history.append(types.Content(role=item['role'], parts=parts))
-                    return restored_history
-            except Exception as e:
-                print(f"Corrupt log file. Starting fresh. Error: {e}")
-        else:
-            print("No previous logs. Initialing fresh plan.")
-            return []
+                restored_history.append(record_to_content(item))
+            except ValueError as e:
+                print(f"Skipping an unreadable log entry. Error: {e}")
+        return restored_history
     
     def chat(self, user_query: str):
         print(f"User: {user_query}")
@@ -86,11 +184,20 @@ class Coach:
         self.history.append(
             types.Content(role='user', parts=[types.Part(text=user_query)])
         )
+        query_index = len(self.history) - 1
+        # The profile always goes along; recalled turns only when something matches
+        notes = "\n\n".join(filter(None, [self.profile.block(), self.recall(user_query)]))
+
+        prefetched = self.prefetcher.start(user_query)
 
         try:
-            response = self.client.models.generate_content(
+            # We inject 'system_instruction' into the config
+            request_history = self.with_notes(notes, query_index)
+            self.log_context_tokens(request_history)
+            response = response_cache.generate_content(
+                self.client,
                 model=self.model,
-                contents=self.history,
+                contents=request_history,
                 config=types.GenerateContentConfig(
                     tools=self.tools_config,
                     automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
@@ -102,23 +209,26 @@ class Coach:
                 for call in response.function_calls:
                     print(f"AI itent: calling {call.name} with {call.args}")
 
-                    tool_function = function_map.get(call.name)
+                    tool_function = self.registry.get(call.name)
 
                     if call.name == "request_google_search":
                         search_query = call.args.get('query')
                         print(f"Searching for {user_query}")
 
-                        google_res = self.client.models.generate_content(
+                        # Same question asked recently? Reuse the grounded answer
+                        google_res = search_cache.search(
+                            self.client,
+                            search_query,
                             model=self.model,
-                            contents=f"Answer this using google search {search_query}",
-                            config=types.GenerateContentConfig(
-                                tools=[types.Tool(google_search=types.GoogleSearch())]
-                            )
+                            prompt="Answer this using google search {query}"
                         )
 
                         final_output = f"(Via google search): {google_res.text}"
                     else:
-                        tool_res = tool_function(**call.args)
+                        # Use the prefetched result when we guessed this call right
+                        tool_res = self.prefetcher.take(prefetched, call)
+                        if tool_res is MISS:
+                            tool_res = tool_function(**call.args)
                         print(f"Tool result: {tool_res}")
 
                         self.history.append(response.candidates[0].content)
@@ -135,9 +245,10 @@ class Coach:
                             )
                         )
 
-                        final_res = self.client.models.generate_content(
+                        final_res = response_cache.generate_content(
+                            self.client,
                             model=self.model,
-                            contents=self.history,
+                            contents=self.with_notes(notes, query_index),
                             config=types.GenerateContentConfig(
                                 tools=self.tools_config,
                                 system_instruction=persona
@@ -160,14 +271,16 @@ class Coach:
             return final_output
         except Exception as e:
             print(f"Error: {e}")
+        finally:
+            self.prefetcher.finish(prefetched)
 
 if __name__ == "__main__":
     coach = Coach()
 
-    # print(f"Coach: {coach.chat("Hi! My name is Yash.")}")
+    # print(f"Coach: {coach.chat('Hi! My name is Yash.')}")
 
-    # print(f"Coach: {coach.chat("My height is 5m and weight is 60kg.")}")
+    # print(f"Coach: {coach.chat('My height is 5m and weight is 60kg.')}")
 
-    # print(f"Coach: {coach.chat("Who is the prime minister of India?")}")
+    # print(f"Coach: {coach.chat('Who is the prime minister of India?')}")
 
-    print(f"Bot: {coach.chat("What is my name? Do you remember? Also tell my previous bmi count.")}")
+    print(f"Bot: {coach.chat('What is my name? Do you remember? Also tell my previous bmi count.')}")
@@ -0,0 +1,221 @@
+import json
+import os
+import struct
+import zlib
+
+from pydantic import ValidationError
+from google.genai import types
+
+# Both are optional: without them we fall back to compact JSON and zlib
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every blob starts with: magic, format version, body encoding, compression
+MAGIC = b"GCH"
+HEADER = struct.Struct("<3sBBB")
+FORMAT_VERSION = 1
+
+BODY_JSON = 0
+BODY_MSGPACK = 1
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_ZSTD = 2
+
+# Compressing a single short message costs more than it saves
+MIN_COMPRESS_BYTES = 256
+
+# Older format version -> function that upgrades its records to the next version.
+# Add an entry here whenever FORMAT_VERSION goes up.
+UPGRADES = {}
+
+
+def content_to_record(content):
+    """
+    A types.Content as plain dicts/lists/strings, every part kept:
+    text, function_call, function_response, inline data (base64), thought signatures...
+    """
+
+    return content.model_dump(mode="json", exclude_none=True)
+
+
+def _drop_unknown_fields(model, record):
+    # A newer SDK may have written fields this one doesn't know; drop them instead of failing
+    while True:
+        try:
+            return model.model_validate(record)
+        except ValidationError as e:
+            unknown = [error["loc"] for error in e.errors() if error["type"] == "extra_forbidden"]
+            if not unknown:
+                raise
+            for loc in unknown:
+                parent = record
+                for key in loc[:-1]:
+                    parent = parent[key]
+                parent.pop(loc[-1], None)
+
+
+def record_to_content(record):
+    """
+    Back to a types.Content. Also reads the old text-only records,
+    {"role": ..., "parts": [{"text": ...}]}, which are a subset of the same shape.
+    """
+
+    return _drop_unknown_fields(types.Content, record)
+
+
+def _compress(body, compress):
+    if not compress or len(body) < MIN_COMPRESS_BYTES:
+        return COMPRESS_NONE, body
+    if zstandard is not None:
+        return COMPRESS_ZSTD, zstandard.ZstdCompressor(level=3).compress(body)
+    return COMPRESS_ZLIB, zlib.compress(body, 6)
+
+
+def _decompress(method, body):
+    if method == COMPRESS_NONE:
+        return body
+    if method == COMPRESS_ZLIB:
+        return zlib.decompress(body)
+    if method == COMPRESS_ZSTD:
+        if zstandard is None:
+            raise ValueError("This history is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unknown compression method {method}")
+
+
+def pack(value, compress=True):
+    """Any JSON-style value (e.g. records) as a versioned, compact blob."""
+
+    if msgpack is not None:
+        encoding, body = BODY_MSGPACK, msgpack.packb(value, use_bin_type=True)
+    else:
+        encoding, body = BODY_JSON, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    method, body = _compress(body, compress)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, encoding, method) + body
+
+
+def unpack(data):
+    """The value stored by pack(), plus the format version it was written with."""
+
+    if len(data) < HEADER.size:
+        raise ValueError("Not a history blob: too short")
+    magic, version, encoding, method = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a history blob: bad magic bytes")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"History format v{version} is newer than this code (v{FORMAT_VERSION}); please update")
+
+    body = _decompress(method, bytes(data[HEADER.size:]))
+    if encoding == BODY_MSGPACK:
+        if msgpack is None:
+            raise ValueError("This history is msgpack-encoded; install the msgpack package to read it")
+        value = msgpack.unpackb(body, raw=False)
+    elif encoding == BODY_JSON:
+        value = json.loads(body)
+    else:
+        raise ValueError(f"Unknown body encoding {encoding}")
+    return value, version
+
+
+def encode_history(contents, compress=True):
+    return pack([content_to_record(content) for content in contents], compress)
+
+
+def decode_history(data):
+    records, version = unpack(data)
+    # Bring records written by an older format up to date, one version at a time
+    while version < FORMAT_VERSION:
+        records = UPGRADES[version](records)
+        version += 1
+    return [record_to_content(record) for record in records]
+
+
+def save_history(path, contents, compress=True):
+    # Write to a temp file and swap it in, so a crash never leaves half a file
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_history(contents, compress))
+    os.replace(temp_path, path)
+
+
+def load_history(path):
+    with open(path, "rb") as f:
+        return decode_history(f.read())
+
+
+if __name__ == "__main__":
+    import time
+
+    # A fitness chat where every third turn calls a tool
+    history = []
+    for turn in range(300):
+        history.append(types.Content(role="user", parts=[types.Part(text=f"Turn {turn}: I'm 1.75m and {60 + turn % 20}kg, what's my BMI?")]))
+        if turn % 3 == 0:
+            history.append(types.Content(role="model", parts=[types.Part(
+                function_call=types.FunctionCall(name="calc_bmi", args={"weight": 60 + turn % 20, "height": 1.75}),
+                thought_signature=os.urandom(64)
+            )]))
+            history.append(types.Content(role="tool", parts=[types.Part(
+                function_response=types.FunctionResponse(name="calc_bmi", response={"result": round((60 + turn % 20) / 1.75 ** 2, 2)})
+            )]))
+        history.append(types.Content(role="model", parts=[types.Part(text="Your BMI is in the healthy range. Keep up the training! " * 3)]))
+
+    def text_only_json(contents):
+        # What save_memory wrote before: indented JSON, text parts only
+        return json.dumps([
+            {"role": c.role, "parts": [{"text": p.text} for p in c.parts if p.text]} for c in contents
+        ], indent=4).encode("utf-8")
+
+    def full_json(contents):
+        return json.dumps([content_to_record(c) for c in contents], indent=4).encode("utf-8")
+
+    def timed(function, repeat=20):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        return result, (time.perf_counter() - started) / repeat
+
+    # Whole history in one blob (encode_history / save_history)
+    print(f"{len(history)} messages, msgpack={'yes' if msgpack else 'no'}, zstd={'yes' if zstandard else 'no'}")
+    formats = [
+        ("indented JSON, text only", lambda: text_only_json(history), lambda data: [record_to_content(r) for r in json.loads(data)]),
+        ("indented JSON, full", lambda: full_json(history), lambda data: [record_to_content(r) for r in json.loads(data)]),
+        ("snapshot, uncompressed", lambda: encode_history(history, compress=False), decode_history),
+        ("snapshot, compressed", lambda: encode_history(history), decode_history),
+    ]
+    for name, encode, decode in formats:
+        data, encode_time = timed(encode)
+        restored, decode_time = timed(lambda: decode(data))
+        print(
+            f"{name:<26} {len(data):>8,} bytes   encode {len(history) / encode_time:>9,.0f} msgs/s   "
+            f"decode {len(history) / decode_time:>9,.0f} msgs/s"
+        )
+
+    # What the agents actually store: SQLiteStore keeps one blob per message (pack(parts)),
+    # so most rows are under MIN_COMPRESS_BYTES and only msgpack vs JSON matters
+    records = [content_to_record(c) for c in history]
+    row_formats = [
+        ("JSON text", lambda: [json.dumps(r["parts"]) for r in records], json.loads),
+        ("pack(parts)", lambda: [pack(r["parts"]) for r in records], lambda blob: unpack(blob)[0]),
+    ]
+    print(f"\nPer-row blobs, as SQLiteStore writes them (compressed when >= {MIN_COMPRESS_BYTES} bytes):")
+    for name, encode, decode in row_formats:
+        rows, encode_time = timed(encode)
+        _, decode_time = timed(lambda: [decode(row) for row in rows])
+        compressed = sum(1 for row in rows if isinstance(row, bytes) and row[5] != COMPRESS_NONE)
+        print(
+            f"{name:<26} {sum(len(row) for row in rows):>8,} bytes   encode {len(rows) / encode_time:>9,.0f} msgs/s   "
+            f"decode {len(rows) / decode_time:>9,.0f} msgs/s   ({compressed} of {len(rows)} rows compressed)"
+        )
+
+    assert decode_history(encode_history(history)) == history
+    print("Round trip keeps every part, tool turns included.")
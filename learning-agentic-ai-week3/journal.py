@@ -0,0 +1,489 @@
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+
+# When to force appended lines onto the disk
+FSYNC_ALWAYS = "always"      # after every append (one per turn)
+FSYNC_INTERVAL = "interval"  # at most every fsync_interval seconds
+FSYNC_NEVER = "never"        # leave it to the OS
+
+# Offset index next to the log: a header, then one uint64 per line
+INDEX_MAGIC = b"CJIDX001"
+# Marks a {"reset": true} line inside the index, so resets are found without reading the log
+RESET_FLAG = 1 << 63
+_RESET_PREFIX = b'{"reset"'
+
+# Rough rule of thumb for English/JSON text
+BYTES_PER_TOKEN = 4
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class ChatJournal:
+    """
+    Append-only JSONL log of chat history entries.
+
+    Each turn writes only its new entries, one JSON object per line, so a
+    save costs the same at turn 10 and at turn 10,000. The file is:
+
+        {"role": "user", "parts": [{"text": "..."}]}
+        {"role": "model", "parts": [{"text": "..."}]}
+        {"reset": true}          <- written by reset(); older lines are dead
+
+    Next to it, <path>.idx holds the byte offset of every line. load() can
+    then jump (through mmap) straight to the last N entries or the last K
+    tokens, and load_older() reads earlier entries only when asked, so
+    startup stays flat however big the log gets.
+
+    - load() drops a half-written last line left by a crash, and truncates
+      the file back to the last complete line
+    - a missing or stale index is rebuilt by one pass over the log
+    - once dead lines (before a reset) outnumber live ones, a background
+      thread compacts the file into just the live entries
+    - a legacy JSON array file (the old save format) is imported on first load
+
+    Usage:
+        journal = ChatJournal("mission_log.jsonl", legacy_path="mission_log.json")
+        history = journal.load(last=40)
+        older = journal.load_older(20)
+        for page in journal.older_pages(500):   # e.g. to index old turns, without moving load_older()
+            ...
+        journal.append([{"role": "user", "parts": [{"text": "Hi"}]}])
+    """
+
+    def __init__(self, path, fsync=FSYNC_ALWAYS, fsync_interval=1.0, legacy_path=None, min_dead_lines=100):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.legacy_path = legacy_path
+        self.min_dead_lines = min_dead_lines
+
+        self.lock = threading.Lock()
+        self._file = None
+        self._index_file = None
+        self._last_fsync = 0.0
+
+        # Start offset of every line (RESET_FLAG set on resets), and the log size they describe
+        self.offsets = array("Q")
+        self._size = 0
+        # First line after the last reset, and the first line load()/load_older() handed out
+        self._live_start = 0
+        self._loaded_start = 0
+
+        # Lines appended while a compaction is copying the file
+        self._compacting = None
+        self._compactor = None
+
+        self.stats = {
+            "appends": 0, "bytes_written": 0, "fsyncs": 0, "compactions": 0,
+            "torn_bytes": 0, "index_rebuilds": 0, "lines_read": 0
+        }
+
+    def load(self, last=None, max_tokens=None):
+        """
+        Read the live entries at the end of the log: all of them, the last
+        `last` entries, or as many recent ones as fit in `max_tokens`.
+        Call once, before the first append.
+        """
+
+        with self.lock:
+            if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+                self._import_legacy()
+
+            self._read_index()
+            self._live_start = self._find_live_start()
+
+            start = self._tail_start(len(self.offsets), last, max_tokens)
+            entries = self._read_lines(start, len(self.offsets))
+            self._loaded_start = start
+            self._open()
+
+        self._maybe_compact()
+        return entries
+
+    def load_older(self, count=None, max_tokens=None):
+        """The entries just before the ones already loaded, oldest first."""
+
+        with self.lock:
+            end = self._loaded_start
+            start = self._tail_start(end, count, max_tokens)
+            entries = self._read_lines(start, end)
+            self._loaded_start = start
+        return entries
+
+    def older_pages(self, count):
+        """
+        Everything before the entries loaded so far, `count` entries per page,
+        newest page first. A separate cursor: load_older() is not moved.
+        """
+
+        with self.lock:
+            end = self._loaded_start
+            compactions = self.stats["compactions"]
+        while True:
+            with self.lock:
+                # A compaction renumbers the lines; stop rather than read the wrong ones
+                if self.stats["compactions"] != compactions:
+                    return
+                start = self._tail_start(end, count, None)
+                entries = self._read_lines(start, end)
+            if start >= end:
+                return
+            yield entries
+            end = start
+
+    @property
+    def has_older(self):
+        return self._loaded_start > self._live_start
+
+    def approx_tokens(self):
+        # Size of the whole live conversation, from byte offsets alone: nothing is read
+        with self.lock:
+            start = self._offset(self._live_start) if self._live_start < len(self.offsets) else self._size
+            return (self._size - start) // BYTES_PER_TOKEN
+
+    def _tail_start(self, end, count, max_tokens):
+        start = self._live_start
+        if count is not None:
+            start = max(start, end - count)
+
+        if max_tokens is not None:
+            # Walk back until the next line would go over the budget (always keep one)
+            budget = max_tokens * BYTES_PER_TOKEN
+            line = end
+            while line > start:
+                size = self._line_end(line - 1) - self._offset(line - 1)
+                if size > budget and line < end:
+                    break
+                budget -= size
+                line -= 1
+            start = line
+
+        return start
+
+    def _offset(self, line):
+        return self.offsets[line] & ~RESET_FLAG
+
+    def _line_end(self, line):
+        return self._offset(line + 1) if line + 1 < len(self.offsets) else self._size
+
+    def _find_live_start(self):
+        # The flag lives in the top byte of each offset, so search just those bytes, in C
+        top_byte = 7 if sys.byteorder == "little" else 0
+        flags = self.offsets.tobytes()[top_byte::8]
+        return flags.rfind(b"\x80") + 1
+
+    def _read_lines(self, start, end):
+        if start >= end:
+            return []
+
+        entries = []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Only the pages for these lines are touched
+            for line in range(start, end):
+                if self.offsets[line] & RESET_FLAG:
+                    continue
+                try:
+                    entries.append(json.loads(data[self._offset(line):self._line_end(line)]))
+                except ValueError:
+                    # A damaged line in the middle: skip it, keep the rest
+                    continue
+
+        self.stats["lines_read"] += end - start
+        return entries
+
+    def _read_index(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        offsets = array("Q")
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                if f.read(len(INDEX_MAGIC)) == INDEX_MAGIC:
+                    data = f.read()
+                    offsets.frombytes(data[:len(data) // offsets.itemsize * offsets.itemsize])
+
+        if offsets and not self._index_matches(offsets, size):
+            print("Journal: offset index is out of date, rebuilding it...")
+            self.stats["index_rebuilds"] += 1
+            offsets = array("Q")
+
+        # Re-check the last indexed line and index anything written after it
+        scan_from = 0
+        if offsets:
+            scan_from = offsets.pop() & ~RESET_FLAG
+        known_lines = len(offsets)
+        good_end = self._scan(scan_from, size, offsets)
+
+        if good_end < size:
+            self.stats["torn_bytes"] += size - good_end
+            print(f"Journal: dropped a torn last line ({size - good_end} bytes).")
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+
+        self.offsets = offsets
+        self._size = good_end
+        if len(offsets) != known_lines + 1 or good_end < size:
+            self._write_index()
+
+    def _index_matches(self, offsets, size):
+        # Offsets must start at 0, fit inside the log and each land right after a newline
+        if offsets[0] != 0 or (offsets[-1] & ~RESET_FLAG) >= max(size, 1):
+            return False
+        with open(self.path, "rb") as f:
+            for line in range(max(1, len(offsets) - 3), len(offsets)):
+                f.seek((offsets[line] & ~RESET_FLAG) - 1)
+                if f.read(1) != b"\n":
+                    return False
+        return True
+
+    def _scan(self, start, end, offsets):
+        # Index complete lines from `start`; returns where the last complete line ends
+        position = start
+        if start >= end:
+            return position
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Crash in the middle of a write: this line never finished
+                    break
+                offsets.append(position | RESET_FLAG if line.startswith(_RESET_PREFIX) else position)
+                position += len(line)
+        return position
+
+    def _write_index(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            self.offsets.tofile(f)
+        os.replace(tmp_path, self.index_path)
+
+    def _import_legacy(self):
+        print(f"Journal: importing {self.legacy_path} into {self.path}...")
+        try:
+            with open(self.legacy_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Journal: could not read {self.legacy_path}, starting fresh. Error: {e}")
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for entry in entries:
+                f.write(_encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        if self._index_file is None:
+            self._index_file = open(self.index_path, "ab")
+
+    def _sync(self, force=False):
+        now = time.monotonic()
+        if self.fsync == FSYNC_NEVER and not force:
+            return
+        if self.fsync == FSYNC_INTERVAL and not force and now - self._last_fsync < self.fsync_interval:
+            return
+        # Only the log; the index can always be rebuilt from it
+        os.fsync(self._file.fileno())
+        self._last_fsync = now
+        self.stats["fsyncs"] += 1
+
+    def append(self, entries):
+        """Write new history entries to the end of the journal."""
+
+        if not entries:
+            return
+
+        lines = [_encode(entry) for entry in entries]
+        data = b"".join(lines)
+
+        with self.lock:
+            self._open()
+            self._file.write(data)
+            self._file.flush()
+            self._sync()
+
+            first_new = len(self.offsets)
+            for line in lines:
+                self.offsets.append(self._size | RESET_FLAG if line.startswith(_RESET_PREFIX) else self._size)
+                self._size += len(line)
+                if line.startswith(_RESET_PREFIX):
+                    self._live_start = self._loaded_start = len(self.offsets)
+            self._index_file.write(self.offsets[first_new:].tobytes())
+            self._index_file.flush()
+
+            if self._compacting is not None:
+                self._compacting.extend(lines)
+
+            self.stats["appends"] += 1
+            self.stats["bytes_written"] += len(data)
+
+        self._maybe_compact()
+
+    def reset(self):
+        """Forget everything so far (the old lines are removed at the next compaction)."""
+
+        self.append([{"reset": True}])
+
+    def _maybe_compact(self):
+        with self.lock:
+            busy = self._compactor is not None and self._compactor.is_alive()
+            live_lines = len(self.offsets) - self._live_start
+            if busy or self._live_start < max(self.min_dead_lines, live_lines):
+                return
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """Rewrite the file with only the live lines. Appends keep working meanwhile."""
+
+        with self.lock:
+            first_line = self._live_start
+            copy_from = self._offset(first_line) if first_line < len(self.offsets) else self._size
+            copy_to = self._size
+            self._compacting = []
+
+        # The slow part runs without the lock: new lines go to the old file and to _compacting
+        tmp_path = f"{self.path}.compact"
+        with open(self.path, "rb") as source, open(tmp_path, "wb") as target:
+            source.seek(copy_from)
+            remaining = copy_to - copy_from
+            while remaining > 0:
+                chunk = source.read(min(_COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                target.write(chunk)
+                remaining -= len(chunk)
+
+        with self.lock:
+            # Catch up on what was appended while we were copying, then swap files
+            with open(tmp_path, "ab") as target:
+                for line in self._compacting:
+                    target.write(line)
+                target.flush()
+                os.fsync(target.fileno())
+            self._compacting = None
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+
+            # Same lines, shifted to the front of the file
+            self.offsets = array("Q", (
+                ((offset & ~RESET_FLAG) - copy_from) | (offset & RESET_FLAG)
+                for offset in self.offsets[first_line:]
+            ))
+            self._size -= copy_from
+            self._live_start -= first_line
+            self._loaded_start = max(0, self._loaded_start - first_line)
+            self._write_index()
+            self._open()
+
+            self.stats["compactions"] += 1
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        with self.lock:
+            if self._file is not None:
+                self._sync(force=True)
+                self._file.close()
+                self._file = None
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+
+
+def _encode(entry):
+    return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+if __name__ == "__main__":
+    import gc
+    import tempfile
+    import tracemalloc
+
+    entry = {"role": "model", "parts": [{"text": "Copy that. Trajectory calculated. " * 8}]}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Cost per save as the session grows: full JSON rewrite vs journal append
+        journal = ChatJournal(os.path.join(workdir, "log.jsonl"), fsync=FSYNC_NEVER)
+        journal.load()
+        history = []
+        rewrite_path = os.path.join(workdir, "log.json")
+
+        for turns in (100, 1_000, 5_000):
+            while len(history) < turns:
+                history.append(entry)
+                journal.append([entry])
+
+            started = time.perf_counter()
+            with open(rewrite_path, "w") as f:
+                json.dump(history, f, indent=2)
+            rewrite = time.perf_counter() - started
+
+            started = time.perf_counter()
+            journal.append([entry])
+            append = time.perf_counter() - started
+            history.append(entry)
+
+            print(
+                f"{turns:>6,} entries: rewrite {rewrite * 1000:7.2f}ms ({os.path.getsize(rewrite_path):,} bytes), "
+                f"append {append * 1000:.3f}ms"
+            )
+
+        # Startup cost as the log grows: everything vs the last 40 entries
+        for total in (10_000, 100_000, 300_000):
+            while len(history) < total:
+                batch = [entry] * min(10_000, total - len(history))
+                history.extend(batch)
+                journal.append(batch)
+            journal.close()
+
+            def load_once(kwargs):
+                reader = ChatJournal(journal.path)
+                try:
+                    return reader.load(**kwargs)
+                finally:
+                    reader.close()
+
+            for label, kwargs in (("full", {}), ("last 40", {"last": 40}), ("4k tokens", {"max_tokens": 4000})):
+                # Timed without tracemalloc, which slows every allocation down
+                started = time.perf_counter()
+                loaded = load_once(kwargs)
+                elapsed = time.perf_counter() - started
+                count = len(loaded)
+                # Free this result first, so the next load doesn't run (or get measured) next to it
+                del loaded
+                gc.collect()
+
+                tracemalloc.start()
+                load_once(kwargs)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                gc.collect()
+
+                print(
+                    f"{total:>7,} entries ({os.path.getsize(journal.path) / 1e6:5.1f}MB), load {label:<9}: "
+                    f"{count:>7,} entries in {elapsed * 1000:8.1f}ms, peak {peak / 1e6:6.1f}MB"
+                )
+
+        # A crash mid-write leaves half a line behind
+        with open(journal.path, "ab") as f:
+            f.write(b'{"role": "user", "parts": [{"te')
+        recovered = ChatJournal(journal.path)
+        print(f"Recovered {len(recovered.load(last=10))} entries after a torn write")
+        recovered.close()
@@ -3,40 +3,56 @@ import os
 from google.genai import types
 from dotenv import load_dotenv
 
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from context_window import ContextWindow
+
 load_dotenv()
 
 class ChatSession:
-    def __init__(self):
+    def __init__(self, max_context_tokens=4000):
         self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
         self.model = "gemini-2.5-flash"
 
         # The 'State': This list holds the entire conversation
         self.history = []
 
+        # What we actually send: newest turns + a running summary, under a fixed token ceiling
+        self.window = ContextWindow(self.client, self.model, max_tokens=max_context_tokens)
+
     def send_message(self, user_query):
         """
-        Takes user input, adds it to history, send ALL history to AI, and stores the AI response.
+        Takes user input, adds it to history, sends the context window to AI, and stores the AI response.
         """
 
-        # Add the user's message to our local history
-        self.history.append(
-            types.Content(
-                role="user",
-                parts=[types.Part(text=user_query)]
-            )
+        user_content = types.Content(
+            role="user",
+            parts=[types.Part(text=user_query)]
         )
 
+        # Add the user's message to our local history
+        self.history.append(user_content)
+        self.window.add(user_content)
+
         try:
-            print(f"Sending {len(self.history)} messages to the brain...")
+            contents = self.window.contents()
+            print(f"Sending {len(contents)} of {len(self.history)} messages (~{self.window.token_count()} tokens) to the brain...")
 
-            response = self.client.models.generate_content(
+            response = response_cache.generate_content(
+                self.client,
                 model=self.model,
-                contents=self.history
+                contents=contents,
+                config=self.window.config()
             )
 
             # Add the AI's response to our local history
             self.history.append(response.candidates[0].content)
 
+            # The reply's exact size comes free with the response
+            usage = response.usage_metadata
+            reply_tokens = usage.candidates_token_count if usage else None
+            self.window.add(response.candidates[0].content, tokens=reply_tokens)
+
             return response.text
         
         except Exception as e:
@@ -47,10 +63,10 @@ if __name__ == "__main__":
     bot = ChatSession()
 
     print("--Turn 1--")
-    print(f"Bot: {bot.send_message("Hi, My name is Yash.")}")
+    print(f"Bot: {bot.send_message('Hi, My name is Yash.')}")
 
     print("--Turn 2--")
-    print(f"Bot: {bot.send_message("What is the capital of France?")}")
+    print(f"Bot: {bot.send_message('What is the capital of France?')}")
 
     print("--Turn 3--")
-    print(f"Bot: {bot.send_message("What is my name?")}")
+    print(f"Bot: {bot.send_message('What is my name?')}")
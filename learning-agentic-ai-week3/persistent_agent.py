@@ -1,11 +1,18 @@
 import time
-import json
 from google import genai
 import os
 from google.genai import types
 from dotenv import load_dotenv
 
 from tools import get_weather
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from agent_common.search_cache import search_cache
+from agent_common.tool_registry import ToolRegistry
+from context_window import TokenCounter
+from conversation_store import DEFAULT_SESSION, DEFAULT_USER, open_store
+from history_codec import content_to_record, record_to_content
+from user_profile import ProfileStore
 
 load_dotenv()
 
@@ -16,21 +23,40 @@ You are 'Orbit', a futuristic AI assistant for space travelers.
 3. When you use a tool, you annouce it as "Deploying subroutine".
 """
 
-chat_file = "mission_log.json" # The file we save to
+chat_file = "mission_log.jsonl" # The file we save to (one line per message)
+legacy_file = "mission_log.json" # Old full-rewrite format, imported once
+memory_window = 12 # Messages loaded at startup and sent with each request; the profile carries older facts
 
-function_map = {
-    "get_weather": get_weather
-}
+# JSONL journal by default; set CHAT_STORE_DB=conversations.db to keep every user in SQLite
+chat_store = open_store(chat_file, legacy_file)
+# One small JSON profile per user (profiles/<user>-<hash>.json), shared with the other agents
+profile_store = ProfileStore()
 
 class SmartAgent:
-    def __init__(self):
+    def __init__(self, user_id=DEFAULT_USER, session_id=DEFAULT_SESSION, store=None):
         self.client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
         self.model = "gemini-2.5-flash"
 
+        # This user's conversation; each save writes just the new messages
+        self.user_id = user_id
+        self.memory = (store or chat_store).session(user_id, session_id)
         self.history = self.load_memory()
+        self.saved_count = len(self.history)
 
         # Define the tools we want to use
-        self.tools_config = [get_weather, self.request_google_search]
+        # Declarations are compiled once per agent and reused by every request
+        self.registry = ToolRegistry([get_weather, self.request_google_search])
+        self.tools_config = self.registry.tools
+
+        # Token estimates for the context log line; no API calls.
+        # No context cache here: persona + tools + a 12-message window stay well under
+        # the 1024 tokens Gemini needs before it will cache anything
+        self.counter = TokenCounter(model=self.model)
+
+        # Name, home city and the like as a typed profile, instead of re-reading the transcript
+        self.profile = profile_store.load(user_id)
+        # Rough size of the whole conversation, to show what the profile + window saves (estimated, no API calls)
+        self.transcript_tokens = self.memory.approx_tokens()
 
     def request_google_search(self, query: str):
         """Dummy tool to trigger real google search"""
@@ -38,46 +64,87 @@ class SmartAgent:
         return "placeholder"
     
     def load_memory(self):
-        if os.path.exists(chat_file):
-            print("Mission log found. Loading previous mission data...")
+        try:
+            # Only the tail: the offset index lets us skip the rest of the file
+            data = self.memory.load(last=memory_window)
+            # Conversations have to start with a user message
+            while data and data[0].get("role") != "user" and self.memory.has_older:
+                data[:0] = self.memory.load_older(1)
+        except Exception as e:
+            print(f"Corrupt log file. Starting fresh. Error: {e}")
+            return []
 
+        print("Mission log found. Loading previous mission data..." if data else "No previous logs. Initializing new mission.")
+        return self.to_contents(data)
+
+    def load_older_memory(self, count=memory_window):
+        # Pull earlier messages in front of the history, e.g. when the user asks about an old mission
+        older = self.to_contents(self.memory.load_older(count))
+        self.history[:0] = older
+        self.saved_count += len(older)
+        return len(older)
+
+    def to_contents(self, data):
+        # We have to convert the JSON back into Google's 'types.Content' objects
+        restored_history = []
+        for item in data:
+            # Every part comes back, tool calls and tool results included
             try:
-                with open(chat_file, "r") as f:
-                    data = json.load(f) 
-                    # We have to convert the JSON back into Google's 'types.Content' objects
-                    restored_history = []
-                    for item in data:
-                        # Rebuild the parts list
-                        parts = [types.Part(text=p['text']) for p in item['parts'] if 'text' in p]
-                        # Note: This simple loader only handles text.
-                        # Complex tool_calls are harder to save/load manually (Week 4 frameworks handle this).
-                        if parts:
-                            restored_history.append(types.Content(role=item['role'], parts=parts))
-                    return restored_history
-            except Exception as e:
-                print(f"Corrupt log file. Starting fresh. Error: {e}")
-        else:
-            print("No previous logs. Initializing new mission.")
-            return []
-        
+                restored_history.append(record_to_content(item))
+            except ValueError as e:
+                print(f"Skipping an unreadable log entry. Error: {e}")
+        return restored_history
+
     def save_memory(self):
-        # We convert complex Google objects into simple JSON text we can save
-        serializable_history = []
-        for item in self.history:
-            # Only saving text parts for simplicity in this week's lesson
-            text_parts = []
-            for part in item.parts:
-                if part.text:
-                    text_parts.append({'text': part.text})
-
-            if text_parts:
-                serializable_history.append({
-                    "role": item.role,
-                    "parts": text_parts
-                })
-
-        with open(chat_file, "w") as f:
-            json.dump(serializable_history, f, indent=2)
+        # We convert complex Google objects into simple JSON we can save.
+        # Only the messages added since the last save, with every part
+        # (function calls and tool results too), so facts like a weather
+        # lookup don't have to be fetched again after a restart.
+        new_messages = self.history[self.saved_count:]
+        serializable_history = [content_to_record(item) for item in new_messages]
+
+        self.memory.append(serializable_history)
+        # Facts from this turn: what the user typed, and the city from a weather lookup
+        if self.profile.learn_from_turn(new_messages):
+            profile_store.save(self.user_id, self.profile)
+        self.transcript_tokens += sum(self.counter.count_content(item) for item in new_messages)
+        self.saved_count = len(self.history)
+        self.trim_history()
+
+    def trim_history(self):
+        # The profile carries the facts, so only a recent window of messages is sent.
+        # Once the history is twice the window, drop the older half in one go (it stays
+        # on disk); cutting in one go keeps the context cache valid until the next cut.
+        if len(self.history) <= 2 * memory_window:
+            return
+
+        cut = len(self.history) - memory_window
+        # The history has to start with a user message
+        while cut < len(self.history) and not (
+            self.history[cut].role == "user" and any(part.text for part in self.history[cut].parts)
+        ):
+            cut += 1
+        if cut < len(self.history):
+            del self.history[:cut]
+            self.saved_count -= cut
+
+    def with_profile(self, query_index):
+        # The profile rides along in this request's user message only; it is never saved
+        block = self.profile.block()
+        if not block:
+            return self.history
+        contents = list(self.history)
+        query = contents[query_index]
+        contents[query_index] = types.Content(role="user", parts=[types.Part(text=block)] + list(query.parts))
+        return contents
+
+    def log_context_tokens(self, request_history):
+        # What this request carries (profile + recent window) vs replaying the whole transcript.
+        # Both are local estimates, so the log line costs no API calls
+        counter = self.counter
+        sent = sum(counter.count_content(item) for item in request_history)
+        full = self.transcript_tokens + counter.count_content(self.history[-1])
+        print(f"Context: {sent:,} tokens sent instead of {full:,} for the full transcript ({full - sent:,} saved)")
 
     def chat(self, user_query: str):
         print(f"\nUser: {user_query}")
@@ -86,12 +153,16 @@ class SmartAgent:
         self.history.append(
             types.Content(role="user", parts=[types.Part(text=user_query)])
         )
+        query_index = len(self.history) - 1
 
         try:
             # We inject 'system_instruction' into the config
-            response = self.client.models.generate_content(
+            request_history = self.with_profile(query_index)
+            self.log_context_tokens(request_history)
+            response = response_cache.generate_content(
+                self.client,
                 model=self.model,
-                contents=self.history,
+                contents=request_history,
                 config=types.GenerateContentConfig(
                     tools=self.tools_config,
                     automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
@@ -103,18 +174,18 @@ class SmartAgent:
                 for call in response.function_calls:
                     print(f"Agent intent: calling {call.name} with {call.args}")
 
-                    tool_function = function_map.get(call.name)
+                    tool_function = self.registry.get(call.name)
 
                     if call.name == "request_google_search":
                         search_query = call.args.get("query")
                         print(f"Running google search for {search_query}")
 
-                        google_res = self.client.models.generate_content(
+                        # Same question asked recently? Reuse the grounded answer
+                        google_res = search_cache.search(
+                            self.client,
+                            user_query,
                             model=self.model,
-                            contents=f"Answer this using google search: {user_query}",
-                            config=types.GenerateContentConfig(
-                                tools=[types.Tool(google_search=types.GoogleSearch())]
-                            )
+                            prompt="Answer this using google search: {query}"
                         )
 
                         final_output = f"(Via Google Search): {google_res.text}"
@@ -139,9 +210,10 @@ class SmartAgent:
                         )
 
                         # Get final answer based on tool result - We must send the system instruction again
-                        final_res = self.client.models.generate_content(
+                        final_res = response_cache.generate_content(
+                            self.client,
                             model=self.model,
-                            contents=self.history,
+                            contents=self.with_profile(query_index),
                             config=types.GenerateContentConfig(
                                 tools=self.tools_config,
                                 system_instruction=my_persona
@@ -5,6 +5,11 @@ from google.genai import types
 from dotenv import load_dotenv
 
 from tools import get_weather
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from agent_common.search_cache import search_cache
+from agent_common.tool_registry import ToolRegistry
+from context_cache import ContextCache, caching_client
 
 load_dotenv()
 
@@ -15,19 +20,20 @@ You are 'Orbit', a futuristic AI assistant for space travelers.
 3. When you use a tool, you annouce it as "Deploying subroutine".
 """
 
-function_map = {
-    "get_weather": get_weather
-}
-
 class SmartAgent:
     def __init__(self):
-        self.client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+        self.client = caching_client(genai.Client(api_key=os.environ.get("GOOGLE_API_KEY")))
         self.model = "gemini-2.5-flash"
 
         self.history = []
 
         # Define the tools we want to use
-        self.tools_config = [get_weather, self.request_google_search]
+        # Declarations are compiled once per agent and reused by every request
+        self.registry = ToolRegistry([get_weather, self.request_google_search])
+        self.tools_config = self.registry.tools
+
+        # Cached-content handle for persona + tools + old history, refreshed as the chat grows
+        self.context_cache = ContextCache(self.client, self.model, system_instruction=my_persona, tools=self.tools_config)
 
     def request_google_search(self, query: str):
         """Dummy tool to trigger real google search"""
@@ -43,33 +49,35 @@ class SmartAgent:
         )
 
         try:
-            # We inject 'system_instruction' into the config
-            response = self.client.models.generate_content(
+            # Persona, tools and the settled history are sent once, as a cached context
+            contents, config = self.context_cache.request(
+                self.history,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+            )
+            response = response_cache.generate_content(
+                self.client,
                 model=self.model,
-                contents=self.history,
-                config=types.GenerateContentConfig(
-                    tools=self.tools_config,
-                    automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
-                    system_instruction=my_persona
-                )
+                contents=contents,
+                config=config
             )
+            self.context_cache.record(response)
 
             if response.function_calls:
                 for call in response.function_calls:
                     print(f"Agent intent: calling {call.name} with {call.args}")
 
-                    tool_function = function_map.get(call.name)
+                    tool_function = self.registry.get(call.name)
 
                     if call.name == "request_google_search":
                         search_query = call.args.get("query")
                         print(f"Running google search for {search_query}")
 
-                        google_res = self.client.models.generate_content(
+                        # Same question asked recently? Reuse the grounded answer
+                        google_res = search_cache.search(
+                            self.client,
+                            user_query,
                             model=self.model,
-                            contents=f"Answer this using google search: {user_query}",
-                            config=types.GenerateContentConfig(
-                                tools=[types.Tool(google_search=types.GoogleSearch())]
-                            )
+                            prompt="Answer this using google search: {query}"
                         )
 
                         final_output = f"(Via Google Search): {google_res.text}"
@@ -93,15 +101,15 @@ class SmartAgent:
                             )
                         )
 
-                        # Get final answer based on tool result - We must send the system instruction again
-                        final_res = self.client.models.generate_content(
+                        # Get final answer based on tool result - the persona comes from the cache or is sent again
+                        contents, config = self.context_cache.request(self.history)
+                        final_res = response_cache.generate_content(
+                            self.client,
                             model=self.model,
-                            contents=self.history,
-                            config=types.GenerateContentConfig(
-                                tools=self.tools_config,
-                                system_instruction=my_persona
-                            )
+                            contents=contents,
+                            config=config
                         )
+                        self.context_cache.record(final_res)
 
                         final_output = final_res.text
             else:
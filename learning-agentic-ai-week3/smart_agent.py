@@ -4,13 +4,14 @@ from google.genai import types
 from dotenv import load_dotenv
 
 from tools import get_weather
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.response_cache import response_cache
+from agent_common.search_cache import search_cache
+from agent_common.prefetch import MISS, ToolPrefetcher
+from agent_common.tool_registry import ToolRegistry
 
 load_dotenv()
 
-function_map = {
-    "get_weather": get_weather
-}
-
 class SmartAgent:
     def __init__(self):
         self.client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
@@ -19,7 +20,12 @@ class SmartAgent:
         self.history = []
 
         # Define the tools we want to use
-        self.tools_config = [get_weather, self.request_google_search]
+        # Declarations are compiled once per agent and reused by every request
+        self.registry = ToolRegistry([get_weather, self.request_google_search])
+        self.tools_config = self.registry.tools
+
+        # Runs likely local tools (weather for a named city) while the model decides
+        self.prefetcher = ToolPrefetcher(self.registry)
 
     def request_google_search(self, query: str):
         """Dummy tool to trigger real google search"""
@@ -34,8 +40,11 @@ class SmartAgent:
             types.Content(role="user", parts=[types.Part(text=user_query)])
         )
 
+        prefetched = self.prefetcher.start(user_query)
+
         try:
-            response = self.client.models.generate_content(
+            response = response_cache.generate_content(
+                self.client,
                 model=self.model,
                 contents=self.history,
                 config=types.GenerateContentConfig(
@@ -48,23 +57,26 @@ class SmartAgent:
                 for call in response.function_calls:
                     print(f"Agent intent: calling {call.name} with {call.args}")
 
-                    tool_function = function_map.get(call.name)
+                    tool_function = self.registry.get(call.name)
 
                     if call.name == "request_google_search":
                         search_query = call.args.get("query")
                         print(f"Running google search for {search_query}")
 
-                        google_res = self.client.models.generate_content(
+                        # Same question asked recently? Reuse the grounded answer
+                        google_res = search_cache.search(
+                            self.client,
+                            user_query,
                             model=self.model,
-                            contents=f"Answer this using google search: {user_query}",
-                            config=types.GenerateContentConfig(
-                                tools=[types.Tool(google_search=types.GoogleSearch())]
-                            )
+                            prompt="Answer this using google search: {query}"
                         )
 
                         final_output = f"(Via Google Search): {google_res.text}"
                     else:
-                        tool_res = tool_function(**call.args)
+                        # Use the prefetched result when we guessed this call right
+                        tool_res = self.prefetcher.take(prefetched, call)
+                        if tool_res is MISS:
+                            tool_res = tool_function(**call.args)
                         print(f"Tool result: {tool_res}")
 
                         # Add 'Model Call' to history
@@ -84,7 +96,8 @@ class SmartAgent:
                         )
 
                         # Get final answer based on tool result
-                        final_res = self.client.models.generate_content(
+                        final_res = response_cache.generate_content(
+                            self.client,
                             model=self.model,
                             contents=self.history,
                             config=types.GenerateContentConfig(
@@ -105,6 +118,8 @@ class SmartAgent:
 
         except Exception as e:
             return f"Error: {e}"
+        finally:
+            self.prefetcher.finish(prefetched)
         
 if __name__ == "__main__":
     bot = SmartAgent()
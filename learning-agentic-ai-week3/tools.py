@@ -1,14 +1,37 @@
+import numbers
+
+import bmi_engine
+import shared_path  # noqa: F401  (puts agent_common on sys.path)
+from agent_common.gazetteer import TTLMemo, default_gazetteer
+
 def calc_bmi(weight_kg: float, height_m: float):
     """
     Calculates the Body Mass Index (BMI)
     Formula: weight (kg) / [height (m)]^2
     """
 
-    try: 
-        bmi = weight_kg / (height_m ** 2)
-        return f"{bmi:.2f}"
-    except Exception as e:
-        print(f"Error: {e}")
+    # Same contract as before: numbers in, None (and a printed error) for anything else
+    if not isinstance(weight_kg, numbers.Real) or not isinstance(height_m, numbers.Real):
+        print(f"Error: weight and height must be numbers, got {weight_kg!r} and {height_m!r}")
+        return None
+
+    # One person is just a batch of one (see bmi_engine.py for whole files)
+    batch = bmi_engine.compute([weight_kg], [height_m])
+
+    if not batch.valid[0]:
+        print(f"Error: weight and height must be positive numbers, got {weight_kg} and {height_m}")
+        return None
+    return f"{batch.bmi[0]:.2f}"
+
+# Loaded once: a hash map for names/aliases plus a prefix trie (see agent_common/gazetteer.py)
+gazetteer = default_gazetteer()
+
+# Weather per city, remembered until that city's TTL runs out
+weather_memo = TTLMemo()
+
+def fetch_weather(city):
+    # Mock data from agent_common/cities.csv. A real weather API call would go here.
+    return {"temp": city.temp, "condition": city.condition}
 
 # This is a 'Mock' function.
 def get_weather(city: str):
@@ -23,20 +46,15 @@ def get_weather(city: str):
         dict: A dictionary containing temperature and condition.
     """
 
-    # Normalize input to handle case sensitivity
-    city = city.lower().strip()
-
-    if "london" in city:
-        return {"temp": "15C", "condition": "Cloudy"}
-    elif "tokyo" in city:
-        return {"temp": "12C", "condition": "Rainy"}
-    elif "san francisco" in city:
-        return {"temp": "20C", "condition": "Sunny"}
-    elif "nagpur" in city:
-        return {"temp": "32C", "condition": "Hot"}
-    else:
+    # Normalizes case, accents and punctuation, then looks the city up
+    match = gazetteer.lookup(city)
+
+    if match is None:
         # Default fallback for unknown cities
         return {"temp": "25C", "condition": "Clear"}
+
+    # Copy, so callers can't change the memoized answer
+    return dict(weather_memo.get_or_compute(match.name, lambda: fetch_weather(match), match.ttl))
     
 # Test it manually
 if __name__ == "__main__":
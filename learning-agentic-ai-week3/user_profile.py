@@ -0,0 +1,177 @@
+import os
+import re
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from conversation_store import file_id
+
+# Only statements about the user themselves count: "I want to lose 5 kg", "I am Tired",
+# "my waist is 80 cm" or "I ran 2 m" must not end up in the profile.
+# "my name is Yash", "call me Yash"
+_NAME = re.compile(r"\b(?:my name is|call me)\s+([A-Za-z][a-zA-Z'-]+)", re.I)
+# "call me back", "call me later" aren't names
+_NOT_NAMES = frozenset("back later now soon tomorrow today when if at on not please".split())
+# "I weigh 72 kg", "my weight is 72.5kgs", "I'm 72 kilos"
+_WEIGHT = re.compile(
+    r"\b(?:i weigh|my (?:current )?weight is|i'm|i am)\s+(?:about |around )?"
+    r"(\d+(?:\.\d+)?)\s*(?:kg|kgs|kilo|kilos|kilograms?)\b",
+    re.I
+)
+# "my height is 1.78 m", "I'm 178 cm tall"
+_HEIGHT = re.compile(
+    r"\bmy height is\s+(?:about |around )?(\d+(?:\.\d+)?)\s*(cm|m|meters?|metres?)\b"
+    r"|\b(?:i'm|i am)\s+(?:about |around )?(\d+(?:\.\d+)?)\s*(cm|m|meters?|metres?)\s+tall\b",
+    re.I
+)
+
+
+class UserProfile(BaseModel):
+    """
+    What we know about one user, kept up to date turn by turn.
+
+    The ranges throw out typos and jokes ("my height is 5m") instead of
+    storing them; a rejected value just leaves the old one in place.
+    """
+
+    model_config = ConfigDict(validate_assignment=True)
+
+    name: Optional[str] = Field(None, max_length=40)
+    height_m: Optional[float] = Field(None, gt=0.5, lt=2.8)
+    weight_kg: Optional[float] = Field(None, gt=2, lt=400)
+    bmi: Optional[float] = Field(None, gt=5, lt=100)
+    city: Optional[str] = Field(None, max_length=60)
+
+    def _set(self, field, value):
+        if value is None or getattr(self, field) == value:
+            return False
+        try:
+            setattr(self, field, value)
+        except ValidationError:
+            return False
+        return True
+
+    def learn_from_text(self, text):
+        """
+        Cheap regex pass over something the user said. True if anything changed.
+        Anything it isn't sure about is left to learn_from_tool (calc_bmi's arguments).
+        """
+
+        changed = False
+        name = _NAME.search(text)
+        if name and name.group(1).lower() not in _NOT_NAMES:
+            changed |= self._set("name", name.group(1)[0].upper() + name.group(1)[1:])
+
+        weight = _WEIGHT.search(text)
+        if weight:
+            changed |= self._set("weight_kg", float(weight.group(1)))
+
+        height = _HEIGHT.search(text)
+        if height:
+            number, unit = height.group(1, 2) if height.group(1) else height.group(3, 4)
+            height_m = float(number)
+            if unit.lower() == "cm":
+                height_m /= 100
+            changed |= self._set("height_m", round(height_m, 3))
+        return changed
+
+    def learn_from_tool(self, name, args, result):
+        """Facts from a tool call the model made, e.g. calc_bmi's inputs and answer."""
+
+        args = args or {}
+        if isinstance(result, dict) and "result" in result:
+            result = result["result"]
+
+        changed = False
+        if name == "calc_bmi":
+            changed |= self._set("weight_kg", args.get("weight_kg"))
+            changed |= self._set("height_m", args.get("height_m"))
+            try:
+                changed |= self._set("bmi", round(float(result), 2))
+            except (TypeError, ValueError):
+                # calc_bmi returns None when it fails
+                pass
+        elif name == "get_weather":
+            changed |= self._set("city", args.get("city"))
+        return changed
+
+    def learn_from_turn(self, contents):
+        """Update from one turn's messages: user text, tool calls and their results."""
+
+        changed = False
+        calls = {}
+        for content in contents:
+            for part in content.parts or []:
+                if part.function_call:
+                    calls[part.function_call.name] = part.function_call.args
+                elif part.function_response:
+                    response = part.function_response
+                    changed |= self.learn_from_tool(response.name, calls.get(response.name), response.response)
+                elif part.text and content.role == "user":
+                    changed |= self.learn_from_text(part.text)
+        return changed
+
+    def block(self):
+        """The profile as one short line for the prompt; empty when we know nothing yet."""
+
+        facts = self.model_dump(exclude_none=True)
+        if not facts:
+            return ""
+        return "User profile: " + "; ".join(f"{key}={value}" for key, value in facts.items())
+
+
+class ProfileStore:
+    """
+    One JSON file per user (profiles/<user>-<hash>.json). Written only when
+    something changed, through a temp file so a crash can't corrupt it.
+    """
+
+    def __init__(self, directory="profiles"):
+        self.directory = directory
+
+    def path(self, user_id):
+        return os.path.join(self.directory, f"{file_id(user_id)}.json")
+
+    def load(self, user_id):
+        try:
+            with open(self.path(user_id), "r", encoding="utf-8") as f:
+                return UserProfile.model_validate_json(f.read())
+        except FileNotFoundError:
+            return UserProfile()
+        except (OSError, ValueError) as e:
+            print(f"Corrupt profile for {user_id}. Starting fresh. Error: {e}")
+            return UserProfile()
+
+    def save(self, user_id, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(user_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(profile.model_dump_json(exclude_none=True))
+        os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    from google.genai import types
+
+    from context_window import TokenCounter
+
+    # A long fitness chat where the facts were given once, early on
+    turns = [
+        types.Content(role="user", parts=[types.Part(text="Hi! My name is Yash.")]),
+        types.Content(role="model", parts=[types.Part(text="Hey Yash! Tell me your height and weight.")]),
+        types.Content(role="user", parts=[types.Part(text="I weigh 72 kg and my height is 178 cm.")]),
+        types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name="calc_bmi", args={"weight_kg": 72, "height_m": 1.78}))]),
+        types.Content(role="tool", parts=[types.Part(function_response=types.FunctionResponse(name="calc_bmi", response={"result": "22.72"}))]),
+        types.Content(role="model", parts=[types.Part(text="Your BMI is 22.72, which is in the healthy range.")]),
+    ]
+    for day in range(200):
+        turns.append(types.Content(role="user", parts=[types.Part(text=f"Day {day}: what should I eat after my workout?")]))
+        turns.append(types.Content(role="model", parts=[types.Part(text="Some protein and carbs within an hour, and plenty of water. " * 3)]))
+
+    profile = UserProfile()
+    profile.learn_from_turn(turns)
+    counter = TokenCounter()
+    transcript = sum(counter.count_content(content) for content in turns)
+    block = counter.count(profile.block())
+    print(profile.block())
+    print(f"{transcript:,} transcript tokens -> {block} profile tokens ({1 - block / transcript:.1%} fewer)")
@@ -0,0 +1,402 @@
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from google.genai import types
+
+from conversation_store import file_id
+
+DEFAULT_DIMENSIONS = 256
+# Long answers are cut before embedding and before they go back into a prompt
+MAX_TURN_CHARS = 600
+# The embedding API takes at most this many texts per call
+EMBED_BATCH = 100
+# Tries before falling back, and the first wait between them (doubled each time)
+EMBED_RETRIES = 3
+RETRY_DELAY = 0.5
+# While on the fallback, how often to check whether the main embedder is back
+RECHECK_AFTER = 60.0
+
+_WORDS = re.compile(r"[a-z0-9]+")
+# Words (and the role labels from turn_texts) that would make every turn look alike
+_STOPWORDS = frozenset(
+    "a an and are as at be but by called do for from here i in is it me my of on or returned so that the "
+    "this to tool user model was what with you your".split()
+)
+
+
+def memory_path(directory, user_id, session_id):
+    # One index per conversation, named like the chat log itself
+    return os.path.join(directory, f"{file_id(user_id)}.{file_id(session_id)}")
+
+
+def _describe(content):
+    pieces = []
+    for part in content.parts or []:
+        if part.text:
+            pieces.append(part.text)
+        elif part.function_call:
+            pieces.append(f"called {part.function_call.name}({part.function_call.args})")
+        elif part.function_response:
+            pieces.append(f"{part.function_response.name} returned {part.function_response.response}")
+    return f"{content.role}: {' '.join(pieces)}" if pieces else ""
+
+
+def turn_texts(contents, max_chars=MAX_TURN_CHARS):
+    """
+    One string per turn: a user message and everything after it (tool calls,
+    tool results, the answer) up to the next user message.
+    """
+
+    turns, current = [], []
+    for content in contents:
+        if content.role == "user" and any(part.text for part in content.parts or []) and current:
+            turns.append(current)
+            current = []
+        line = _describe(content)
+        if line:
+            current.append(line)
+    if current:
+        turns.append(current)
+    return ["\n".join(lines)[:max_chars] for lines in turns]
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class GeminiEmbedder:
+    """Embeddings from client.models.embed_content (gemini-embedding-001)."""
+
+    def __init__(self, client, model="gemini-embedding-001", dimensions=DEFAULT_DIMENSIONS):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.name = f"{model}/{dimensions}"
+        # Below this cosine score a past turn is not worth the prompt tokens
+        self.min_score = 0.55
+
+    def embed(self, texts, task_type):
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            result = self.client.models.embed_content(
+                model=self.model,
+                contents=texts[start:start + EMBED_BATCH],
+                config=types.EmbedContentConfig(task_type=task_type, output_dimensionality=self.dimensions)
+            )
+            vectors.extend(embedding.values for embedding in result.embeddings)
+        # Shortened gemini-embedding-001 vectors are not unit length; make them so for cosine scores
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+class HashEmbedder:
+    """
+    Offline fallback: words hashed into a fixed-size vector.
+    Only catches shared words ("bmi", "weight"), not meaning, but needs no network.
+    """
+
+    def __init__(self, dimensions=1024):
+        # Wider than the API vectors: fewer hash collisions between unrelated words
+        self.dimensions = dimensions
+        self.name = f"hash/{dimensions}"
+        # Sharing one or two words already counts here
+        self.min_score = 0.1
+
+    def embed(self, texts, task_type=None):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORDS.findall(text.lower()):
+                if word in _STOPWORDS:
+                    continue
+                # crc32, not hash(): it must give the same vector in every process
+                h = zlib.crc32(word.encode("utf-8"))
+                vectors[row, h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+def _embed_all(embedder, texts):
+    # Gemini rejects an empty batch; nothing stored means nothing to re-embed
+    if not texts:
+        return np.empty((0, embedder.dimensions), dtype=np.float32)
+    return embedder.embed(texts, "RETRIEVAL_DOCUMENT")
+
+
+class VectorMemory:
+    """
+    Past turns as unit vectors in a NumPy matrix, searched by cosine similarity.
+
+    - add(contents) hands the new turns to a background thread, which embeds
+      them and appends them to disk; the chat never waits for it
+    - search(query, k) embeds the query and returns the k closest past turns
+      (one matrix-vector product, so it stays fast with thousands of turns)
+    - files: <path>.vec (float32 rows), <path>.jsonl (the turn texts),
+      <path>.json (which embedder made the vectors)
+    - if the embedder fails (no network, no key) after a few tries with
+      backoff, this process switches to `fallback` and re-embeds what's
+      stored in memory, so one index never mixes embedders. The files keep
+      only the main embedder's vectors, and once it answers again (checked
+      every `recheck_after` seconds) everything is re-embedded with it
+
+    Usage:
+        memory = VectorMemory("memory/default", GeminiEmbedder(client), fallback=HashEmbedder())
+        memory.add(new_contents)
+        for score, text in memory.search("what was my bmi?", k=3):
+            ...
+    """
+
+    def __init__(self, path, embedder, fallback=None, retries=EMBED_RETRIES, retry_delay=RETRY_DELAY,
+                 recheck_after=RECHECK_AFTER):
+        self.path = path
+        self.embedder = embedder
+        self.fallback = fallback
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.recheck_after = recheck_after
+        # Who made the vectors in memory: `embedder`, or `fallback` while that one is down
+        self.active = embedder
+        self.recheck_at = 0.0
+
+        self.lock = threading.Lock()
+        self.texts = []
+        self.vectors = np.empty((0, embedder.dimensions), dtype=np.float32)
+        self.count = 0
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"embedded": 0, "searches": 0, "embed_errors": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.is_new = not os.path.exists(path + ".json")
+        self._load()
+
+    def _load(self):
+        if self.is_new:
+            return
+
+        with open(self.path + ".json") as f:
+            meta = json.load(f)
+        texts = []
+        if os.path.exists(self.path + ".jsonl"):
+            with open(self.path + ".jsonl", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        texts.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash
+                        break
+
+        if meta.get("embedder") == self.embedder.name:
+            vectors = np.fromfile(self.path + ".vec", dtype=np.float32) if os.path.exists(self.path + ".vec") else np.empty(0, np.float32)
+            rows = min(len(texts), vectors.size // self.embedder.dimensions)
+            self.texts = texts[:rows]
+            self._append(vectors[:rows * self.embedder.dimensions].reshape(rows, self.embedder.dimensions))
+            # Anything whose vector didn't make it to disk is embedded again
+            if texts[rows:]:
+                self.worker.submit(self._index, texts[rows:], True)
+        elif texts:
+            # Made by another embedder (or by the fallback, before it stopped being saved):
+            # those vectors can't be compared with ours
+            self.worker.submit(self._reembed, texts)
+
+    def _append(self, vectors):
+        # Grow by doubling, so adding one row at a time stays cheap
+        needed = self.count + len(vectors)
+        if needed > len(self.vectors):
+            grown = np.empty((max(needed, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+        self.vectors[self.count:needed] = vectors
+        self.count = needed
+
+    def _rewrite(self, texts, vectors):
+        # Start the files over (new index or new embedder); temp files keep it crash-safe,
+        # and the embedder name goes last, so a half-done rewrite is redone next time
+        for suffix, data in ((".vec", vectors.astype(np.float32).tobytes()),
+                             (".jsonl", "".join(json.dumps(t) + "\n" for t in texts).encode("utf-8")),
+                             (".json", json.dumps({"embedder": self.embedder.name}).encode("utf-8"))):
+            with open(self.path + suffix + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(self.path + suffix + ".tmp", self.path + suffix)
+
+    def add(self, contents):
+        """Queue the turns in `contents` for embedding."""
+
+        texts = turn_texts(contents)
+        if texts:
+            self.worker.submit(self._index, texts)
+
+    def backfill(self, pages):
+        """
+        A new index for an existing chat log: embed the old turns once, in the
+        background. `pages` is an iterable of content lists, read lazily by the
+        worker, so the caller never loads the whole log.
+        """
+
+        self.is_new = False
+        self.worker.submit(self._backfill, pages)
+
+    def _backfill(self, pages):
+        try:
+            for contents in pages:
+                texts = turn_texts(contents)
+                if texts:
+                    self._index(texts)
+        except Exception as e:
+            print(f"Could not index the old log. Error: {e}")
+
+    def _embed(self, texts, task_type):
+        if self.active is self.fallback:
+            if time.monotonic() < self.recheck_at:
+                return self.fallback.embed(texts, task_type)
+            try:
+                vectors = self.embedder.embed(texts, task_type)
+                with self.lock:
+                    old_texts = self.texts[:self.count]
+                old_vectors = _embed_all(self.embedder, old_texts)
+            except Exception:
+                self.stats["embed_errors"] += 1
+                self.recheck_at = time.monotonic() + self.recheck_after
+                return self.fallback.embed(texts, task_type)
+            print(f"Embeddings are back, memory uses {self.embedder.name} again")
+            self._replace(old_texts, old_vectors, self.embedder)
+            return vectors
+
+        for attempt in range(self.retries):
+            try:
+                return self.embedder.embed(texts, task_type)
+            except Exception as e:
+                self.stats["embed_errors"] += 1
+                error = e
+            if attempt + 1 < self.retries:
+                time.sleep(self.retry_delay * 2 ** attempt)
+        if self.fallback is None:
+            raise error
+
+        print(f"Embeddings unavailable, using {self.fallback.name} for memory until they are back. Error: {error}")
+        self.recheck_at = time.monotonic() + self.recheck_after
+        with self.lock:
+            old_texts = self.texts[:self.count]
+        # Re-embed what's stored, so every row in memory comes from the same embedder
+        self._replace(old_texts, _embed_all(self.fallback, old_texts), self.fallback)
+        return self.fallback.embed(texts, task_type)
+
+    def _replace(self, texts, vectors, embedder):
+        with self.lock:
+            self.active = embedder
+            self.texts, self.count = list(texts), 0
+            self.vectors = np.empty((0, embedder.dimensions), dtype=np.float32)
+            self._append(vectors)
+            # Fallback vectors live only in this process; a restart tries the main embedder again
+            if embedder is self.embedder:
+                self._rewrite(texts, vectors)
+
+    def _reembed(self, texts):
+        try:
+            vectors = self._embed(texts, "RETRIEVAL_DOCUMENT")
+        except Exception as e:
+            print(f"Could not rebuild memory. Error: {e}")
+            return
+        self._replace(texts, vectors, self.active)
+
+    def _index(self, texts, logged=False):
+        # logged: the texts are already in the .jsonl file, only their vectors are missing
+        try:
+            vectors = self._embed(texts, "RETRIEVAL_DOCUMENT")
+        except Exception as e:
+            print(f"Could not add to memory. Error: {e}")
+            return
+
+        with self.lock:
+            if not os.path.exists(self.path + ".json"):
+                self._rewrite([], np.empty((0, self.embedder.dimensions), np.float32))
+            if not logged:
+                with open(self.path + ".jsonl", "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(text) + "\n" for text in texts)
+            # Turns with no saved vector are embedded again on the next start
+            if self.active is self.embedder:
+                with open(self.path + ".vec", "ab") as f:
+                    f.write(vectors.tobytes())
+            self.texts.extend(texts)
+            self._append(vectors)
+            self.stats["embedded"] += len(texts)
+
+    def search(self, query, k=3, exclude=()):
+        """[(score, text)] for the k past turns closest to `query`, best first."""
+
+        with self.lock:
+            embedder = self.active
+            count = self.count
+        if count == 0:
+            return []
+
+        try:
+            q = embedder.embed([query], "RETRIEVAL_QUERY")[0]
+        except Exception:
+            # Recall is a bonus; answer without it rather than fail the turn
+            return []
+
+        with self.lock:
+            if self.active is not embedder:
+                # Switching between the embedder and the fallback right now; skip this once
+                return []
+            scores = self.vectors[:count] @ q
+            texts = self.texts
+        self.stats["searches"] += 1
+
+        exclude = set(exclude)
+        wanted = min(count, k + len(exclude))
+        # argpartition finds the best `wanted` rows without sorting all of them
+        best = np.argpartition(-scores, wanted - 1)[:wanted]
+        best = best[np.argsort(-scores[best])]
+
+        hits = []
+        for row in best:
+            if scores[row] < embedder.min_score or texts[row] in exclude:
+                continue
+            hits.append((float(scores[row]), texts[row]))
+            if len(hits) == k:
+                break
+        return hits
+
+    def wait(self):
+        # Block until everything queued is embedded (handy in tests and before exit)
+        self.worker.submit(lambda: None).result()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # 20,000 past turns, searched for the one that had the BMI in it
+    with tempfile.TemporaryDirectory() as workdir:
+        memory = VectorMemory(os.path.join(workdir, "memory"), HashEmbedder())
+        history = []
+        for turn in range(20_000):
+            history.append(types.Content(role="user", parts=[types.Part(text=f"Day {turn}: what should I eat after leg day?")]))
+            history.append(types.Content(role="model", parts=[types.Part(text="Protein and some carbs, plus water.")]))
+            if turn == 1234:
+                history.append(types.Content(role="user", parts=[types.Part(text="I weigh 72 kg and my height is 1.78 m.")]))
+                history.append(types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name="calc_bmi", args={"weight_kg": 72, "height_m": 1.78}))]))
+                history.append(types.Content(role="tool", parts=[types.Part(function_response=types.FunctionResponse(name="calc_bmi", response={"result": 22.72}))]))
+                history.append(types.Content(role="model", parts=[types.Part(text="Your BMI is 22.72, which is healthy.")]))
+
+        started = time.perf_counter()
+        memory.add(history)
+        memory.wait()
+        print(f"Indexed {memory.count:,} turns in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        for _ in range(100):
+            hits = memory.search("tell my previous bmi count", k=2)
+        print(f"Search: {(time.perf_counter() - started) * 10:.2f}ms per query")
+        for score, text in hits:
+            print(f"  {score:.2f}  {text.splitlines()[0]}")
+
+        reopened = VectorMemory(os.path.join(workdir, "memory"), HashEmbedder())
+        print(f"Reopened with {reopened.count:,} turns")